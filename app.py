@@ -1,11 +1,58 @@
-import numpy as np
+import time
+
 import pandas as pd
-import yfinance as yf
-import matplotlib.pyplot as plt
 import streamlit as st
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
+import metrics
+from lstm_model import (BATCH_SIZE, EPOCHS, FEATURE_CHOICES, FORECAST_DAYS, TIME_STEP, forecast_tail,
+                        select_features, train_or_update)
+from job_scheduler import JobQueueFull, JobScheduler
+from model_registry import MODEL_REGISTRY_DIR, ModelRegistry
+from price_cache import load_prices
+
+
+# TensorFlow, scikit-learn and yfinance are imported inside lstm_model/model_registry/price_cache
+# only when a job runs, so a page load does not pay for them.
+@st.cache_resource
+def get_scheduler():
+    # One scheduler per server process, shared by every session and rerun
+    return JobScheduler(max_workers=1, max_queued=8)
+
+
+@st.cache_resource
+def get_registry(root=MODEL_REGISTRY_DIR):
+    return ModelRegistry(root)
+
+
+def train_and_predict(job, symbol, start, end, offline, features, retrain, max_epochs, batch_size, early_stopping):
+    """Background job: fetch, train (or warm-start) and predict; progress goes to job.report."""
+    # Fetch Stock Data (local cache first, only missing ranges are downloaded)
+    with metrics.timer("load_prices"):
+        stock_data = load_prices(symbol, start, end, offline=offline)
+    if stock_data.empty:
+        raise ValueError("No stock data found. Please check the symbol or dates.")
+
+    #  Preprocessing, Build and Train LSTM Model
+    feature_columns = select_features(features)
+    target_index = feature_columns.index("Close")
+    epoch_log = []
+
+    def report_epoch(epoch, logs, seconds):
+        epoch_log.append({"epoch": epoch, "loss": logs.get("loss"), "val_loss": logs.get("val_loss"),
+                          "seconds": round(seconds, 2)})
+        mean_seconds = sum(e["seconds"] for e in epoch_log) / len(epoch_log)
+        job.report(epoch=epoch, epochs=max_epochs, loss=logs.get("loss"), eta=mean_seconds * (max_epochs - epoch))
+
+    with metrics.timer("train"):
+        model, scaler, scaled_data, status = train_or_update(
+            get_registry(), symbol, stock_data, feature_columns, TIME_STEP, epochs=max_epochs,
+            retrain=retrain, batch_size=batch_size, early_stopping=early_stopping, on_epoch=report_epoch
+        )
+
+    #  Predict
+    with metrics.timer("predict"):
+        predicted_prices = forecast_tail(model, scaler, scaled_data, target_index, TIME_STEP, FORECAST_DAYS)
+    return {"stock_data": stock_data, "predicted_prices": predicted_prices, "status": status, "epoch_log": epoch_log}
+
 
 # Streamlit page 
 st.set_page_config(page_title="Stock Price Predictor", layout="wide")
@@ -15,63 +62,76 @@ st.title("📈 LSTM Stock Price Predictor")
 stock_symbol = st.sidebar.text_input("Enter Stock Symbol (e.g., SUZLON.NS)", "SUZLON.NS")
 start_date = st.sidebar.date_input("Start Date", pd.to_datetime("2023-04-03"))
 end_date = st.sidebar.date_input("End Date", pd.to_datetime("2025-04-04"))
+offline = st.sidebar.checkbox("Offline (use cached prices only)", False)
+features = st.sidebar.multiselect("Input Features", FEATURE_CHOICES, ["Close"])
+retrain = st.sidebar.checkbox("Retrain from scratch (ignore saved model)", False)
+max_epochs = st.sidebar.number_input("Max Epochs", 1, 500, EPOCHS)
+batch_size = st.sidebar.number_input("Batch Size", 8, 1024, BATCH_SIZE)
+early_stopping = st.sidebar.checkbox("Stop early when validation loss plateaus", True)
+show_timings = st.sidebar.checkbox("Show timing panel", False)
+
+scheduler = get_scheduler()
 
 if st.sidebar.button("Train and Predict"):
+    params = {
+        "symbol": stock_symbol, "start": start_date, "end": end_date, "offline": offline,
+        "features": sorted(features), "retrain": retrain, "max_epochs": int(max_epochs),
+        "batch_size": int(batch_size), "early_stopping": early_stopping,
+    }
+    try:
+        st.session_state.job_id = scheduler.submit(params, lambda job: train_and_predict(job, **params))
+    except JobQueueFull as e:
+        st.error(f"⚠️ {e}")
 
-    # Fetch Stock Data
-    stock_data = yf.download(stock_symbol, start=start_date, end=end_date)
+job = scheduler.get(st.session_state.get("job_id"))
 
-    if stock_data.empty:
-        st.error("No stock data found. Please check the symbol or dates.")
+# Before the polling loop below, which reruns the page every second while a job runs
+if show_timings:
+    st.sidebar.dataframe(metrics.timing_rows(), hide_index=True)
+metrics.flush("app")
+
+if job is not None and job.status in ("queued", "running"):
+    progress = job.progress
+    if job.status == "queued":
+        st.info(f"⏳ Job {job.id} is waiting for a free worker...")
+    elif "epoch" in progress:
+        st.progress(min(progress["epoch"] / progress["epochs"], 1.0))
+        st.text(f"Job {job.id} — epoch {progress['epoch']}/{progress['epochs']}, "
+                f"loss {progress['loss']:.5f}, ETA ≤ {progress['eta']:.0f}s")
     else:
-        st.subheader("📊 Historical Stock Data")
-        st.line_chart(stock_data['Close'])
-
-        #  Preprocessing
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(stock_data['Close'].values.reshape(-1, 1))
-
-        X_train, y_train = [], []
-        time_step = 60
-        for i in range(time_step, len(scaled_data)):
-            X_train.append(scaled_data[i - time_step:i, 0])
-            y_train.append(scaled_data[i, 0])
-
-        X_train, y_train = np.array(X_train), np.array(y_train)
-        X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
-
-        #  Build and Train LSTM Model
-        model = Sequential([
-            LSTM(units=50, return_sequences=True, input_shape=(X_train.shape[1], 1)),
-            Dropout(0.2),
-            LSTM(units=50, return_sequences=False),
-            Dropout(0.2),
-            Dense(units=25),
-            Dense(units=1)
-        ])
-        model.compile(optimizer='adam', loss='mean_squared_error')
-        with st.spinner("Training model..."):
-            model.fit(X_train, y_train, epochs=50, batch_size=32, verbose=0)
-
-        #  Predict
-        test_data = scaled_data[-(time_step + 30):]
-        X_test = []
-        for i in range(time_step, len(test_data)):
-            X_test.append(test_data[i - time_step:i, 0])
-        X_test = np.array(X_test)
-        X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
-
-        predicted_prices = model.predict(X_test)
-        predicted_prices = scaler.inverse_transform(predicted_prices)
-
-        #  Plot
-        fig, ax = plt.subplots(figsize=(12, 6))
-        ax.plot(stock_data.index[-30:], stock_data['Close'].values[-30:], label="Actual", color="blue")
-        ax.plot(stock_data.index[-30:], predicted_prices, label="Predicted", color="red")
-        ax.set_title(f"{stock_symbol} Stock Price Prediction")
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Price")
-        ax.legend()
-        ax.grid()
-        st.pyplot(fig)
-    
\ No newline at end of file
+        st.info(f"🔄 Job {job.id} is preparing data...")
+    time.sleep(1)
+    st.rerun()
+
+elif job is not None and job.status == "failed":
+    st.error(job.error)
+
+elif job is not None:
+    result = job.result
+    stock_data = result["stock_data"]
+    predicted_prices = result["predicted_prices"]
+    stock_symbol = job.params["symbol"]
+
+    st.subheader("📊 Historical Stock Data")
+    st.line_chart(stock_data['Close'])
+
+    st.info(result["status"])
+    if result["epoch_log"]:
+        with st.expander("⏱️ Training Log"):
+            log = pd.DataFrame(result["epoch_log"]).set_index("epoch")
+            st.line_chart(log[["loss", "val_loss"]].dropna(axis=1, how="all"))
+            st.dataframe(log)
+            st.caption(f"Total training time: {log['seconds'].sum():.1f}s")
+
+    #  Plot
+    import matplotlib.pyplot as plt  # deferred: only needed once there is a result to draw
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(stock_data.index[-FORECAST_DAYS:], stock_data['Close'].values[-FORECAST_DAYS:], label="Actual", color="blue")
+    ax.plot(stock_data.index[-FORECAST_DAYS:], predicted_prices, label="Predicted", color="red")
+    ax.set_title(f"{stock_symbol} Stock Price Prediction")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Price")
+    ax.legend()
+    ax.grid()
+    st.pyplot(fig)
@@ -1,10 +1,17 @@
 import streamlit as st
-import fitz  # PyMuPDF
-import docx
-import requests
+import http_transport
 import json
-from github import Github
+import metrics
 from dotenv import load_dotenv
+from document_extraction import iter_sections
+from github_branches import BranchProvisioner
+from jira_writer import JiraWriter
+from llm_cache import cached_call, get_cache
+from ollama_client import GenerationStream
+from replanning import PlanState, diff_size, sync_plan
+from structured_output import TASK_MAP_SCHEMA, parse_stream
+from task_analysis import CHUNK_TOKENS, MAX_CONCURRENCY, chunk_sections, map_reduce_tasks
+from task_dedup import DEDUP_THRESHOLD, collapsed_count, dedupe_task_map
 import os
 
 # Load environment variables from .env file
@@ -12,31 +19,37 @@ load_dotenv()
 
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITHUB_REPO = os.getenv('GITHUB_REPO')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL')  # e.g. a GitHub Enterprise or mock server URL
 JIRA_BASE_URL = os.getenv('JIRA_BASE_URL')
 JIRA_EMAIL = os.getenv('JIRA_EMAIL')
 JIRA_API_TOKEN = os.getenv('JIRA_API_TOKEN')
 JIRA_PROJECT_KEY = os.getenv('JIRA_PROJECT_KEY')
 LLAMA_API_URL = os.getenv('LLAMA_API_URL')
+LLAMA_MODEL = "gemma3:1b"
 
 
 # === File Handling ===
+def upload_key(uploaded_file):
+    """Cache key for an upload: a re-upload gets a new file_id even under the same name."""
+    return uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def read_sections(file_key, _uploaded_file):
+    """Parsed sections of an upload, kept across reruns (the upload itself is not hashed)."""
+    return list(iter_sections(_uploaded_file))
+
+
 def extract_text_from_file(uploaded_file):
-    ext = uploaded_file.name.split('.')[-1].lower()
-    if ext == 'pdf':
-        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-        return "\n".join([page.get_text() for page in doc])
-    elif ext == 'docx':
-        doc = docx.Document(uploaded_file)
-        return "\n".join([para.text for para in doc.paragraphs])
-    elif ext == 'txt':
-        return uploaded_file.read().decode('utf-8')
-    else:
+    try:
+        return "\n".join(read_sections(upload_key(uploaded_file), uploaded_file))
+    except ValueError:
         st.error("Unsupported file format.")
         return ""
 
 # === LLaMA Analysis ===
-def analyze_with_llama(content):
-    prompt = f"""
+def build_prompt(content):
+    return f"""
 You are a project planning assistant.
 Given the following documentation, identify:
 1. Main tasks
@@ -52,40 +65,140 @@ Content:
 {content}
 """
 
-    response = requests.post(LLAMA_API_URL, json={
-        "model": "gemma3:1b",
-        "prompt": prompt,
-        "stream": False
-    })
-    
-    return response
+def analyze_with_llama(content, bypass_cache=False):
+    """Returns the model's reply, constrained by Ollama to a {main task: [sub-tasks]} JSON object."""
+    prompt = build_prompt(content)
+
+    @metrics.timer("llm", model=LLAMA_MODEL)
+    def call():
+        response = http_transport.llm_post(LLAMA_API_URL, json={
+            "model": LLAMA_MODEL,
+            "prompt": prompt,
+            "stream": False,
+            "format": TASK_MAP_SCHEMA
+        })
+        response.raise_for_status()
+        body = response.json()
+        metrics.record_tokens(LLAMA_MODEL, body.get("prompt_eval_count"), body.get("eval_count"))
+        return body.get("response", "")
+
+    return cached_call(call, LLAMA_API_URL, LLAMA_MODEL, prompt=prompt, format=TASK_MAP_SCHEMA, bypass=bypass_cache)
+
+def stream_with_llama(content, bypass_cache=False):
+    """analyze_with_llama() as a stream of text pieces; shares its cache entries."""
+    prompt = build_prompt(content)
+    payload = {"model": LLAMA_MODEL, "prompt": prompt, "stream": True, "format": TASK_MAP_SCHEMA}
+    cache_request = None if bypass_cache else {"prompt": prompt, "format": TASK_MAP_SCHEMA}
+    return GenerationStream(LLAMA_API_URL, payload, "response", cache_request)
+
+def stream_task_map(pieces):
+    """Show each main task as soon as the stream completes it; returns the TaskStreamParser."""
+    placeholder = st.empty()
+    with placeholder.container():
+        parser = parse_stream(pieces, on_task=lambda main, subs: st.markdown(f"📌 **{main}** ({len(subs)} sub-tasks)"))
+    placeholder.empty()
+    return parser
 
 # === Jira Creation ===
-def create_jira_task(summary, description, issue_type="Task", parent_id=None):
-    url = f"{JIRA_BASE_URL}/rest/api/3/issue"
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    auth = (JIRA_EMAIL, JIRA_API_TOKEN)
-
-    payload = {
-        "fields": {
-            "project": {"key": JIRA_PROJECT_KEY},
-            "summary": summary,
-            "description": description,
-            "issuetype": {"name": issue_type}
-        }
-    }
-    if parent_id and issue_type == "Sub-task":
-        payload["fields"]["parent"] = {"key": parent_id}
-
-    response = requests.post(url, json=payload, headers=headers, auth=auth)
-    return response.json().get('key')
+@st.cache_resource(show_spinner=False)
+def get_jira_writer(base_url=JIRA_BASE_URL, email=JIRA_EMAIL, api_token=JIRA_API_TOKEN, project_key=JIRA_PROJECT_KEY):
+    """One writer per server process and Jira config, so issue types are fetched only once."""
+    return JiraWriter(base_url, email, api_token, project_key)
+
+@metrics.timer("jira")
+def create_jira_plan(task_map):
+    """Create Stories for main tasks and Sub-tasks under them."""
+    writer = get_jira_writer()
+    created, errors = writer.create_plan(
+        task_map, "Story", "Sub-task", parent_description="Generated from LLaMA"
+    )
+    if writer.issue_types_error:
+        st.warning(f"⚠️ {writer.issue_types_error}")
+    for summary, error in errors:
+        st.error(f"❌ Failed to create Jira issue: {summary}")
+    return created
 
 # === GitHub Branch Creation ===
-def create_github_branch(branch_name, base='main'):
-    g = Github(GITHUB_TOKEN)
-    repo = g.get_repo(GITHUB_REPO)
-    source = repo.get_branch(base)
-    repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=source.commit.sha)
+@st.cache_resource(show_spinner=False)
+def get_branch_provisioner(base="main", token=GITHUB_TOKEN, repo_name=GITHUB_REPO, base_url=GITHUB_API_URL):
+    """One GitHub client per server process, repo and base; base SHA and branches are re-read on every call."""
+    return BranchProvisioner(token, repo_name, base, base_url=base_url)
+
+@metrics.timer("github")
+def create_github_branches(task_map, base="main"):
+    """Create a branch per main task and sub-task, skipping branches that already exist."""
+    from github import GithubException  # deferred: only needed once the user confirms
+
+    tasks = [task for main_task, sub_tasks in task_map.items() for task in [main_task, *sub_tasks]]
+    try:
+        results = get_branch_provisioner(base).provision(tasks)
+    except GithubException:
+        st.error(f"⚠️ Could not find base branch '{base}'. Check if it exists in your GitHub repo.")
+        st.stop()
+
+    for task, (branch, status) in results.items():
+        if status.startswith(("failed", "skipped")):
+            st.warning(f"⚠️ Branch '{branch}' for '{task}': {status}")
+    created = sum(1 for _, status in results.values() if status == "created")
+    existing = sum(1 for _, status in results.values() if status == "exists")
+    st.success(f"✅ Created {created} GitHub branches ({existing} already existed)")
+    return results
+
+# === Review ===
+def show_collapsed(collapsed):
+    """List which near-duplicate tasks were merged into which kept task."""
+    if not collapsed:
+        return
+    with st.expander(f"🧹 Collapsed {collapsed_count(collapsed)} near-duplicate tasks"):
+        for kept, dropped in collapsed:
+            st.markdown(f"**{kept}** ← " + " · ".join(dropped))
+
+# === Revision-Aware Sync ===
+def show_plan_diff(diff):
+    """List added, changed and removed tasks of a plan diff."""
+    if not diff_size(diff):
+        st.info("No task changes since the last sync.")
+        return
+    for main_task, sub_tasks in diff["added"].items():
+        st.markdown(f"➕ **{main_task}**" + (f" ({len(sub_tasks)} sub-tasks)" if sub_tasks else ""))
+    for main_task, change in diff["changed"].items():
+        st.markdown(f"✏️ **{main_task}**")
+        for sub in change["added"]:
+            st.markdown(f"  - ➕ {sub}")
+        for sub in change["removed"]:
+            st.markdown(f"  - ➖ {sub}")
+    for main_task, sub_tasks in diff["removed"].items():
+        st.markdown(f"➖ **{main_task}**" + (f" ({len(sub_tasks)} sub-tasks)" if sub_tasks else ""))
+
+@metrics.timer("sync")
+def sync_plan_changes(state, task_map, diff, base="main"):
+    """Push only what changed since the last sync: new issues/branches, retire removed ones."""
+    from github import GithubException  # deferred: only needed once the user confirms
+
+    try:
+        writer = get_jira_writer()
+        report = sync_plan(state, task_map, diff, writer, get_branch_provisioner(base),
+                           "Story", "Sub-task", parent_description="Generated from LLaMA")
+    except GithubException:
+        st.error(f"⚠️ Could not find base branch '{base}'. Check if it exists in your GitHub repo.")
+        st.stop()
+
+    if writer.issue_types_error:
+        st.warning(f"⚠️ {writer.issue_types_error}")
+    for summary, error in report["errors"]:
+        st.error(f"❌ Jira sync failed for: {summary}")
+        st.code(error)
+    for task, (branch, status) in report["branches"].items():
+        if status.startswith(("failed", "skipped")):
+            st.warning(f"⚠️ Branch '{branch}' for '{task}': {status}")
+    for branch, status in report["removed_branches"].items():
+        if status != "deleted":
+            st.warning(f"⚠️ Branch '{branch}' of a removed task: {status}")
+    created_branches = sum(1 for _, status in report["branches"].values() if status == "created")
+    deleted_branches = sum(1 for status in report["removed_branches"].values() if status == "deleted")
+    st.success(f"✅ Jira: {report['created']} created, {report['retired']} retired · "
+               f"GitHub: {created_branches} branches created, {deleted_branches} deleted")
+    return report
 
 # === Streamlit App ===
 st.set_page_config(page_title="Project Planning Automation (Local LLaMA)", layout="wide")
@@ -93,22 +206,75 @@ st.title("🧠 Project Planning Automation (Powered by Local LLaMA)")
 
 uploaded_file = st.file_uploader("📂 Upload project documentation (.pdf, .docx, .txt)", type=['pdf', 'docx', 'txt'])
 
+st.sidebar.header("⚙️ Analysis")
+map_reduce = st.sidebar.checkbox("Map-reduce mode for large documents", False)
+chunk_tokens = st.sidebar.number_input("Tokens per chunk", 500, 32000, CHUNK_TOKENS, step=500)
+max_concurrency = st.sidebar.number_input("Concurrent LLM requests", 1, 32, MAX_CONCURRENCY)
+bypass_cache = st.sidebar.checkbox("Bypass LLM response cache", False)
+revision_aware = st.sidebar.checkbox("Revision-aware mode: only re-analyze and re-sync changes", False)
+collapse_duplicates = st.sidebar.checkbox("Collapse near-duplicate tasks", True)
+dedup_threshold = st.sidebar.slider("Near-duplicate similarity threshold", 0.5, 1.0, DEDUP_THRESHOLD, 0.05,
+                                    disabled=not collapse_duplicates)
+show_timings = st.sidebar.checkbox("Show timing panel", False)
+cache_stats = get_cache().stats()
+st.sidebar.caption(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                   f"{cache_stats['entries']} entries")
+
 if uploaded_file:
-    with st.spinner("🔍 Extracting and analyzing..."):
-        content = extract_text_from_file(uploaded_file)
-        llama_response = analyze_with_llama(content)
-        # st.text_area("📄 Extracted Content", llama_response, height=300)
-
-        try:
-            task_map = json.loads(llama_response.text)
-        except json.JSONDecodeError:
-            st.error("❌ Failed to parse LLaMA response. Please check the model output.")
-            st.text("Raw LLaMA Response:")
-            st.text(llama_response.text)
+    plan_state = PlanState(uploaded_file.name)
+    failures = []
+    if revision_aware:
+        with st.spinner("🔍 Extracting and analyzing changed sections..."):
+            task_map, failures, stats = plan_state.analyze(
+                read_sections(upload_key(uploaded_file), uploaded_file),
+                lambda chunk: analyze_with_llama(chunk, bypass_cache), int(chunk_tokens), int(max_concurrency)
+            )
+
+        st.caption(f"{stats['chunks']} chunks: {stats['reused']} unchanged since the last upload, "
+                   f"{stats['analyzed']} sent for analysis.")
+        for chunk_index, error in failures:
+            st.warning(f"⚠️ Changed chunk {chunk_index + 1} could not be analyzed: {error}")
+        if not task_map:
+            st.error("❌ No tasks could be extracted from any chunk.")
+            st.stop()
+
+        st.subheader("📋 Review Extracted Tasks")
+    elif map_reduce:
+        with st.spinner("🔍 Extracting and analyzing in chunks..."):
+            sections = read_sections(upload_key(uploaded_file), uploaded_file)
+            chunks = list(chunk_sections(sections, int(chunk_tokens)))
+            task_map, failures = map_reduce_tasks(
+                chunks, lambda chunk: analyze_with_llama(chunk, bypass_cache), int(max_concurrency)
+            )
+
+        st.caption(f"Analyzed {len(chunks)} chunks with up to {int(max_concurrency)} concurrent requests.")
+        for chunk_index, error in failures:
+            st.warning(f"⚠️ Chunk {chunk_index + 1} could not be analyzed: {error}")
+        if not task_map:
+            st.error("❌ No tasks could be extracted from any chunk.")
             st.stop()
 
-    st.subheader("📋 Review Extracted Tasks")
-    st.text(llama_response.text)
+        st.subheader("📋 Review Extracted Tasks")
+    else:
+        with st.spinner("🔍 Extracting..."):
+            content = extract_text_from_file(uploaded_file)
+
+        st.subheader("📋 Review Extracted Tasks")
+        # Main tasks appear as the model finishes them; a cut-off reply keeps the complete ones
+        parser = stream_task_map(stream_with_llama(content, bypass_cache))
+        task_map = parser.task_map
+        if not parser.complete:
+            if not task_map:
+                st.error("❌ Failed to parse LLaMA response. Please check the model output.")
+                st.stop()
+            st.warning(f"⚠️ The LLaMA response was cut off; keeping the {len(task_map)} complete main tasks.")
+
+    # Near-duplicates would each cost a Jira issue and a branch
+    collapsed = []
+    if collapse_duplicates:
+        task_map, collapsed = dedupe_task_map(task_map, dedup_threshold)
+        show_collapsed(collapsed)
+
     st.markdown("### Extracted Tasks")
     st.text_area("Extracted Tasks", json.dumps(task_map, indent=2), height=300)
     st.markdown("### Summary of Tasks")
@@ -119,14 +285,28 @@ if uploaded_file:
             for sub in sub_tasks:
                 st.markdown(f"- [ ] {sub}")
 
-    if st.button("✅ Confirm and Create Jira + GitHub"):
+    if revision_aware:
+        # Removals are held back while some changed chunks could not be analyzed
+        diff = plan_state.diff(task_map, allow_removals=not failures)
+        st.subheader("🔀 Changes Since Last Sync")
+        show_plan_diff(diff)
+        if diff_size(diff) and st.button("✅ Sync Changes to Jira + GitHub"):
+            with st.spinner("🚀 Syncing changes..."):
+                sync_plan_changes(plan_state, task_map, diff)
+                # Counted on sync/create only, not on every rerun of the review
+                metrics.inc("tasks_collapsed", collapsed_count(collapsed))
+    elif st.button("✅ Confirm and Create Jira + GitHub"):
         with st.spinner("🚀 Creating tasks and branches..."):
-            for main_task, sub_tasks in task_map.items():
-                main_key = create_jira_task(main_task, "Generated from LLaMA", "Story")
-                create_github_branch(main_task.replace(" ", "-").lower())
-
-                for sub in sub_tasks:
-                    sub_key = create_jira_task(sub, f"Sub-task of {main_key}", "Sub-task", parent_id=main_key)
-                    create_github_branch(sub.replace(" ", "-").lower())
+            created = create_jira_plan(task_map)
+            # Lets a later revision-aware run push only what changed; saved before GitHub can fail
+            plan_state.record_created(created, {})
+            branch_results = create_github_branches(task_map)
+            plan_state.record_created(created, branch_results)
+            metrics.inc("tasks_collapsed", collapsed_count(collapsed))
         st.success("✅ Jira and GitHub setup completed successfully!")
 
+# === Timings ===
+if show_timings:
+    st.sidebar.dataframe(metrics.timing_rows(), hide_index=True)
+metrics.flush("automation")
+
@@ -1,11 +1,16 @@
 import streamlit as st
-import requests
+import http_transport
 import json
-import fitz  # PyMuPDF
-import docx
-import re
-from github import Github
+import metrics
 from dotenv import load_dotenv
+from document_extraction import iter_sections
+from github_branches import BranchProvisioner
+from jira_writer import JiraWriter
+from llm_cache import cache_key, cached_call, get_cache
+from replanning import PlanState, diff_size, sync_plan
+from structured_output import groq_response_format, parse_stream
+from task_analysis import CHUNK_TOKENS, MAX_CONCURRENCY, chunk_sections, map_reduce_tasks
+from task_dedup import DEDUP_THRESHOLD, collapsed_count, dedupe_task_map
 import os
 
 # === Configuration ===
@@ -16,28 +21,34 @@ GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')  # Default model
 
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITHUB_REPO = os.getenv('GITHUB_REPO')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL')  # e.g. a GitHub Enterprise or mock server URL
 JIRA_BASE_URL = os.getenv('JIRA_BASE_URL')
 JIRA_EMAIL = os.getenv('JIRA_EMAIL')
 JIRA_API_TOKEN = os.getenv('JIRA_API_TOKEN')
 JIRA_PROJECT_KEY = os.getenv('JIRA_PROJECT_KEY')
 
 # === File Handling ===
+def upload_key(uploaded_file):
+    """Cache key for an upload: a re-upload gets a new file_id even under the same name."""
+    return uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def read_sections(file_key, _uploaded_file):
+    """Parsed sections of an upload, kept across reruns (the upload itself is not hashed)."""
+    return list(iter_sections(_uploaded_file))
+
+
 def extract_text_from_file(uploaded_file):
-    ext = uploaded_file.name.split('.')[-1].lower()
-    if ext == 'pdf':
-        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-        return "\n".join([page.get_text() for page in doc])
-    elif ext == 'docx':
-        doc = docx.Document(uploaded_file)
-        return "\n".join([para.text for para in doc.paragraphs])
-    elif ext == 'txt':
-        return uploaded_file.read().decode('utf-8')
-    else:
+    try:
+        return "\n".join(read_sections(upload_key(uploaded_file), uploaded_file))
+    except ValueError:
         st.error("Unsupported file format.")
         return ""
 
 # === LLM via Groq ===
-def analyze_with_groq(content):
+def groq_request(content):
+    """(url, headers, payload) of a planning request in Groq's JSON mode."""
     url = "https://api.groq.com/openai/v1/chat/completions"
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -67,98 +78,177 @@ Document:
             {"role": "user", "content": prompt}
         ],
         "temperature": 0.3,
-        "max_tokens": 1024
+        "max_tokens": 1024,
+        "response_format": groq_response_format()
     }
-
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    return response.json()['choices'][0]['message']['content']
+    return url, headers, payload
+
+def _groq_cache_key(url, payload):
+    return cache_key(url, GROQ_MODEL, messages=payload["messages"], temperature=payload["temperature"],
+                     max_tokens=payload["max_tokens"], response_format=payload["response_format"])
+
+def analyze_with_groq(content, bypass_cache=False):
+    url, headers, payload = groq_request(content)
+
+    @metrics.timer("llm", model=GROQ_MODEL)
+    def call():
+        response = http_transport.llm_post(url, headers=headers, json=payload)
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage", {})
+        metrics.record_tokens(GROQ_MODEL, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return body['choices'][0]['message']['content']
+
+    return cached_call(call, url, GROQ_MODEL, messages=payload["messages"], temperature=payload["temperature"],
+                       max_tokens=payload["max_tokens"], response_format=payload["response_format"],
+                       bypass=bypass_cache)
+
+def stream_with_groq(content, bypass_cache=False):
+    """analyze_with_groq() as a generator of text pieces (server-sent events); shares its cache entries."""
+    url, headers, payload = groq_request(content)
+    key = _groq_cache_key(url, payload) if get_cache().enabled and not bypass_cache else None
+    cached = get_cache().get(key) if key else None
+    if cached is not None:
+        yield cached
+        return
+
+    text = ""
+    with metrics.timer("llm", model=GROQ_MODEL):
+        response = http_transport.llm_post(url, headers=headers, json={**payload, "stream": True}, stream=True)
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                if line == b"data: [DONE]":
+                    break
+                chunk = json.loads(line[len(b"data: "):])
+                usage = chunk.get("x_groq", {}).get("usage")
+                if usage:
+                    metrics.record_tokens(GROQ_MODEL, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                for choice in chunk.get("choices", []):
+                    piece = (choice.get("delta") or {}).get("content")
+                    if piece:
+                        text += piece
+                        yield piece
+        finally:
+            response.close()
+    if key:
+        get_cache().put(key, text)
+
+def stream_task_map(pieces):
+    """Show each main task as soon as the stream completes it; returns the TaskStreamParser."""
+    placeholder = st.empty()
+    with placeholder.container():
+        parser = parse_stream(pieces, on_task=lambda main, subs: st.markdown(f"📌 **{main}** ({len(subs)} sub-tasks)"))
+    placeholder.empty()
+    return parser
 
 # === Jira Creation ===
-def get_valid_issue_types():
-    """Fetch valid Jira issue types."""
-    url = f"{JIRA_BASE_URL}/rest/api/3/issuetype"
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    auth = (JIRA_EMAIL, JIRA_API_TOKEN)
-
-    response = requests.get(url, headers=headers, auth=auth)
-    if response.status_code == 200:
-        return {item['name']: item['id'] for item in response.json()}
-    else:
-        st.warning("⚠️ Could not fetch issue types from Jira.")
-        return {}
-
-
-def create_jira_task(summary, description, issue_type="Epic", parent_id=None):
-    st.write(f"📝 Creating Jira {issue_type}: {summary}")
-
-    url = f"{JIRA_BASE_URL}/rest/api/3/issue"
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    auth = (JIRA_EMAIL, JIRA_API_TOKEN)
-
-    # Detect allowed issue types
-    issue_types = get_valid_issue_types()
-    if issue_type not in issue_types:
-        st.warning(f"⚠️ Issue type '{issue_type}' not found. Falling back to 'Task'.")
-        issue_type = "Epic"
-
-    issue_type_name = "Task" if parent_id else issue_type
+@st.cache_resource(show_spinner=False)
+def get_jira_writer(base_url=JIRA_BASE_URL, email=JIRA_EMAIL, api_token=JIRA_API_TOKEN, project_key=JIRA_PROJECT_KEY):
+    """One writer per server process and Jira config, so issue types are fetched only once."""
+    return JiraWriter(base_url, email, api_token, project_key)
+
+
+@metrics.timer("jira")
+def create_jira_plan(task_map):
+    """Create Epics for main tasks and Tasks under them, reporting failures on the page."""
+    writer = get_jira_writer()
+    created, errors = writer.create_plan(
+        task_map, "Epic", "Task", parent_description="Created from Groq response"
+    )
+    if writer.issue_types_error:
+        st.warning(f"⚠️ {writer.issue_types_error}")
+    for summary, error in errors:
+        st.error(f"❌ Failed to create Jira issue: {summary}")
+        st.code(error)
+    count = sum(bool(key) + sum(1 for sub_key in subs.values() if sub_key) for key, subs in created.values())
+    st.success(f"✅ Created {count} Jira issues")
+    return created
 
-    payload = {
-        "fields": {
-            "project": {"key": JIRA_PROJECT_KEY},
-            "summary": summary,
-            "description": {
-                "type": "doc",
-                "version": 1,
-                "content": [
-                    {
-                        "type": "paragraph",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": description
-                            }
-                        ]
-                    }
-                ]
-            },
-            "issuetype": {"name": issue_type_name}
-        }
-    }
+# === GitHub Branch Creation ===
+@st.cache_resource(show_spinner=False)
+def get_branch_provisioner(base="main", token=GITHUB_TOKEN, repo_name=GITHUB_REPO, base_url=GITHUB_API_URL):
+    """One GitHub client per server process, repo and base; base SHA and branches are re-read on every call."""
+    return BranchProvisioner(token, repo_name, base, base_url=base_url)
 
-    if parent_id:
-        payload["fields"]["parent"] = {"key": parent_id}
 
-    response = requests.post(url, json=payload, headers=headers, auth=auth)
+@metrics.timer("github")
+def create_github_branches(task_map, base="main"):
+    """Create a branch per main task and sub-task, skipping branches that already exist."""
+    from github import GithubException  # deferred: only needed once the user confirms
 
-    if response.status_code == 201:
-        issue_key = response.json().get('key')
-        st.success(f"✅ Created Jira {issue_type_name}: {issue_key}")
-        return issue_key
-    else:
-        st.error(f"❌ Failed to create Jira {issue_type_name}: {summary}")
-        st.code(response.text)
-        return None
+    tasks = [task for main_task, sub_tasks in task_map.items() for task in [main_task, *sub_tasks]]
+    try:
+        results = get_branch_provisioner(base).provision(tasks)
+    except GithubException:
+        st.error(f"⚠️ Could not find base branch '{base}'. Check if it exists in your GitHub repo.")
+        st.stop()
 
-# === GitHub Branch Creation ===
-def create_github_branch(branch_name, base="main"):
-    g = Github(GITHUB_TOKEN)
-    repo = g.get_repo(GITHUB_REPO)
+    for task, (branch, status) in results.items():
+        if status.startswith(("failed", "skipped")):
+            st.warning(f"⚠️ Branch '{branch}' for '{task}': {status}")
+    created = sum(1 for _, status in results.values() if status == "created")
+    existing = sum(1 for _, status in results.values() if status == "exists")
+    st.success(f"✅ Created {created} GitHub branches ({existing} already existed)")
+    return results
+
+# === Review ===
+def show_collapsed(collapsed):
+    """List which near-duplicate tasks were merged into which kept task."""
+    if not collapsed:
+        return
+    with st.expander(f"🧹 Collapsed {collapsed_count(collapsed)} near-duplicate tasks"):
+        for kept, dropped in collapsed:
+            st.markdown(f"**{kept}** ← " + " · ".join(dropped))
+
+# === Revision-Aware Sync ===
+def show_plan_diff(diff):
+    """List added, changed and removed tasks of a plan diff."""
+    if not diff_size(diff):
+        st.info("No task changes since the last sync.")
+        return
+    for main_task, sub_tasks in diff["added"].items():
+        st.markdown(f"➕ **{main_task}**" + (f" ({len(sub_tasks)} sub-tasks)" if sub_tasks else ""))
+    for main_task, change in diff["changed"].items():
+        st.markdown(f"✏️ **{main_task}**")
+        for sub in change["added"]:
+            st.markdown(f"  - ➕ {sub}")
+        for sub in change["removed"]:
+            st.markdown(f"  - ➖ {sub}")
+    for main_task, sub_tasks in diff["removed"].items():
+        st.markdown(f"➖ **{main_task}**" + (f" ({len(sub_tasks)} sub-tasks)" if sub_tasks else ""))
+
+@metrics.timer("sync")
+def sync_plan_changes(state, task_map, diff, base="main"):
+    """Push only what changed since the last sync: new issues/branches, retire removed ones."""
+    from github import GithubException  # deferred: only needed once the user confirms
 
     try:
-        source = repo.get_branch(base)
-    except Exception as e:
+        writer = get_jira_writer()
+        report = sync_plan(state, task_map, diff, writer, get_branch_provisioner(base),
+                           "Epic", "Task", parent_description="Created from Groq response")
+    except GithubException:
         st.error(f"⚠️ Could not find base branch '{base}'. Check if it exists in your GitHub repo.")
         st.stop()
 
-    repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=source.commit.sha)
+    if writer.issue_types_error:
+        st.warning(f"⚠️ {writer.issue_types_error}")
+    for summary, error in report["errors"]:
+        st.error(f"❌ Jira sync failed for: {summary}")
+        st.code(error)
+    for task, (branch, status) in report["branches"].items():
+        if status.startswith(("failed", "skipped")):
+            st.warning(f"⚠️ Branch '{branch}' for '{task}': {status}")
+    for branch, status in report["removed_branches"].items():
+        if status != "deleted":
+            st.warning(f"⚠️ Branch '{branch}' of a removed task: {status}")
+    created_branches = sum(1 for _, status in report["branches"].values() if status == "created")
+    deleted_branches = sum(1 for status in report["removed_branches"].values() if status == "deleted")
+    st.success(f"✅ Jira: {report['created']} created, {report['retired']} retired · "
+               f"GitHub: {created_branches} branches created, {deleted_branches} deleted")
+    return report
 
 # === Streamlit UI ===
 st.set_page_config(page_title="Project Planning Automation (Groq)", layout="wide")
@@ -166,23 +256,69 @@ st.title("🧠 Project Planning Automation (Groq + Streamlit)")
 
 uploaded_file = st.file_uploader("📂 Upload your project doc (.pdf, .docx, .txt)", type=['pdf', 'docx', 'txt'])
 
-if uploaded_file:
-    with st.spinner("📖 Reading and analyzing..."):
-        content = extract_text_from_file(uploaded_file)
-        llama_response = analyze_with_groq(content)
+st.sidebar.header("⚙️ Analysis")
+map_reduce = st.sidebar.checkbox("Map-reduce mode for large documents", False)
+chunk_tokens = st.sidebar.number_input("Tokens per chunk", 500, 32000, CHUNK_TOKENS, step=500)
+max_concurrency = st.sidebar.number_input("Concurrent LLM requests", 1, 32, MAX_CONCURRENCY)
+bypass_cache = st.sidebar.checkbox("Bypass LLM response cache", False)
+revision_aware = st.sidebar.checkbox("Revision-aware mode: only re-analyze and re-sync changes", False)
+collapse_duplicates = st.sidebar.checkbox("Collapse near-duplicate tasks", True)
+dedup_threshold = st.sidebar.slider("Near-duplicate similarity threshold", 0.5, 1.0, DEDUP_THRESHOLD, 0.05,
+                                    disabled=not collapse_duplicates)
+show_timings = st.sidebar.checkbox("Show timing panel", False)
+cache_stats = get_cache().stats()
+st.sidebar.caption(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                   f"{cache_stats['entries']} entries")
 
-    try:
-        # Extract JSON from text using regex
-        match = re.search(r"\{[\s\S]*\}", llama_response)
-        if not match:
-            raise ValueError("No JSON found in response.")
-        clean_json = match.group()
-        task_map = json.loads(clean_json)
-
-    except Exception as e:
-        st.error("⚠️ Groq model returned invalid JSON. Here's the raw output:")
-        st.code(llama_response)
-        st.stop()
+if uploaded_file:
+    plan_state = PlanState(uploaded_file.name)
+    failures = []
+    if revision_aware:
+        with st.spinner("📖 Reading and analyzing changed sections..."):
+            task_map, failures, stats = plan_state.analyze(
+                read_sections(upload_key(uploaded_file), uploaded_file),
+                lambda chunk: analyze_with_groq(chunk, bypass_cache), int(chunk_tokens), int(max_concurrency)
+            )
+
+        st.caption(f"{stats['chunks']} chunks: {stats['reused']} unchanged since the last upload, "
+                   f"{stats['analyzed']} sent for analysis.")
+        for chunk_index, error in failures:
+            st.warning(f"⚠️ Changed chunk {chunk_index + 1} could not be analyzed: {error}")
+        if not task_map:
+            st.error("⚠️ No tasks could be extracted from any chunk.")
+            st.stop()
+    elif map_reduce:
+        with st.spinner("📖 Reading and analyzing in chunks..."):
+            sections = read_sections(upload_key(uploaded_file), uploaded_file)
+            chunks = list(chunk_sections(sections, int(chunk_tokens)))
+            task_map, failures = map_reduce_tasks(
+                chunks, lambda chunk: analyze_with_groq(chunk, bypass_cache), int(max_concurrency)
+            )
+
+        st.caption(f"Analyzed {len(chunks)} chunks with up to {int(max_concurrency)} concurrent requests.")
+        for chunk_index, error in failures:
+            st.warning(f"⚠️ Chunk {chunk_index + 1} could not be analyzed: {error}")
+        if not task_map:
+            st.error("⚠️ No tasks could be extracted from any chunk.")
+            st.stop()
+    else:
+        with st.spinner("📖 Reading..."):
+            content = extract_text_from_file(uploaded_file)
+
+        # Main tasks appear as the model finishes them; a cut-off reply keeps the complete ones
+        parser = stream_task_map(stream_with_groq(content, bypass_cache))
+        task_map = parser.task_map
+        if not parser.complete:
+            if not task_map:
+                st.error("⚠️ Groq model returned no complete task. Try again or use map-reduce mode.")
+                st.stop()
+            st.warning(f"⚠️ The Groq response was cut off; keeping the {len(task_map)} complete main tasks.")
+
+    # Near-duplicates would each cost a Jira issue and a branch
+    collapsed = []
+    if collapse_duplicates:
+        task_map, collapsed = dedupe_task_map(task_map, dedup_threshold)
+        show_collapsed(collapsed)
 
     st.subheader("📋 Review Extracted Tasks")
     for main_task, sub_tasks in task_map.items():
@@ -190,15 +326,28 @@ if uploaded_file:
             for sub in sub_tasks:
                 st.markdown(f"- [ ] {sub}")
 
-    if st.button("✅ Confirm & Create Jira + GitHub"):
+    if revision_aware:
+        # Removals are held back while some changed chunks could not be analyzed
+        diff = plan_state.diff(task_map, allow_removals=not failures)
+        st.subheader("🔀 Changes Since Last Sync")
+        show_plan_diff(diff)
+        if diff_size(diff) and st.button("✅ Sync Changes to Jira + GitHub"):
+            with st.spinner("⏳ Syncing changes..."):
+                sync_plan_changes(plan_state, task_map, diff)
+                # Counted on sync/create only, not on every rerun of the review
+                metrics.inc("tasks_collapsed", collapsed_count(collapsed))
+    elif st.button("✅ Confirm & Create Jira + GitHub"):
         with st.spinner("⏳ Creating Jira tickets and GitHub branches..."):
-            for main_task, sub_tasks in task_map.items():
-                # ✅ Use "Task" instead of "Story"
-                main_key = create_jira_task(main_task, "Created from Groq response", "Epic")
-                create_github_branch(main_task.replace(" ", "-").lower())
-
-                for sub in sub_tasks:
-                    sub_key = create_jira_task(sub, f"Sub-task of {main_key}", "Task", parent_id=main_key)
-                    create_github_branch(sub.replace(" ", "-").lower())
+            created = create_jira_plan(task_map)
+            # Lets a later revision-aware run push only what changed; saved before GitHub can fail
+            plan_state.record_created(created, {})
+            branch_results = create_github_branches(task_map)
+            plan_state.record_created(created, branch_results)
+            metrics.inc("tasks_collapsed", collapsed_count(collapsed))
         st.success("🎉 Jira tickets and GitHub branches created!")
 
+# === Timings ===
+if show_timings:
+    st.sidebar.dataframe(metrics.timing_rows(), hide_index=True)
+metrics.flush("automationgroq")
+
@@ -0,0 +1,134 @@
+"""
+Headless multi-symbol forecasting.
+
+Runs the same download -> scale -> train -> predict pipeline as app.py for every
+symbol in a watchlist, spread over a process pool, and writes one consolidated CSV.
+
+Usage:
+    python batch_forecast.py SUZLON.NS TCS.NS --start 2023-04-03 --end 2025-04-04
+    python batch_forecast.py --symbols-file watchlist.txt --output forecasts.csv
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import metrics
+
+
+# === Worker ===
+def _init_worker(threads):
+    # Must run before TensorFlow is imported in this process so the limits take effect
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def forecast_symbol(symbol, start, end, features=("Close",), retrain=False, offline=False):
+    """Run the full pipeline for one symbol and return a list of result rows."""
+    from lstm_model import FORECAST_DAYS, TIME_STEP, forecast_tail, select_features, train_or_update
+    from model_registry import ModelRegistry
+    from price_cache import load_prices
+
+    started = time.perf_counter()
+    with metrics.timer("load_prices"):
+        stock_data = load_prices(symbol, start, end, offline=offline)
+    if len(stock_data) <= TIME_STEP + FORECAST_DAYS:
+        raise ValueError(f"Only {len(stock_data)} rows of data for {symbol}.")
+
+    feature_columns = select_features(features)
+    target_index = feature_columns.index("Close")
+    with metrics.timer("train"):
+        model, scaler, scaled_data, status = train_or_update(
+            ModelRegistry(), symbol, stock_data, feature_columns, TIME_STEP, retrain=retrain
+        )
+    with metrics.timer("predict"):
+        predicted = forecast_tail(model, scaler, scaled_data, target_index, TIME_STEP, FORECAST_DAYS)
+
+    elapsed = time.perf_counter() - started
+    tail = stock_data.iloc[-FORECAST_DAYS:]
+    return [
+        {
+            "symbol": symbol,
+            "date": date.date().isoformat(),
+            "actual": float(actual),
+            "predicted": float(pred),
+            "status": status,
+            "seconds": round(elapsed, 2),
+        }
+        for date, actual, pred in zip(tail.index, tail["Close"].values, predicted)
+    ]
+
+
+# === Batch Runner ===
+def run_batch(symbols, start, end, output, workers=None, threads_per_worker=None, **options):
+    cores = os.cpu_count() or 1
+    workers = workers or min(len(symbols), cores)
+    threads_per_worker = threads_per_worker or max(1, cores // workers)
+
+    rows, errors = [], []
+    # 'spawn' so each worker starts TensorFlow fresh with its own thread limits
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+        futures = {pool.submit(metrics.collect, forecast_symbol, s, start, end, **options): s for s in symbols}
+        for done, future in enumerate(as_completed(futures), 1):
+            symbol = futures[future]
+            try:
+                symbol_rows, worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+                rows.extend(symbol_rows)
+                print(f"[{done}/{len(symbols)}] ✅ {symbol}")
+            except Exception as e:
+                errors.append({"symbol": symbol, "error": str(e)})
+                print(f"[{done}/{len(symbols)}] ❌ {symbol}: {e}")
+
+    frame = pd.DataFrame(rows, columns=["symbol", "date", "actual", "predicted", "status", "seconds"])
+    frame.sort_values(["symbol", "date"]).to_csv(output, index=False)
+    if errors:
+        pd.DataFrame(errors).to_csv(os.path.splitext(output)[0] + "_errors.csv", index=False)
+    print(f"\nSaved {len(frame)} rows for {len(symbols) - len(errors)} symbols to: {output}")
+    return frame, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast many stock symbols in parallel.")
+    parser.add_argument("symbols", nargs="*", help="Stock symbols, e.g. SUZLON.NS")
+    parser.add_argument("--symbols-file", help="Text file with one symbol per line")
+    parser.add_argument("--start", default="2023-04-03")
+    parser.add_argument("--end", default="2025-04-04")
+    parser.add_argument("--features", default="Close", help="Comma-separated OHLCV columns")
+    parser.add_argument("--output", default="forecasts.csv")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU cores)")
+    parser.add_argument("--threads-per-worker", type=int, help="TensorFlow threads per worker")
+    parser.add_argument("--retrain", action="store_true", help="Ignore saved models")
+    parser.add_argument("--offline", action="store_true", help="Use cached prices only")
+    args = parser.parse_args()
+
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file, "r", encoding="utf-8") as f:
+            symbols += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        parser.error("No symbols given.")
+
+    metrics.flush_at_exit("batch_forecast")
+    run_batch(
+        symbols, args.start, args.end, args.output,
+        workers=args.workers, threads_per_worker=args.threads_per_worker,
+        features=tuple(args.features.split(",")), retrain=args.retrain, offline=args.offline,
+    )
+
+
+if __name__ == "__main__":
+    main()
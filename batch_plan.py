@@ -0,0 +1,406 @@
+"""
+Headless planning for many project documents: extract -> LLM analysis -> Jira -> GitHub.
+
+Documents move through the same stages as the Streamlit pages, concurrently on asyncio.
+Each backend has its own limit on requests in flight (LLM chunk analyses, Jira and
+GitHub calls). The blocking clients run in a shared thread pool. Progress is kept in a
+sqlite work queue, one row per document, updated after every stage. A crashed or
+interrupted run picks up where it stopped, and LLM replies come from the response cache.
+A document interrupted while its Jira issues were being created is marked failed
+instead of being retried, because a retry could duplicate issues; check it, then use
+--retry-failed. A document that finished with failed issues or branches is picked up
+again by every run, and only what failed is created. Chunk analyses and created issues/branches are also recorded in the
+document's replanning.PlanState. A document whose content changed since it was queued
+is analyzed again and synced against that state: only added or changed tasks get
+issues and branches, and removed ones are retired. That state is named by the document's path relative to the scanned directory, so files
+with the same name in different subdirectories keep separate state.
+Near-duplicate tasks in a document's plan are collapsed (task_dedup) before anything
+is created; --dedup-threshold 0 turns that off.
+
+Usage:
+    python batch_plan.py specs/
+    python batch_plan.py specs/ --llm-concurrency 8 --jira-concurrency 2 --github-concurrency 4
+    python batch_plan.py specs/ --analyze-only          # stop before Jira/GitHub
+    python batch_plan.py specs/ --retry-failed --report run.json
+
+Against local stand-ins (see mock_servers.py):
+    OLLAMA_URL=http://127.0.0.1:11434 JIRA_BASE_URL=http://127.0.0.1:8081 \\
+    GITHUB_API_URL=http://127.0.0.1:8082 GITHUB_REPO=demo/project \\
+    GITHUB_SECONDS_BETWEEN_REQUESTS=0 GITHUB_SECONDS_BETWEEN_WRITES=0 python batch_plan.py specs/
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+import metrics
+from batch_summarize import find_documents
+from document_extraction import file_hash, iter_sections
+from ollama_client import OLLAMA_MODEL, OLLAMA_URL, OllamaClient
+from replanning import PlanState, _hash, stable_chunks, sync_plan
+from structured_output import TASK_MAP_SCHEMA
+from task_analysis import CHUNK_TOKENS, merge_task_maps, parse_task_map
+from task_dedup import DEDUP_THRESHOLD, collapsed_count, dedupe_task_map
+
+# === Configuration ===
+load_dotenv()
+
+PLAN_QUEUE_PATH = os.getenv('PLAN_QUEUE_PATH', '.plan_queue.sqlite')
+LLM_CONCURRENCY = 4
+JIRA_CONCURRENCY = 2
+GITHUB_CONCURRENCY = 4
+EXTRACT_CONCURRENCY = os.cpu_count() or 1
+
+JIRA_BASE_URL = os.getenv('JIRA_BASE_URL')
+JIRA_EMAIL = os.getenv('JIRA_EMAIL')
+JIRA_API_TOKEN = os.getenv('JIRA_API_TOKEN')
+JIRA_PROJECT_KEY = os.getenv('JIRA_PROJECT_KEY')
+GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+GITHUB_REPO = os.getenv('GITHUB_REPO')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL')  # e.g. a GitHub Enterprise or mock server URL
+
+PLAN_PROMPT = """
+You are a project planning assistant.
+Given the following documentation, identify:
+1. Main tasks
+2. Sub-tasks for each main task
+
+Return the result in this JSON format:
+{{
+  "Main Task 1": ["Sub-task 1.1", "Sub-task 1.2"],
+  "Main Task 2": ["Sub-task 2.1", "Sub-task 2.2"]
+}}
+
+Content:
+{content}
+"""
+
+# Stages a document has completed, in order
+PENDING, ANALYZED, JIRA_STARTED, JIRA_DONE, DONE = "pending", "analyzed", "jira_started", "jira_done", "done"
+
+
+# === Work Queue ===
+class PlanQueue:
+    """
+    Persistent per-document progress: status (the last completed stage), the stage results
+    and the last error. A row with an error is failed and is skipped until retried, unless
+    it is done: then only some issues or branches failed, and syncing it again is safe.
+    """
+
+    def __init__(self, path=PLAN_QUEUE_PATH):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, sha256 TEXT, status TEXT NOT NULL,"
+            " task_map TEXT, jira TEXT, branches TEXT, error TEXT, seconds REAL, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def add(self, paths):
+        """Queue documents not seen before and requeue ones whose content changed; returns how many."""
+        now = time.time()
+        known = dict(self._conn.execute("SELECT path, sha256 FROM documents"))
+        queued = 0
+        for path in paths:
+            digest = file_hash(path)
+            if path not in known:
+                self._conn.execute(
+                    "INSERT INTO documents (path, sha256, status, seconds, updated) VALUES (?, ?, ?, 0, ?)",
+                    (path, digest, PENDING, now),
+                )
+            elif known[path] != digest:
+                # A revision starts over; an interrupted Jira stage still needs checking first
+                self._conn.execute(
+                    "UPDATE documents SET sha256 = ?, status = ?, task_map = NULL, jira = NULL, branches = NULL,"
+                    " error = CASE WHEN status = ? THEN error END, updated = ? WHERE path = ?",
+                    (digest, PENDING, JIRA_STARTED, now, path),
+                )
+            else:
+                continue
+            queued += 1
+        self._conn.commit()
+        return queued
+
+    def recover(self):
+        """Fail documents a previous run left in the middle of Jira creation; returns their paths."""
+        paths = [row[0] for row in self._conn.execute(
+            "SELECT path FROM documents WHERE status = ? AND error IS NULL", (JIRA_STARTED,))]
+        for path in paths:
+            self.update(path, error="Interrupted while creating Jira issues; check for partial issues, "
+                                    "then run again with --retry-failed")
+        return paths
+
+    def retry_failed(self):
+        """Clear the error of failed documents so they run again (done ones are retried anyway)."""
+        self._conn.execute("UPDATE documents SET error = NULL WHERE error IS NOT NULL AND status != ?", (DONE,))
+        self._conn.commit()
+
+    def pending(self):
+        """[(path, status, task_map, jira)] of unfinished, unfailed documents and of those done with errors."""
+        rows = self._conn.execute(
+            "SELECT path, status, task_map, jira FROM documents"
+            " WHERE (status != ? AND error IS NULL) OR (status = ? AND error IS NOT NULL) ORDER BY path",
+            (DONE, DONE),
+        )
+        return [(path, status, json.loads(task_map or "null"), json.loads(jira or "null"))
+                for path, status, task_map, jira in rows]
+
+    def update(self, path, seconds=0.0, **fields):
+        """Store stage results (JSON-encoded) and add seconds to the document's processing time."""
+        values = {k: json.dumps(v) if k in ("task_map", "jira", "branches") else v for k, v in fields.items()}
+        assignments = "".join(f"{k} = ?, " for k in values)
+        self._conn.execute(
+            f"UPDATE documents SET {assignments}seconds = seconds + ?, updated = ? WHERE path = ?",
+            (*values.values(), seconds, time.time(), path),
+        )
+        self._conn.commit()
+
+    def counts(self):
+        """Documents per status; failed ones count as "failed" ("done_with_errors" once done)."""
+        rows = self._conn.execute(
+            "SELECT CASE WHEN error IS NULL THEN status WHEN status = ? THEN 'done_with_errors' ELSE 'failed' END,"
+            " COUNT(*) FROM documents GROUP BY 1", (DONE,)
+        )
+        return dict(rows.fetchall())
+
+    def close(self):
+        self._conn.close()
+
+
+# === Pipeline ===
+class BatchPlanner:
+    """Runs queued documents through the stages with one semaphore per backend."""
+
+    def __init__(self, queue, llm, jira=None, github=None, chunk_tokens=CHUNK_TOKENS,
+                 llm_concurrency=LLM_CONCURRENCY, jira_concurrency=JIRA_CONCURRENCY,
+                 github_concurrency=GITHUB_CONCURRENCY, extract_concurrency=EXTRACT_CONCURRENCY,
+                 dedup_threshold=DEDUP_THRESHOLD, root=None):
+        self.queue = queue
+        self.root = root
+        self.llm = llm
+        self.jira = jira
+        self.github = github
+        self.chunk_tokens = chunk_tokens
+        self.dedup_threshold = dedup_threshold
+        self.limits = {"extract": extract_concurrency, "llm": llm_concurrency, "jira": jira_concurrency,
+                       "github": github_concurrency}
+        self._executor = ThreadPoolExecutor(max_workers=sum(self.limits.values()))
+        # Large PDFs from every extraction thread share one pool. Spawned rather than forked,
+        # because this process has an event loop, threads and open connections.
+        self._pdf_pool = ProcessPoolExecutor(max_workers=extract_concurrency,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._semaphores = {}
+
+    async def _run(self, backend, fn, *args):
+        """fn(*args) in the thread pool, with at most the backend's limit running at once."""
+        queued = time.perf_counter()
+        async with self._semaphores[backend]:
+            # Time spent waiting for a slot shows which limit is the bottleneck
+            metrics.observe("wait", time.perf_counter() - queued, backend=backend)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def plan_state(self, path):
+        """The document's PlanState, named by its path relative to root (its file name if there is no root)."""
+        return PlanState(os.path.relpath(path, self.root) if self.root else os.path.basename(path))
+
+    # --- Stages ---
+    async def analyze(self, path):
+        sections = await self._run("extract", lambda: list(iter_sections(path, pool=self._pdf_pool)))
+        chunks = list(stable_chunks(sections, self.chunk_tokens))
+        replies = await asyncio.gather(*(
+            self._run("llm", lambda chunk=chunk: self.llm.generate(PLAN_PROMPT.format(content=chunk),
+                                                                   format=TASK_MAP_SCHEMA))
+            for chunk in chunks
+        ))
+        task_maps = [parse_task_map(reply) for reply in replies]
+
+        # A later revision of this document only needs its changed chunks analyzed
+        state = self.plan_state(path)
+        state.chunks = {_hash(chunk): task_map for chunk, task_map in zip(chunks, task_maps)}
+        state.save()
+        task_map = merge_task_maps(task_maps)
+        if self.dedup_threshold:
+            task_map, collapsed = dedupe_task_map(task_map, self.dedup_threshold)
+            metrics.inc("tasks_collapsed", collapsed_count(collapsed))
+        return task_map
+
+    @metrics.timer("jira")
+    async def create_issues(self, task_map):
+        """JiraWriter.create_plan(); returns ({main: [key, {sub: key}]}, errors)."""
+        created, errors = await self._run("jira", self.jira.create_plan, task_map, "Epic", "Task",
+                                          "Created by batch planner")
+        return {main: [key, subs] for main, (key, subs) in created.items()}, errors
+
+    @metrics.timer("sync")
+    async def sync(self, state, task_map):
+        """replanning.sync_plan() against what earlier runs created for the document."""
+        return await self._run("jira", sync_plan, state, task_map, state.diff(task_map), self.jira, self.github,
+                               "Epic", "Task", "Created by batch planner")
+
+    @metrics.timer("github")
+    async def create_branches(self, task_map):
+        tasks = [task for main, subs in task_map.items() for task in [main, *subs]]
+        return await self._run("github", self.github.provision, tasks)
+
+    async def process(self, path, status, task_map, jira, analyze_only=False):
+        """
+        Run the remaining stages of one document; returns True if it got through them
+        without errors. Issues or branches that failed are recorded as the row's error.
+        """
+        stage_started = time.perf_counter()
+
+        def finish_stage(**fields):
+            nonlocal stage_started
+            self.queue.update(path, time.perf_counter() - stage_started, **fields)
+            stage_started = time.perf_counter()
+
+        try:
+            if status == PENDING:
+                task_map = await self.analyze(path)
+                status = ANALYZED
+                finish_stage(status=status, task_map=task_map)
+            if analyze_only:
+                return True
+
+            errors = []
+            state = self.plan_state(path)
+            if status == DONE:
+                # Finished with errors before: the sync below creates only what is still missing
+                status = ANALYZED
+            if status in (ANALYZED, JIRA_STARTED) and state.synced["jira"]:
+                # Issues exist from an earlier revision or attempt: push only what changed since
+                self.queue.update(path, status=JIRA_STARTED, error=None)
+                report = await self.sync(state, task_map)
+                errors += [f"{summary}: {message}" for summary, message in report["errors"]]
+                errors += [f"{task}: {s}" for task, (_, s) in report["branches"].items()
+                           if s.startswith(("failed", "skipped"))]
+                errors += [f"{branch}: {s}" for branch, s in report["removed_branches"].items()
+                           if s.startswith("failed")]
+                finish_stage(status=DONE, jira=state.synced["jira"], branches=report["branches"],
+                             error="; ".join(errors) or None)
+                return not errors
+            if status in (ANALYZED, JIRA_STARTED):
+                self.queue.update(path, status=JIRA_STARTED, error=None)
+                jira, jira_errors = await self.create_issues(task_map)
+                errors += [f"{summary}: {message}" for summary, message in jira_errors]
+                status = JIRA_DONE
+                finish_stage(status=status, jira=jira)
+
+            branches = await self.create_branches(task_map)
+            errors += [f"{task}: {s}" for task, (_, s) in branches.items() if s.startswith(("failed", "skipped"))]
+            finish_stage(status=DONE, branches=branches, error="; ".join(errors) or None)
+            state.record_created(
+                {main: tuple(entry) for main, entry in jira.items()}, branches)
+            return not errors
+        except Exception as e:
+            metrics.inc("batch_plan_errors", stage=status)
+            finish_stage(error=f"{type(e).__name__}: {e}")
+            return False
+
+    async def run(self, analyze_only=False, on_done=None):
+        """Process every pending document; returns the number that completed."""
+        self._semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.limits.items()}
+        pending = self.queue.pending()
+        completed = 0
+
+        async def one(row):
+            nonlocal completed
+            ok = await self.process(*row, analyze_only=analyze_only)
+            completed += ok
+            if on_done is not None:
+                on_done(row[0], ok)
+
+        await asyncio.gather(*(one(row) for row in pending))
+        self._executor.shutdown()
+        self._pdf_pool.shutdown()
+        return completed
+
+
+# === CLI ===
+def main():
+    parser = argparse.ArgumentParser(description="Plan every project document under a directory into Jira and GitHub.")
+    parser.add_argument("root", help="Directory to scan for .txt, .docx and .pdf files")
+    parser.add_argument("--queue", default=PLAN_QUEUE_PATH, help="sqlite work queue (resumed if it exists)")
+    parser.add_argument("--model", default=OLLAMA_MODEL, help="Ollama model")
+    parser.add_argument("--chunk-tokens", type=int, default=CHUNK_TOKENS)
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY, help="LLM requests in flight")
+    parser.add_argument("--jira-concurrency", type=int, default=JIRA_CONCURRENCY, help="Jira requests in flight")
+    parser.add_argument("--github-concurrency", type=int, default=GITHUB_CONCURRENCY, help="GitHub requests in flight")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD,
+                        help="Collapse tasks at least this similar (0 disables)")
+    parser.add_argument("--analyze-only", action="store_true", help="Stop after analysis (no Jira/GitHub)")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry documents that failed before")
+    parser.add_argument("--report", help="Also write a JSON report of this run")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        parser.error(f"Not a directory: {args.root}")
+    if not args.analyze_only and not all((JIRA_BASE_URL, JIRA_PROJECT_KEY, GITHUB_REPO)):
+        parser.error("Set JIRA_BASE_URL, JIRA_PROJECT_KEY and GITHUB_REPO (or use --analyze-only).")
+    metrics.flush_at_exit("batch_plan")
+
+    queue = PlanQueue(args.queue)
+    added = queue.add(find_documents(args.root))
+    for path in queue.recover():
+        print(f"⚠️ {path}: interrupted during Jira creation, marked failed")
+    if args.retry_failed:
+        queue.retry_failed()
+
+    llm = OllamaClient(OLLAMA_URL, args.model)
+    if not llm.available():
+        parser.error(f"Ollama is not reachable at {OLLAMA_URL}.")
+    llm.preload()
+    jira = github = None
+    if not args.analyze_only:
+        from github_branches import BranchProvisioner
+        from jira_writer import JiraWriter
+
+        # One request per call each: the semaphores set how many run at once
+        jira = JiraWriter(JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN, JIRA_PROJECT_KEY, max_concurrency=1)
+        github = BranchProvisioner(GITHUB_TOKEN, GITHUB_REPO, max_concurrency=1, base_url=GITHUB_API_URL)
+
+    planner = BatchPlanner(queue, llm, jira, github, args.chunk_tokens, args.llm_concurrency,
+                           args.jira_concurrency, args.github_concurrency,
+                           dedup_threshold=args.dedup_threshold, root=args.root)
+    pending = len(queue.pending())
+    print(f"{added} new or changed documents queued, {pending} to process")
+
+    done = itertools.count(1)
+
+    def on_done(path, ok):
+        print(f"[{next(done)}/{pending}] {'✅' if ok else '❌'} {path}")
+
+    started = time.perf_counter()
+    completed = asyncio.run(planner.run(args.analyze_only, on_done))
+    elapsed = time.perf_counter() - started
+
+    counts = queue.counts()
+    collapsed = sum(c["value"] for c in metrics.snapshot()["counters"] if c["name"] == "tasks_collapsed")
+    report = {
+        "root": args.root,
+        "processed": pending,
+        "completed": completed,
+        "wall_seconds": round(elapsed, 2),
+        "docs_per_minute": round(completed / elapsed * 60, 2) if elapsed else None,
+        "queue": counts,
+        "tasks_collapsed": collapsed,
+        "stages": metrics.timing_rows(),
+    }
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"\nCompleted {completed} of {pending} documents in {elapsed:.1f}s "
+          f"({report['docs_per_minute']} docs/min). Queue: {counts}. Near-duplicate tasks collapsed: {collapsed}")
+    for row in report["stages"]:
+        print(f"   {row['stage']:<28} {row['calls']:>5} calls  {row['total_s']:>8.2f}s total  {row['mean_s']:.3f}s mean")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Headless directory-scale summarization.
+
+Walks a directory tree for .txt/.docx/.pdf files and summarizes them across a pool of
+worker processes. Each worker loads its own llama.cpp model with a share of the CPU
+cores. Summaries are stored as <output-dir>/<sha256>.json, so files (or copies of
+files) that were already summarized are skipped. A manifest records per-file timings
+and overall throughput; stage timings from all workers are merged into
+.metrics/batch_summarize.prom (METRICS_DIR). Workers extract large PDFs in-process:
+the cores are already split between them, so a nested extraction pool per worker
+would oversubscribe.
+
+Usage:
+    python batch_summarize.py reports/ --model ./llama-3.1.gguf
+    python batch_summarize.py reports/ --workers 4 --threads-per-worker 4 --manifest run.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from document_extraction import SUPPORTED_EXTENSIONS, file_hash
+from summarizer import MAX_TOKENS, MODEL_PATH, N_CTX
+
+OUTPUT_DIR = 'batch_summaries'
+THREADS_PER_WORKER = 4
+
+_summarizer = None
+
+
+# === Worker ===
+def _init_worker(model_path, n_ctx, max_tokens, threads):
+    global _summarizer
+    from summarizer import Summarizer
+
+    _summarizer = Summarizer(model_path=model_path, n_ctx=n_ctx, max_tokens=max_tokens, n_threads=threads,
+                             extract_workers=1)
+    _summarizer.llm  # load the model now rather than inside the first file's timing
+
+
+def summarize_file(path, output_dir):
+    """Summarize one file in a worker and store the result; returns its manifest entry."""
+    result = _summarizer.summarize(path)
+    record = {"path": path, **result}
+    out_path = os.path.join(output_dir, result["sha256"] + ".json")
+    with open(out_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    os.replace(out_path + ".tmp", out_path)
+    return {
+        "path": path,
+        "sha256": result["sha256"],
+        "status": "summarized",
+        "seconds": round(result["seconds"], 2),
+        "chunks": result["chunks"],
+        "tokens_in": result["tokens_in"],
+        "tokens_out": result["tokens_out"],
+        "tokens_per_second": round(result["tokens_out"] / result["seconds"], 2) if result["seconds"] else None,
+    }
+
+
+# === Batch Runner ===
+def find_documents(root):
+    """Every supported document under root, largest first so long files don't finish last."""
+    paths = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if os.path.splitext(name)[1].lstrip('.').lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(directory, name))
+    return sorted(paths, key=os.path.getsize, reverse=True)
+
+
+def run_batch(root, output_dir=OUTPUT_DIR, manifest=None, model_path=MODEL_PATH, n_ctx=N_CTX,
+              max_tokens=MAX_TOKENS, workers=None, threads_per_worker=None):
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = manifest or os.path.join(output_dir, "manifest.json")
+
+    entries, pending, seen = [], [], set()
+    for path in find_documents(root):
+        digest = file_hash(path)
+        if digest in seen or os.path.exists(os.path.join(output_dir, digest + ".json")):
+            entries.append({"path": path, "sha256": digest, "status": "skipped"})
+        else:
+            seen.add(digest)
+            pending.append(path)
+    print(f"{len(pending)} documents to summarize, {len(entries)} already done")
+
+    cores = os.cpu_count() or 1
+    threads_per_worker = threads_per_worker or min(THREADS_PER_WORKER, cores)
+    workers = workers or max(1, min(len(pending), cores // threads_per_worker))
+
+    if pending:
+        # 'spawn' so no worker inherits another process's llama.cpp threads or model memory
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(model_path, n_ctx, max_tokens, threads_per_worker)) as pool:
+            futures = {pool.submit(metrics.collect, summarize_file, path, output_dir): path for path in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    entry, worker_metrics = future.result()
+                    metrics.merge(worker_metrics)
+                    print(f"[{done}/{len(pending)}] ✅ {path} ({entry['seconds']}s)")
+                except Exception as e:
+                    entry = {"path": path, "status": "failed", "error": str(e)}
+                    print(f"[{done}/{len(pending)}] ❌ {path}: {e}")
+                entries.append(entry)
+
+    elapsed = time.perf_counter() - started
+    summarized = [e for e in entries if e["status"] == "summarized"]
+    tokens_out = sum(e["tokens_out"] for e in summarized)
+    report = {
+        "root": root,
+        "model": model_path,
+        "workers": workers,
+        "threads_per_worker": threads_per_worker,
+        "wall_seconds": round(elapsed, 2),
+        "summarized": len(summarized),
+        "skipped": sum(e["status"] == "skipped" for e in entries),
+        "failed": sum(e["status"] == "failed" for e in entries),
+        "docs_per_hour": round(len(summarized) / elapsed * 3600, 2) if elapsed else None,
+        "tokens_out": tokens_out,
+        "tokens_per_second": round(tokens_out / elapsed, 2) if elapsed else None,
+        "files": entries,
+    }
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSummarized {report['summarized']} documents ({report['docs_per_hour']} docs/hour, "
+          f"{report['tokens_per_second']} tok/s). Manifest: {manifest}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize every document under a directory.")
+    parser.add_argument("root", help="Directory to scan for .txt, .docx and .pdf files")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Where <sha256>.json summaries are stored")
+    parser.add_argument("--manifest", help="Manifest path (default: <output-dir>/manifest.json)")
+    parser.add_argument("--model", default=MODEL_PATH, help="GGUF model file")
+    parser.add_argument("--n-ctx", type=int, default=N_CTX)
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="Output tokens per summary call")
+    parser.add_argument("--workers", type=int, help="Worker processes, one model each (default: cores / threads)")
+    parser.add_argument("--threads-per-worker", type=int, help=f"llama.cpp threads per worker (default: {THREADS_PER_WORKER})")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        parser.error(f"Not a directory: {args.root}")
+    metrics.flush_at_exit("batch_summarize")
+    run_batch(
+        args.root, args.output_dir, args.manifest, model_path=args.model, n_ctx=args.n_ctx,
+        max_tokens=args.max_tokens, workers=args.workers, threads_per_worker=args.threads_per_worker,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Offline benchmark for the stock-prediction pipeline stages used by app.py.
+
+Uses a deterministic synthetic OHLCV series (no network) and times each stage
+separately: data load, scaling, window construction, model build, training per
+epoch and predict + inverse transform. Results are written as JSON with wall time
+and peak traced memory per stage.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --rows 500 5000 --time-steps 60 --output bench.json
+    python benchmark.py --rows 1000000 --skip-training
+"""
+import argparse
+import json
+import platform
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+# === Synthetic Data ===
+def synthetic_ohlcv(rows, seed=0):
+    """Deterministic geometric random walk with OHLCV columns on a minute index."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, rows)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0005, rows)) * close
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(1_000, 1_000_000, rows).astype(float),
+    }, index=pd.date_range("2000-01-03 09:15", periods=rows, freq="min", name="Date"))
+
+
+# === Stage Timing ===
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, name, fn, *args, **kwargs):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stages[name] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+        return result
+
+
+def benchmark_case(rows, time_step, features, epochs, train_rows, skip_training, cache_dir):
+    from lstm_model import FORECAST_DAYS, build_model, fit_model, forecast_tail
+    from price_cache import load_prices, write_cached
+    from sklearn.preprocessing import MinMaxScaler
+    from windowing import make_windows
+
+    frame = synthetic_ohlcv(rows)
+    symbol = f"SYNTH{rows}"
+    start = frame.index[0].normalize()
+    end = frame.index[-1].normalize() + pd.Timedelta(days=1)
+    write_cached(symbol, frame, [(start, end)], cache_dir)
+
+    timer = StageTimer()
+    stock_data = timer.run("data_load", load_prices, symbol, start, end, cache_dir=cache_dir, offline=True)
+
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    target_index = features.index("Close")
+    scaled_data = timer.run("scaling", scaler.fit_transform, stock_data[features].values)
+    timer.run("windowing", make_windows, scaled_data, time_step, target_index)
+
+    model = timer.run("model_build", build_model, time_step, len(features))
+    if not skip_training:
+        # Large series are trained on their most recent train_rows rows to keep runs bounded
+        train_data = scaled_data[-train_rows:] if train_rows else scaled_data
+        history = timer.run("training", fit_model, model, train_data, time_step, target_index,
+                            epochs=epochs, early_stopping=False)
+        timer.stages["training"]["seconds_per_epoch"] = round(
+            sum(h["seconds"] for h in history) / max(1, len(history)), 6
+        )
+        timer.stages["training"]["windows"] = len(train_data) - time_step
+
+    timer.run("predict_inverse", forecast_tail, model, scaler, scaled_data, target_index, time_step, FORECAST_DAYS)
+    return {"rows": rows, "time_step": time_step, "features": features, "stages": timer.stages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stock-prediction pipeline stages offline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[500, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--time-steps", type=int, nargs="+", default=[30, 60, 120])
+    parser.add_argument("--features", default="Open,High,Low,Close,Volume", help="Comma-separated OHLCV columns")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--train-rows", type=int, default=20_000, help="Cap on rows used for training (0 = all)")
+    parser.add_argument("--skip-training", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    features = args.features.split(",")
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for rows in args.rows:
+            for time_step in args.time_steps:
+                if rows <= time_step + 30:
+                    continue
+                case = benchmark_case(rows, time_step, features, args.epochs, args.train_rows,
+                                      args.skip_training, cache_dir)
+                results.append(case)
+                summary = ", ".join(f"{name} {s['seconds']:.3f}s" for name, s in case["stages"].items())
+                print(f"rows={rows} time_step={time_step}: {summary}")
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        # Process-wide peak RSS (includes TensorFlow's native allocations, which tracemalloc cannot see)
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Benchmark results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,69 @@
 import streamlit as st
+import metrics
 import requests
+from conversation import Conversation
+from ollama_client import OllamaClient
 
 st.title("💬 Chat with LLaMA 3.1 (Local)")
 
-# Store conversation
-if "history" not in st.session_state:
-    st.session_state.history = []
+stream_replies = st.sidebar.checkbox("Stream replies token by token", True)
+show_timings = st.sidebar.checkbox("Show timing panel", False)
+
+# Store conversation: a recent-turn window plus a rolling summary keeps each request bounded
+if "conversation" not in st.session_state:
+    st.session_state.conversation = Conversation(OllamaClient("http://localhost:11434", "llama3"))
+conversation = st.session_state.conversation
 
 # User input
 user_input = st.text_input("Your message", "")
 
 # When user submits a message
-if st.button("Send") and user_input.strip():
-    st.session_state.history.append({"role": "user", "content": user_input})
-
-    # Format conversation as prompt
-    messages = "\n".join([f"{m['role'].capitalize()}: {m['content']}" for m in st.session_state.history])
-    prompt = f"{messages}\nAssistant:"
-
-    # Send prompt to local Ollama LLaMA model
-    response = requests.post(
-        "http://localhost:11434/api/generate",
-        json={
-            "model": "llama3",
-            "prompt": prompt,
-            "stream": False
-        }
-    )
-
-    result = response.json()
-    assistant_reply = result.get("response", "").strip()
-    st.session_state.history.append({"role": "assistant", "content": assistant_reply})
+send = st.button("Send") and user_input.strip()
+if send:
+    # A new message cancels a reply that is still streaming from the previous run
+    active_stream = st.session_state.pop("active_stream", None)
+    if active_stream is not None:
+        active_stream.cancel()
 
 # Display conversation
-for msg in st.session_state.history:
+for msg in conversation.turns:
     if msg["role"] == "user":
         st.markdown(f"**You**: {msg['content']}")
     else:
         st.markdown(f"**LLaMA 3.1**: {msg['content']}")
+        if msg.get("stats"):
+            st.caption(msg["stats"])
+
+if send:
+    st.markdown(f"**You**: {user_input}")
+
+    if stream_replies:
+        stream = conversation.stream_reply(user_input)
+        st.session_state.active_stream = stream
+        placeholder = st.empty()
+        try:
+            for _ in stream:
+                placeholder.markdown(f"**LLaMA 3.1**: {stream.text}▌")
+            placeholder.markdown(f"**LLaMA 3.1**: {stream.text}")
+            st.caption(stream.stats.summary())
+        finally:
+            # Runs even when a rerun interrupts the loop, so partial replies are kept
+            st.session_state.pop("active_stream", None)
+            conversation.add_reply(stream.text.strip(), stream.stats.summary())
+    else:
+        # Identical requests are answered from the LLM cache; failed ones are not cached
+        try:
+            assistant_reply = conversation.reply(user_input)
+        except (requests.RequestException, RuntimeError) as e:
+            st.error(f"❌ Ollama request failed: {e}")
+        else:
+            st.markdown(f"**LLaMA 3.1**: {assistant_reply}")
+
+if conversation.summary:
+    with st.sidebar.expander("🧾 Summary of earlier turns"):
+        st.write(conversation.summary)
+
+# LLM calls are timed inside OllamaClient
+if show_timings:
+    st.sidebar.dataframe(metrics.timing_rows(), hide_index=True)
+metrics.flush("chat")
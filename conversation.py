@@ -0,0 +1,110 @@
+"""
+Bounded-context chat on Ollama's /api/chat.
+
+The request sent each turn is [system + rolling summary] + a token-budgeted window of the
+most recent turns + the new message, so its size stays roughly flat however long the
+session runs. When the window overflows, the oldest turns are folded into the summary in
+one block, which halves the window. Between compactions each request only appends to the
+previous one, so Ollama (kept loaded with keep_alive) can reuse its KV cache for the shared
+prefix instead of re-reading the whole conversation.
+"""
+from task_analysis import estimate_tokens
+
+# === Configuration ===
+CONTEXT_TOKENS = 4096
+REPLY_TOKENS = 512
+SUMMARY_TOKENS = 256
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+SUMMARY_PROMPT = """Update the running summary of a conversation.
+
+Current summary:
+{summary}
+
+New turns to fold in:
+{turns}
+
+Write the updated summary in at most {words} words. Keep names, facts, decisions and open
+questions; drop small talk. Return only the summary."""
+
+
+class Conversation:
+    def __init__(self, client, system_prompt=SYSTEM_PROMPT, context_tokens=CONTEXT_TOKENS,
+                 reply_tokens=REPLY_TOKENS, summary_tokens=SUMMARY_TOKENS):
+        self.client = client
+        self.system_prompt = system_prompt
+        self.context_tokens = context_tokens
+        self.reply_tokens = reply_tokens
+        self.summary_tokens = summary_tokens
+        self.turns = []  # every turn, for display
+        self.summary = ""
+        self.window_start = 0  # turns before this index live only in the summary
+
+    # === Context Window ===
+    def _system_message(self):
+        content = self.system_prompt
+        if self.summary:
+            content += f"\n\nSummary of the earlier conversation:\n{self.summary}"
+        return {"role": "system", "content": content}
+
+    def _window_budget(self):
+        return self.context_tokens - self.reply_tokens - estimate_tokens(self._system_message()["content"])
+
+    def _window_tokens(self):
+        return sum(estimate_tokens(t["content"]) for t in self.turns[self.window_start:])
+
+    def _compact(self):
+        """Fold the oldest turns into the summary until the window is at most half its budget."""
+        if self._window_tokens() <= self._window_budget():
+            return
+        target = (self.context_tokens - self.reply_tokens - self.summary_tokens) // 2
+        start, tokens = self.window_start, self._window_tokens()
+        # Always keep the newest turn (the message being answered) in the window
+        while start < len(self.turns) - 1 and tokens > target:
+            tokens -= estimate_tokens(self.turns[start]["content"])
+            start += 1
+        if start > self.window_start:
+            # Only evict once the summary has them; if it fails they stay in the window
+            self._summarize(self.turns[self.window_start:start])
+            self.window_start = start
+
+    def _summarize(self, turns):
+        prompt = SUMMARY_PROMPT.format(
+            summary=self.summary or "(empty)",
+            turns="\n".join(f"{t['role'].capitalize()}: {t['content']}" for t in turns),
+            words=int(self.summary_tokens * 0.75),
+        )
+        self.summary = self.client.chat(
+            [{"role": "user", "content": prompt}],
+            options={"num_predict": self.summary_tokens},
+        ).strip()
+
+    def messages(self):
+        """Messages for the next request: system + summary, then the recent window."""
+        return [self._system_message()] + [
+            {"role": t["role"], "content": t["content"]} for t in self.turns[self.window_start:]
+        ]
+
+    # === Turns ===
+    def _add_user(self, content):
+        self.turns.append({"role": "user", "content": content})
+        self._compact()
+
+    def add_reply(self, content, stats=None):
+        self.turns.append({"role": "assistant", "content": content, "stats": stats})
+
+    def stream_reply(self, user_message):
+        """Add the user's message and return a GenerationStream; call add_reply() with its text afterwards."""
+        self._add_user(user_message)
+        return self.client.chat_stream(
+            self.messages(), options={"num_predict": self.reply_tokens, "num_ctx": self.context_tokens},
+        )
+
+    def reply(self, user_message):
+        """Blocking variant of stream_reply(); records and returns the reply text."""
+        self._add_user(user_message)
+        text = self.client.chat(
+            self.messages(), options={"num_predict": self.reply_tokens, "num_ctx": self.context_tokens},
+        ).strip()
+        self.add_reply(text)
+        return text
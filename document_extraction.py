@@ -0,0 +1,220 @@
+"""
+Shared text extraction for .pdf, .docx and .txt documents.
+
+Text is produced page by page (PDF) or section by section (DOCX, TXT) as a generator.
+Large PDFs are split across a process pool: a spawn-context pool per call, or a pool the
+caller shares between calls. Workers are always given a file path; uploaded bytes are
+written to a temporary file first. Every finished extraction is stored on disk keyed by
+the SHA-256 of the file bytes, so the same file is never parsed twice.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+# === Configuration ===
+EXTRACT_CACHE_DIR = os.getenv('EXTRACT_CACHE_DIR', '.extract_cache')
+PARALLEL_PDF_PAGES = int(os.getenv('PARALLEL_PDF_PAGES', '64'))  # PDFs at least this long use the pool
+PAGES_PER_TASK = 16
+TXT_SECTION_CHARS = 64 * 1024
+SUPPORTED_EXTENSIONS = ('pdf', 'docx', 'txt')
+
+
+# === Sources ===
+def _read_source(source):
+    """Return (extension, path_or_None, bytes_or_None) for a path, bytes or uploaded file."""
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        return os.path.splitext(path)[1].lstrip('.').lower(), path, None
+
+    name = getattr(source, 'name', '')
+    data = source.getvalue() if hasattr(source, 'getvalue') else source.read()
+    return os.path.splitext(name)[1].lstrip('.').lower(), None, data
+
+
+def file_hash(path=None, data=None):
+    """SHA-256 of a file's bytes; paths are hashed in blocks instead of read whole."""
+    digest = hashlib.sha256()
+    if data is not None:
+        digest.update(data)
+    else:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+# === PDF ===
+def _open_pdf(path, data):
+    import fitz  # PyMuPDF
+
+    return fitz.open(path) if path else fitz.open(stream=data, filetype="pdf")
+
+
+def _pdf_page_range(path, data, first, last):
+    doc = _open_pdf(path, data)
+    try:
+        return [doc[i].get_text() for i in range(first, last)]
+    finally:
+        doc.close()
+
+
+def _iter_pdf(path, data, pool=None, max_workers=None):
+    try:
+        doc = _open_pdf(path, data)
+    except ImportError:
+        # PyMuPDF is optional; fall back to PyPDF2
+        yield from _iter_pdf_pypdf2(path, data)
+        return
+
+    page_count = len(doc)
+    if page_count < PARALLEL_PDF_PAGES or (pool is None and max_workers == 1):
+        for page in doc:
+            yield page.get_text()
+        doc.close()
+        return
+    doc.close()
+
+    ranges = [(first, min(first + PAGES_PER_TASK, page_count)) for first in range(0, page_count, PAGES_PER_TASK)]
+    # Workers get a path, never the bytes: an upload is written to disk once instead of pickled per task
+    spooled = None
+    if path is None:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(data)
+        path = spooled = f.name
+    try:
+        if pool is not None:
+            yield from _pdf_ranges(pool, path, ranges)
+            return
+        # Spawn, not fork: callers such as the Streamlit server are multi-threaded
+        workers = min(max_workers or os.cpu_count() or 1, len(ranges))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as own_pool:
+            yield from _pdf_ranges(own_pool, path, ranges)
+    finally:
+        if spooled:
+            os.remove(spooled)
+
+
+def _pdf_ranges(pool, path, ranges):
+    futures = [pool.submit(_pdf_page_range, path, None, first, last) for first, last in ranges]
+    try:
+        # Yield in page order while later ranges are still being extracted
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()  # a shared pool should not keep working for an abandoned document
+
+
+def _iter_pdf_pypdf2(path, data):
+    import io
+
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(path if path else io.BytesIO(data))
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+# === DOCX ===
+def _iter_docx(path, data):
+    import io
+
+    import docx
+
+    doc = docx.Document(path if path else io.BytesIO(data))
+    section = []
+    for para in doc.paragraphs:
+        # A heading starts a new section
+        if para.style is not None and para.style.name.startswith("Heading") and section:
+            yield "\n".join(section)
+            section = []
+        section.append(para.text)
+    if section:
+        yield "\n".join(section)
+
+    for table in doc.tables:
+        yield "\n".join("\t".join(cell.text for cell in row.cells) for row in table.rows)
+
+
+# === TXT ===
+def _iter_lines(path, data):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from f
+    else:
+        yield from data.decode("utf-8").splitlines(keepends=True)
+
+
+def _iter_txt(path, data):
+    section, size = [], 0
+    for line in _iter_lines(path, data):
+        section.append(line)
+        size += len(line)
+        # Sections end at blank lines once they are large enough
+        if size >= TXT_SECTION_CHARS and not line.strip():
+            yield "".join(section)
+            section, size = [], 0
+    if section:
+        yield "".join(section)
+
+
+_EXTRACTORS = {'pdf': _iter_pdf, 'docx': _iter_docx, 'txt': _iter_txt}
+
+
+# === Public API ===
+def iter_sections(source, cache_dir=EXTRACT_CACHE_DIR, pool=None, max_workers=None):
+    """
+    Yield the text of a document page by page (PDF) or section by section (DOCX, TXT).
+
+    source may be a file path, or a file-like object with a .name (e.g. a Streamlit upload).
+    Large PDFs are extracted on pool if given, otherwise on a pool of max_workers processes
+    (default: one per core); max_workers=1 extracts them in this process.
+    Raises ValueError for unsupported file types.
+    """
+    ext, path, data = _read_source(source)
+    if ext not in _EXTRACTORS:
+        raise ValueError("Unsupported file type: ." + ext)
+
+    cache_path = os.path.join(cache_dir, file_hash(path, data) + ".jsonl")
+    if os.path.exists(cache_path):
+        metrics.inc("extract_cache_hits", type=ext)
+        with open(cache_path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+        return
+
+    # Sections are written as they are produced; the cache entry only appears once complete
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    # Only time spent inside the extractor counts, not the consumer's work between sections
+    seconds = 0.0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        try:
+            options = {"pool": pool, "max_workers": max_workers} if ext == "pdf" else {}
+            sections = _EXTRACTORS[ext](path, data, **options)
+            while True:
+                started = time.perf_counter()
+                section = next(sections, None)
+                seconds += time.perf_counter() - started
+                if section is None:
+                    break
+                f.write(json.dumps(section) + "\n")
+                metrics.inc("extracted_chars", len(section), type=ext)
+                yield section
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    metrics.observe("extract", seconds, type=ext)
+    os.replace(tmp_path, cache_path)
+
+
+def extract_text(source, cache_dir=EXTRACT_CACHE_DIR):
+    """Return the whole document text (pages/sections joined by newlines)."""
+    return "\n".join(iter_sections(source, cache_dir))
@@ -1,16 +1,52 @@
 import streamlit as st
+import http_transport
 import requests
+import metrics
+from llm_cache import cached_call
+from ollama_client import OllamaClient
+from retrieval_index import TOP_K, get_index
+
+
+@st.cache_resource(show_spinner="Indexing document...", max_entries=8)
+def load_index(file_key, _uploaded_file):
+    """One loaded index per upload, shared by reruns and sessions; the index on disk is reused for identical files."""
+    with metrics.timer("index"):
+        return get_index(_uploaded_file)
+
 
 st.set_page_config(page_title="Chat with llama3")
 st.title("📄 Ask Questions Based on Your Document")
 
+stream_answers = st.sidebar.checkbox("Stream answers token by token", True)
+top_k = st.sidebar.slider("Passages sent per question", 1, 20, TOP_K)
+use_embeddings = st.sidebar.checkbox("Also rank passages with embeddings", False)
+embed_model = st.sidebar.text_input("Ollama embedding model", "nomic-embed-text", disabled=not use_embeddings)
+show_timings = st.sidebar.checkbox("Show timing panel", False)
+
 # Step 1: Upload a file
-uploaded_file = st.file_uploader("Upload a TXT file", type=["txt"])
+uploaded_file = st.file_uploader("Upload a document", type=["txt", "pdf", "docx"])
 
-# Store uploaded content
+# Index the document once per upload
 if uploaded_file is not None:
-    context_text = uploaded_file.read().decode("utf-8")
-    st.text_area("📚 Extracted Context", context_text, height=200)
+    try:
+        index = load_index((uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None)),
+                           uploaded_file)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+    st.caption(f"📚 Indexed {len(index)} passages, {index.meta['terms']} distinct terms")
+
+    embed_client = None
+    if use_embeddings and embed_model.strip():
+        embed_client = OllamaClient("http://localhost:11434", embed_model.strip())
+        if index.embeddings(embed_client.model) is None:
+            progress = st.progress(0.0, text="Embedding passages...")
+            try:
+                index.add_embeddings(embed_client, progress=progress.progress)
+            except Exception as e:
+                st.warning(f"⚠️ Embeddings unavailable, using keyword ranking only: {e}")
+                embed_client = None
+            progress.empty()
 
     # Store conversation history
     if "qa_history" not in st.session_state:
@@ -20,7 +56,20 @@ if uploaded_file is not None:
     question = st.text_input("❓ Ask a question about the document")
 
     if st.button("Ask") and question.strip():
-        # Build prompt: add context + question
+        # A new question cancels an answer that is still streaming from the previous run
+        active_stream = st.session_state.pop("active_stream", None)
+        if active_stream is not None:
+            active_stream.cancel()
+
+        # Build prompt: add the best-matching passages + question
+        with metrics.timer("retrieve"):
+            passages = index.search(question, k=top_k, embed_client=embed_client)
+        context_text = "\n\n---\n\n".join(text for _, _, text in passages)
+        with st.expander(f"🔎 {len(passages)} passages used"):
+            for score, i, text in passages:
+                st.markdown(f"**#{i}** (score {score:.3f})")
+                st.text(text)
+
         full_prompt = f"""
 You are a helpful assistant. Use the following context to answer the question.
 
@@ -33,20 +82,49 @@ Question: {question}
 Answer:
 """
 
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "llama3",
-                "prompt": full_prompt,
-                "stream": False
-            }
-        )
+        if stream_answers:
+            stream = OllamaClient("http://localhost:11434", "llama3").generate_stream(full_prompt)
+            st.session_state.active_stream = stream
+            placeholder = st.empty()
+            try:
+                for _ in stream:
+                    placeholder.markdown(f"**A:** {stream.text}▌")
+                placeholder.empty()
+            finally:
+                st.session_state.pop("active_stream", None)
+            answer = stream.text.strip()
+            st.caption(stream.stats.summary())
+        else:
+            @metrics.timer("llm", model="llama3")
+            def call():
+                response = http_transport.llm_post(
+                    "http://localhost:11434/api/generate",
+                    json={
+                        "model": "llama3",
+                        "prompt": full_prompt,
+                        "stream": False
+                    }
+                )
+                response.raise_for_status()
+                body = response.json()
+                metrics.record_tokens("llama3", body.get("prompt_eval_count"), body.get("eval_count"))
+                # An error body has no "response"; None is returned but not cached
+                return body.get("response")
 
-        result = response.json()
-        answer = result.get("response", "").strip()
+            try:
+                answer = cached_call(call, "http://localhost:11434/api/generate", "llama3", prompt=full_prompt)
+            except requests.RequestException as e:
+                answer = None
+                st.error(f"❌ Ollama request failed: {e}")
+            else:
+                if answer is None:
+                    st.error("❌ Ollama returned no answer.")
+                else:
+                    answer = answer.strip()
 
         # Save Q&A
-        st.session_state.qa_history.append((question, answer))
+        if answer is not None:
+            st.session_state.qa_history.append((question, answer))
 
     # Display Q&A history
     if st.session_state.qa_history:
@@ -56,3 +134,8 @@ Answer:
             st.markdown(f"**Q:** {q}")
             st.markdown(f"**A:** {a}")
             st.markdown("---")
+
+# Streamed answers are timed inside OllamaClient
+if show_timings:
+    st.sidebar.dataframe(metrics.timing_rows(), hide_index=True)
+metrics.flush("documentchat")
@@ -0,0 +1,175 @@
+"""
+Idempotent, rate-limit-aware GitHub branch provisioning for task plans.
+
+The repository is fetched once per provisioner. The base branch SHA and the list of
+existing branches are looked up again at the start of every provision() and remove(),
+so a long-lived provisioner follows new commits on the base and branches deleted on
+GitHub. Branches that already exist are skipped, and the rest are created as long as
+the API rate-limit budget allows. PyGithub spaces requests SECONDS_BETWEEN_REQUESTS and
+writes SECONDS_BETWEEN_WRITES apart across the whole client, which is what GitHub asks
+for to stay under its secondary rate limits. At the default 1 s between writes, creation
+is effectively sequential and the thread pool only overlaps reads. Lower both (e.g. to 0
+for GitHub Enterprise or mock_servers.py) to create branches concurrently.
+"""
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+# === Configuration ===
+MAX_CONCURRENCY = 4
+RATE_LIMIT_RESERVE = 50  # requests left untouched for everything else using the token
+MAX_SLUG_LENGTH = 60
+TIMEOUT = 30  # seconds per GitHub API request
+SECONDS_BETWEEN_REQUESTS = float(os.getenv('GITHUB_SECONDS_BETWEEN_REQUESTS', '0.25'))
+SECONDS_BETWEEN_WRITES = float(os.getenv('GITHUB_SECONDS_BETWEEN_WRITES', '1.0'))  # GitHub's advice for mutations
+
+
+# === Branch Names ===
+def branch_slug(text, max_length=MAX_SLUG_LENGTH):
+    """Turn a task name into a valid git branch name: lowercase ASCII words joined by dashes."""
+    ascii_text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^a-z0-9]+", "-", ascii_text.lower()).strip("-")
+    if len(slug) > max_length:
+        slug = slug[:max_length].rsplit("-", 1)[0] or slug[:max_length]
+    return slug or "task"
+
+
+def branch_names(tasks, max_length=MAX_SLUG_LENGTH, taken=None):
+    """
+    Map each task name to a unique branch name, deterministically.
+
+    A task whose slug is already taken by a different task gets a short content hash
+    appended, so the same task list always yields the same branches. taken may pass in
+    {branch: task} for branches assigned earlier, e.g. in a previous sync.
+    """
+    names, taken = {}, dict(taken or {})
+    for task in tasks:
+        if task in names:
+            continue
+        slug = branch_slug(task, max_length)
+        if slug in taken and taken[slug] != task:
+            slug = f"{slug}-{hashlib.sha1(str(task).encode('utf-8')).hexdigest()[:7]}"
+        taken[slug] = task
+        names[task] = slug
+    return names
+
+
+# === Provisioning ===
+class BranchProvisioner:
+    def __init__(self, token, repo_name, base="main", max_concurrency=MAX_CONCURRENCY,
+                 rate_limit_reserve=RATE_LIMIT_RESERVE, base_url=None,
+                 seconds_between_requests=SECONDS_BETWEEN_REQUESTS, seconds_between_writes=SECONDS_BETWEEN_WRITES):
+        from github import Auth, Github  # deferred: PyGithub takes a while to import
+
+        kwargs = {"base_url": base_url} if base_url else {}
+        # PyGithub keeps its own pooled session, so it only needs a timeout
+        self.github = Github(auth=Auth.Token(token), timeout=TIMEOUT, seconds_between_requests=seconds_between_requests,
+                             seconds_between_writes=seconds_between_writes, **kwargs)
+        self.repo_name = repo_name
+        self.base = base
+        self.max_concurrency = max_concurrency
+        self.rate_limit_reserve = rate_limit_reserve
+        self._repo = None
+        self._base_sha = None
+        self._existing = None
+        self._lock = threading.Lock()
+
+    @property
+    def repo(self):
+        if self._repo is None:
+            self._repo = self.github.get_repo(self.repo_name)
+        return self._repo
+
+    def refresh(self, branches=True):
+        """Look up the base SHA (and the branch list) again; raises GithubException if the base does not exist."""
+        base_sha = self.repo.get_branch(self.base).commit.sha
+        existing = {ref.ref[len("refs/heads/"):] for ref in self.repo.get_git_matching_refs("heads/")} \
+            if branches else self._existing
+        with self._lock:
+            self._base_sha, self._existing = base_sha, existing
+
+    @property
+    def base_sha(self):
+        """SHA of the base branch as of the last refresh(); raises GithubException if the branch does not exist."""
+        if self._base_sha is None:
+            self._base_sha = self.repo.get_branch(self.base).commit.sha
+        return self._base_sha
+
+    @property
+    def existing(self):
+        """Names of all branches in the repo as of the last refresh(), updated as branches are created."""
+        if self._existing is None:
+            refs = self.repo.get_git_matching_refs("heads/")
+            self._existing = {ref.ref[len("refs/heads/"):] for ref in refs}
+        return self._existing
+
+    def _create(self, branch):
+        from github import GithubException
+
+        try:
+            self.repo.create_git_ref(ref=f"refs/heads/{branch}", sha=self.base_sha)
+        except GithubException as e:
+            # 422 means someone else created it since we listed the refs
+            if e.status == 422 and "already exists" in str(e.data).lower():
+                return "exists"
+            return f"failed: {e.data.get('message', e) if isinstance(e.data, dict) else e}"
+        with self._lock:
+            self.existing.add(branch)
+        return "created"
+
+    def provision(self, tasks, names=None):
+        """
+        Ensure a branch exists for every task name (named by branch_names unless names is given).
+
+        Returns {task: (branch, status)} where status is "created", "exists",
+        "skipped: rate limit" or "failed: <reason>".
+        """
+        names = names or branch_names(tasks)
+        self.refresh()  # the base may have moved and branches may have been deleted since the last call
+        existing = self.existing
+
+        results = {task: (branch, "exists") for task, branch in names.items() if branch in existing}
+        to_create = sorted({branch for branch in names.values() if branch not in existing})
+
+        # rate_limiting reflects the headers of the last response, so this costs no extra request
+        remaining, _ = self.github.rate_limiting
+        budget = max(0, remaining - self.rate_limit_reserve) if remaining >= 0 else len(to_create)
+        allowed, skipped = to_create[:budget], set(to_create[budget:])
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            statuses = dict(zip(allowed, pool.map(self._create, allowed)))
+        for task, branch in names.items():
+            if task in results:
+                continue
+            results[task] = (branch, "skipped: rate limit" if branch in skipped else statuses[branch])
+        return results
+
+    def _remove(self, branch):
+        from github import GithubException
+
+        try:
+            ref = self.repo.get_git_ref(f"heads/{branch}")
+            if ref.object.sha != self.base_sha:
+                return "kept: has commits"
+            ref.delete()
+        except GithubException as e:
+            if e.status == 404:
+                return "missing"
+            return f"failed: {e.data.get('message', e) if isinstance(e.data, dict) else e}"
+        with self._lock:
+            self.existing.discard(branch)
+        return "deleted"
+
+    def remove(self, branches):
+        """
+        Delete branches that still point at the base commit, i.e. nobody has worked on them.
+
+        Returns {branch: status} where status is "deleted", "kept: has commits", "missing"
+        or "failed: <reason>".
+        """
+        self.refresh(branches=False)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return dict(zip(branches, pool.map(self._remove, branches)))
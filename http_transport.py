@@ -0,0 +1,194 @@
+"""
+Shared HTTP transport for every outbound call (Groq, Ollama, Jira).
+
+Each host gets one pooled keep-alive session, every request has connect/read timeouts,
+and 429/5xx responses or connection errors are retried with jittered exponential
+backoff (honoring Retry-After). Calls that create something (idempotent=False) are only
+retried when the server cannot have acted on them: the connection was never made, or
+the reply was 429/503. A read timeout or a 500 after a POST may mean the work was done.
+LLM calls (llm_post) never retry a read timeout: the model already had READ_TIMEOUT to
+answer, and asking again would only block the caller that long once more.
+Requests, retries and per-host latency are recorded in metrics. AsyncTransport is the
+same thing on httpx for asyncio code.
+"""
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+import metrics
+
+# === Configuration ===
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 300.0  # local LLMs can take minutes on CPU
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+NOT_PROCESSED_STATUSES = (429, 503)  # safe to retry even for non-idempotent calls
+POOL_SIZE = 16
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url):
+    """The pooled keep-alive session for url's scheme and host."""
+    key = _host_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount(key, adapter)
+            _sessions[key] = session
+        return session
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number `attempt` (0-based): Retry-After if given, else full jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass  # HTTP-date form; fall back to backoff
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _never_sent(error):
+    """True if a requests error means the server never got the request (refused, DNS, connect timeout)."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def request(method, url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=MAX_RETRIES,
+            retry_statuses=None, idempotent=True, retry_read_timeouts=True, **kwargs):
+    """
+    requests.request through the host's pooled session, with timeouts and retries.
+
+    Pass idempotent=False for calls that create something: they are retried only on
+    NOT_PROCESSED_STATUSES and on errors raised before the request was sent. With
+    retry_read_timeouts=False a read timeout is raised at once. The last response is
+    returned even if it still has a retryable status; the last connection error is
+    raised if no attempt succeeded.
+    """
+    if retry_statuses is None:
+        retry_statuses = RETRY_STATUSES if idempotent else NOT_PROCESSED_STATUSES
+    session = get_session(url)
+    host = urlsplit(url).netloc
+    for attempt in range(retries + 1):
+        if attempt:
+            metrics.inc("http_retries", host=host)
+        try:
+            with metrics.timer("http", host=host):
+                response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.inc("http_requests", host=host, status="error")
+            if (attempt == retries or not (idempotent or _never_sent(e))
+                    or (isinstance(e, requests.ReadTimeout) and not retry_read_timeouts)):
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        metrics.inc("http_requests", host=host, status=response.status_code)
+        if response.status_code not in retry_statuses or attempt == retries:
+            return response
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        response.close()
+        time.sleep(delay)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def llm_post(url, **kwargs):
+    """POST to an LLM endpoint (generate, chat, embed): retried like post(), except after a read timeout."""
+    return request("POST", url, retry_read_timeouts=False, **kwargs)
+
+
+# === Async Variant ===
+class AsyncTransport:
+    """
+    asyncio counterpart of request(): one httpx.AsyncClient per host, same timeouts and retries.
+
+    Requires the optional httpx package. Use as `async with AsyncTransport() as http:`.
+    """
+
+    def __init__(self, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=MAX_RETRIES, pool_size=POOL_SIZE):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError("AsyncTransport needs httpx: pip install httpx") from e
+        self._httpx = httpx
+        self._timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.retries = retries
+        self._clients = {}
+
+    def _client(self, url):
+        key = _host_key(url)
+        if key not in self._clients:
+            self._clients[key] = self._httpx.AsyncClient(base_url=key, timeout=self._timeout, limits=self._limits)
+        return self._clients[key]
+
+    async def request(self, method, url, retry_statuses=None, idempotent=True, retry_read_timeouts=True, **kwargs):
+        if retry_statuses is None:
+            retry_statuses = RETRY_STATUSES if idempotent else NOT_PROCESSED_STATUSES
+        client = self._client(url)
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            if attempt:
+                metrics.inc("http_retries", host=host)
+            try:
+                with metrics.timer("http", host=host):
+                    response = await client.request(method, url, **kwargs)
+            except (self._httpx.ConnectError, self._httpx.TimeoutException) as e:
+                metrics.inc("http_requests", host=host, status="error")
+                never_sent = isinstance(e, (self._httpx.ConnectError, self._httpx.ConnectTimeout))
+                if (attempt == self.retries or not (idempotent or never_sent)
+                        or (isinstance(e, self._httpx.ReadTimeout) and not retry_read_timeouts)):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            metrics.inc("http_requests", host=host, status=response.status_code)
+            if response.status_code not in retry_statuses or attempt == self.retries:
+                return response
+            await asyncio.sleep(backoff_delay(attempt, response.headers.get("Retry-After")))
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def llm_post(self, url, **kwargs):
+        return await self.request("POST", url, retry_read_timeouts=False, **kwargs)
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
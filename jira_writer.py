@@ -0,0 +1,178 @@
+"""
+Bulk, concurrent Jira issue creation for a {main task: [sub-tasks]} plan.
+
+Issue-type metadata is fetched once per writer. Parents are created first, then all
+children are created in batches through the bulk-create endpoint with a bounded number
+of requests in flight. Requests go through http_transport, so 429/5xx responses are
+retried after Retry-After (or a jittered exponential backoff). Bulk creates are only
+retried on 429/503 or when the connection was never made, so a batch Jira already
+committed is not created twice.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_transport
+
+# === Configuration ===
+BULK_SIZE = 50  # Jira's limit for /rest/api/3/issue/bulk
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 5
+RETIRED_LABEL = "removed-from-spec"
+
+
+def adf(text):
+    """Wrap plain text in the Atlassian Document Format the v3 API expects."""
+    return {
+        "type": "doc",
+        "version": 1,
+        "content": [{"type": "paragraph", "content": [{"type": "text", "text": text or " "}]}],
+    }
+
+
+class JiraWriter:
+    def __init__(self, base_url, email, api_token, project_key, max_concurrency=MAX_CONCURRENCY,
+                 max_retries=MAX_RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.project_key = project_key
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.auth = (email, api_token)
+        self.headers = {"Accept": "application/json", "Content-Type": "application/json"}
+        self._issue_types = None
+        self.issue_types_error = None  # why the last issue-type lookup failed, for the caller to show
+
+    # === HTTP ===
+    def _request(self, method, path, idempotent=True, **kwargs):
+        return http_transport.request(method, f"{self.base_url}{path}", auth=self.auth, headers=self.headers,
+                                      retries=self.max_retries, idempotent=idempotent, **kwargs)
+
+    # === Metadata ===
+    @property
+    def issue_types(self):
+        """
+        {name: id} of the instance's issue types, fetched on first successful use only.
+
+        If Jira refuses, issue_types_error is set and {} is returned (and asked again next time).
+        """
+        if self._issue_types is None:
+            try:
+                response = self._request("GET", "/rest/api/3/issuetype")
+                response.raise_for_status()
+            except requests.RequestException as e:
+                self.issue_types_error = f"Could not fetch issue types from Jira: {e}"
+                return {}
+            self.issue_types_error = None
+            self._issue_types = {item['name']: item['id'] for item in response.json()}
+        return self._issue_types
+
+    def resolve_issue_type(self, name, fallback="Task"):
+        issue_types = self.issue_types
+        if not issue_types:
+            return name  # types unknown: let Jira judge the requested one
+        return name if name in issue_types else fallback
+
+    # === Creation ===
+    def _fields(self, summary, description, issue_type, parent_key=None):
+        fields = {
+            "project": {"key": self.project_key},
+            "summary": summary,
+            "description": adf(description),
+            "issuetype": {"name": issue_type},
+        }
+        if parent_key:
+            fields["parent"] = {"key": parent_key}
+        return fields
+
+    def _create_batch(self, batch):
+        """POST one bulk request; returns (keys, errors) with keys[i] None for failed elements."""
+        try:
+            # Not retried once Jira may have seen it: a retry could create the batch twice
+            response = self._request("POST", "/rest/api/3/issue/bulk", idempotent=False,
+                                     json={"issueUpdates": [{"fields": fields} for fields in batch]})
+        except requests.RequestException as e:
+            error = f"Outcome unknown, check Jira before retrying: {e}"
+            return [None] * len(batch), [error] * len(batch)
+        if response.status_code not in (200, 201):
+            return [None] * len(batch), [response.text] * len(batch)
+
+        body = response.json()
+        failed = {e["failedElementNumber"]: str(e.get("elementErrors", e)) for e in body.get("errors", [])}
+        created = iter(body.get("issues", []))
+        keys, errors = [], []
+        for i in range(len(batch)):
+            if i in failed:
+                keys.append(None)
+                errors.append(failed[i])
+            else:
+                keys.append(next(created)["key"])
+                errors.append(None)
+        return keys, errors
+
+    def create_issues(self, issue_fields):
+        """Create issues in bulk batches concurrently; returns (keys, errors) aligned with the input."""
+        batches = [issue_fields[i:i + BULK_SIZE] for i in range(0, len(issue_fields), BULK_SIZE)]
+        keys, errors = [], []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for batch_keys, batch_errors in pool.map(self._create_batch, batches):
+                keys.extend(batch_keys)
+                errors.extend(batch_errors)
+        return keys, errors
+
+    def create_children(self, children, child_type="Task", child_description="Sub-task of {parent}"):
+        """Create (parent_key, summary) pairs as child issues; returns (keys, errors) aligned with the input."""
+        child_type = self.resolve_issue_type(child_type)
+        return self.create_issues(
+            [self._fields(summary, child_description.format(parent=parent_key), child_type, parent_key)
+             for parent_key, summary in children]
+        )
+
+    def create_plan(self, task_map, parent_type="Epic", child_type="Task",
+                    parent_description="Created from task plan", child_description="Sub-task of {parent}"):
+        """
+        Create every main task, then every sub-task under its parent.
+
+        Returns (created, errors): created maps main task -> (key, {sub-task: key}),
+        errors is a list of (summary, message) for issues that could not be created.
+        """
+        parent_type = self.resolve_issue_type(parent_type)
+        main_tasks = list(task_map)
+
+        parent_keys, parent_errors = self.create_issues(
+            [self._fields(main, parent_description, parent_type) for main in main_tasks]
+        )
+
+        children = [
+            (main, sub, parent_key)
+            for main, parent_key in zip(main_tasks, parent_keys) if parent_key
+            for sub in task_map[main]
+        ]
+        child_keys, child_errors = self.create_children(
+            [(parent_key, sub) for _, sub, parent_key in children], child_type, child_description
+        )
+
+        created = {main: (key, {}) for main, key in zip(main_tasks, parent_keys)}
+        for (main, sub, _), key in zip(children, child_keys):
+            created[main][1][sub] = key
+
+        errors = [(main, error) for main, error in zip(main_tasks, parent_errors) if error]
+        errors += [(sub, error) for (_, sub, _), error in zip(children, child_errors) if error]
+        errors += [(sub, f"Parent '{main}' was not created")
+                   for main, key in zip(main_tasks, parent_keys) if not key for sub in task_map[main]]
+        return created, errors
+
+    # === Retiring ===
+    def _label(self, key, label):
+        response = self._request("PUT", f"/rest/api/3/issue/{key}",
+                                 json={"update": {"labels": [{"add": label}]}})
+        return None if response.status_code in (200, 204) else response.text
+
+    def label_issues(self, keys, label=RETIRED_LABEL):
+        """
+        Add a label to existing issues, concurrently; returns [(key, error)] for failures.
+
+        Used to flag issues whose task disappeared from the plan instead of deleting them.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            errors = list(pool.map(lambda key: self._label(key, label), keys))
+        return [(key, error) for key, error in zip(keys, errors) if error]
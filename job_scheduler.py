@@ -0,0 +1,98 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when too many jobs are already waiting to run."""
+
+
+def job_id_for(params):
+    """Identical parameter sets map to the same job id, so resubmissions are deduplicated."""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+class Job:
+    def __init__(self, job_id, params):
+        self.id = job_id
+        self.params = params
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def report(self, **progress):
+        """Called from the worker thread to publish progress (epoch, loss, eta, ...)."""
+        self.progress = dict(self.progress, **progress)
+
+
+class JobScheduler:
+    """
+    Runs long jobs on a background thread pool so Streamlit reruns do not interrupt them.
+
+    At most max_queued jobs may wait for a worker; finished jobs are kept (up to
+    keep_finished) so a rerun with the same parameters gets the stored result.
+    """
+
+    def __init__(self, max_workers=1, max_queued=8, keep_finished=50):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+
+    def submit(self, params, fn):
+        """
+        Queue fn(job) for params and return its job id right away.
+
+        If a job with the same params is queued, running or finished successfully, its id
+        is returned instead of starting a new one.
+        """
+        job_id = job_id_for(params)
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing is not None and existing.status != "failed":
+                self._jobs.move_to_end(job_id)
+                return job_id
+
+            queued = sum(1 for job in self._jobs.values() if job.status == "queued")
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"{queued} jobs are already waiting; try again later.")
+
+            job = Job(job_id, params)
+            self._jobs[job_id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job, fn):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(job)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
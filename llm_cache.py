@@ -0,0 +1,139 @@
+"""
+Disk-backed cache of LLM responses shared by every model call site.
+
+Entries are keyed by a SHA-256 of (endpoint, model, prompt/messages, temperature,
+max_tokens, ...) and stored in a SQLite file. The cache is bounded in bytes with
+least-recently-used eviction, entries can expire after a TTL, and setting
+LLM_CACHE_DISABLED=1 (or passing bypass=True) skips it entirely.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# === Configuration ===
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '.llm_cache.sqlite3')
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '0'))  # seconds; 0 means entries never expire
+LLM_CACHE_DISABLED = os.getenv('LLM_CACHE_DISABLED', '').lower() in ('1', 'true', 'yes')
+
+
+def cache_key(endpoint, model, prompt=None, messages=None, temperature=None, max_tokens=None, **extra):
+    raw = json.dumps({
+        "endpoint": endpoint,
+        "model": model,
+        "prompt": prompt,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "extra": extra,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL,
+                 enabled=not LLM_CACHE_DISABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                metrics.inc("llm_cache_misses")
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            metrics.inc("llm_cache_hits")
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until 90% of the budget is free again
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if freed >= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            freed += size
+
+    def cached_call(self, call, endpoint, model, prompt=None, messages=None, temperature=None,
+                    max_tokens=None, bypass=False, **extra):
+        """
+        Return the cached text for these request parameters, or run call() and cache its result.
+
+        call() must return the response text; a None result is returned but not cached.
+        """
+        if bypass or not self.enabled:
+            return call()
+        key = cache_key(endpoint, model, prompt, messages, temperature, max_tokens, **extra)
+        value = self.get(key)
+        if value is None:
+            value = call()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache instance used by all call sites."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
+
+
+def cached_call(call, endpoint, model, **request):
+    """Shortcut for get_cache().cached_call(...)."""
+    return get_cache().cached_call(call, endpoint, model, **request)
@@ -0,0 +1,165 @@
+import time
+
+import pandas as pd
+
+from model_registry import registry_key
+from windowing import as_float32, make_forecast_windows
+
+# === Configuration ===
+TIME_STEP = 60
+EPOCHS = 50
+FINE_TUNE_EPOCHS = 5
+FORECAST_DAYS = 30
+BATCH_SIZE = 32
+VALIDATION_SPLIT = 0.1
+PATIENCE = 5
+FEATURE_RANGE = (0, 1)
+ARCHITECTURE = {"lstm_units": [50, 50], "dropout": 0.2, "dense_units": 25}
+FEATURE_CHOICES = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def select_features(features):
+    """Order the chosen OHLCV columns; 'Close' is the prediction target so it is always included."""
+    return [c for c in FEATURE_CHOICES if c in features or c == "Close"]
+
+
+# === Model ===
+def build_model(time_step, n_features, architecture=ARCHITECTURE):
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    from tensorflow.keras.models import Sequential
+
+    units = architecture["lstm_units"]
+    layers = []
+    for i, n_units in enumerate(units):
+        kwargs = {"input_shape": (time_step, n_features)} if i == 0 else {}
+        layers.append(LSTM(units=n_units, return_sequences=i < len(units) - 1, **kwargs))
+        layers.append(Dropout(architecture["dropout"]))
+    layers.append(Dense(units=architecture["dense_units"]))
+    layers.append(Dense(units=1))
+
+    model = Sequential(layers)
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+# === Training Pipeline ===
+def _window_dataset(data, targets, time_step, batch_size, shuffle):
+    from tensorflow import data as tf_data
+    from tensorflow.keras.utils import timeseries_dataset_from_array
+
+    # Windows are cut lazily from the series batch by batch; nothing is materialized up front
+    dataset = timeseries_dataset_from_array(
+        data, targets, sequence_length=time_step, batch_size=batch_size, shuffle=shuffle, seed=0
+    )
+    return dataset.prefetch(tf_data.AUTOTUNE)
+
+
+def fit_model(model, scaled_data, time_step, target_index, epochs=EPOCHS, batch_size=BATCH_SIZE,
+              early_stopping=True, validation_split=VALIDATION_SPLIT, patience=PATIENCE, on_epoch=None):
+    """
+    Train model on every window of scaled_data through a prefetching tf.data pipeline.
+
+    With early_stopping, the last validation_split of the windows is held out and training
+    stops once val_loss has not improved for `patience` epochs (best weights are restored),
+    so `epochs` is only a cap. on_epoch(epoch, logs, seconds) is called after every epoch.
+    Returns the list of per-epoch {"epoch", "loss", "val_loss", "seconds"} records.
+    """
+    from tensorflow.keras.callbacks import Callback, EarlyStopping
+
+    data = as_float32(scaled_data)
+    # Window i covers data[i:i + time_step] and predicts data[i + time_step]
+    inputs, targets = data[:-1], data[time_step:, target_index]
+    n_windows = len(targets)
+    n_val = int(n_windows * validation_split) if early_stopping else 0
+
+    validation = None
+    if n_val > 0:
+        n_train = n_windows - n_val
+        train = _window_dataset(inputs[:n_train + time_step - 1], targets[:n_train], time_step, batch_size, True)
+        validation = _window_dataset(inputs[n_train:], targets[n_train:], time_step, batch_size, False)
+    else:
+        train = _window_dataset(inputs, targets, time_step, batch_size, True)
+
+    history = []
+
+    class EpochReporter(Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.started = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            seconds = time.perf_counter() - self.started
+            history.append({
+                "epoch": epoch + 1,
+                "loss": logs.get("loss"),
+                "val_loss": logs.get("val_loss"),
+                "seconds": seconds,
+            })
+            if on_epoch:
+                on_epoch(epoch + 1, logs, seconds)
+
+    callbacks = [EpochReporter()]
+    if validation is not None:
+        callbacks.append(EarlyStopping(monitor="val_loss", patience=patience, restore_best_weights=True))
+
+    model.fit(train, validation_data=validation, epochs=epochs, callbacks=callbacks, verbose=0)
+    return history
+
+
+# === Train or Warm-Start ===
+def train_or_update(registry, symbol, stock_data, feature_columns, time_step=TIME_STEP,
+                    epochs=EPOCHS, fine_tune_epochs=FINE_TUNE_EPOCHS, retrain=False,
+                    batch_size=BATCH_SIZE, early_stopping=True, on_epoch=None):
+    """
+    Return (model, scaler, scaled_data, status) for symbol, reusing the registry when possible.
+
+    A registry hit with no new bars is returned as-is. A hit with new bars since the last
+    training date is fine-tuned on only the windows that end in those bars. A miss (or
+    retrain=True) trains a fresh model on the full history and stores it; see fit_model
+    for batch_size, early_stopping and on_epoch.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+
+    target_index = feature_columns.index("Close")
+    scaler_params = {"feature_range": list(FEATURE_RANGE), "features": feature_columns}
+    key = registry_key(symbol, time_step, ARCHITECTURE, scaler_params)
+    values = stock_data[feature_columns].values
+    last_date = stock_data.index[-1]
+
+    cached = None if retrain else registry.load(key)
+    if cached is not None:
+        model, scaler, meta = cached
+        scaled_data = scaler.transform(values)
+        new_rows = int((stock_data.index > pd.Timestamp(meta["trained_until"])).sum())
+        if new_rows == 0:
+            return model, scaler, scaled_data, "Loaded saved model"
+
+        # Only the windows whose target is one of the new bars
+        fit_model(model, scaled_data[-(new_rows + time_step):], time_step, target_index,
+                  epochs=fine_tune_epochs, batch_size=batch_size, early_stopping=False, on_epoch=on_epoch)
+        registry.save(key, model, scaler, dict(meta, trained_until=last_date.isoformat()))
+        return model, scaler, scaled_data, f"Fine-tuned saved model on {new_rows} new bars"
+
+    scaler = MinMaxScaler(feature_range=FEATURE_RANGE)
+    scaled_data = scaler.fit_transform(values)
+
+    model = build_model(time_step, len(feature_columns))
+    history = fit_model(model, scaled_data, time_step, target_index, epochs=epochs, batch_size=batch_size,
+                        early_stopping=early_stopping, on_epoch=on_epoch)
+    registry.save(key, model, scaler, {
+        "symbol": symbol.upper(),
+        "time_step": time_step,
+        "architecture": ARCHITECTURE,
+        "scaler": scaler_params,
+        "trained_until": last_date.isoformat(),
+    })
+    return model, scaler, scaled_data, f"Trained new model for {len(history)} epochs"
+
+
+# === Predict ===
+def forecast_tail(model, scaler, scaled_data, target_index, time_step=TIME_STEP, days=FORECAST_DAYS):
+    """Predict the last `days` closes and return them in price units."""
+    X_test = make_forecast_windows(scaled_data, time_step, days)
+    predicted = model.predict(X_test, verbose=0).reshape(-1)
+    # Undo the MinMax scaling of the target column only
+    return predicted * scaler.data_range_[target_index] + scaler.data_min_[target_index]
@@ -0,0 +1,224 @@
+"""
+Process-wide timers and counters for every entry point.
+
+    with metrics.timer("llm", model="llama3"):
+        ...
+    @metrics.timer("extract")
+    def extract(...): ...
+    metrics.inc("http_retries", host="api.groq.com")
+
+Timers keep count/sum/max per stage, counters keep running totals; both are labelled.
+Recording one value is a perf_counter() call and a dict update under a lock, so it is
+cheap enough for hot paths. flush() writes the current values as a Prometheus text file
+(for node_exporter's textfile collector) and appends a JSON line, at most once every
+METRICS_FLUSH_SECONDS per process.
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+# === Configuration ===
+METRICS_DIR = os.getenv('METRICS_DIR', '.metrics')
+METRICS_DISABLED = os.getenv('METRICS_DISABLED', '').lower() in ('1', 'true', 'yes')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '10'))
+PREFIX = "planner"
+
+_lock = threading.RLock()
+_counters = {}  # (name, labels) -> total
+_timers = {}  # (name, labels) -> [count, sum, max]
+_last_flush = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# === Recording ===
+def inc(name, value=1, **labels):
+    """Add value to a counter."""
+    if METRICS_DISABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(stage, seconds, **labels):
+    """Record one duration for a stage."""
+    if METRICS_DISABLED:
+        return
+    key = _key(stage, labels)
+    with _lock:
+        entry = _timers.get(key)
+        if entry is None:
+            _timers[key] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+
+class timer:
+    """Time a block (`with timer("jira"):`) or every call of a function or coroutine function (`@timer("jira")`)."""
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+        self.seconds = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        observe(self.stage, self.seconds, **self.labels)
+        if exc_type is not None:
+            inc("stage_errors", stage=self.stage)
+        return False
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timer(self.stage, **self.labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(self.stage, **self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def record_tokens(model, prompt_tokens=None, completion_tokens=None):
+    """Count prompt/completion tokens reported by an LLM backend (None values are skipped)."""
+    if prompt_tokens:
+        inc("llm_prompt_tokens", prompt_tokens, model=model)
+    if completion_tokens:
+        inc("llm_completion_tokens", completion_tokens, model=model)
+
+
+# === Reading ===
+def snapshot():
+    """{"counters": [...], "timers": [...]} with one dict per labelled series."""
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in _counters.items()]
+        timers = [{"stage": name, "labels": dict(labels), "count": c, "seconds": s, "max_seconds": m}
+                  for (name, labels), (c, s, m) in _timers.items()]
+    return {"counters": counters, "timers": timers}
+
+
+def timing_rows():
+    """Per-stage rows (stage, calls, total/mean/max seconds), slowest total first, for a UI table."""
+    rows = []
+    for t in snapshot()["timers"]:
+        label = ",".join(f"{k}={v}" for k, v in t["labels"].items())
+        rows.append({
+            "stage": t["stage"] + (f" [{label}]" if label else ""),
+            "calls": t["count"],
+            "total_s": round(t["seconds"], 3),
+            "mean_s": round(t["seconds"] / t["count"], 3),
+            "max_s": round(t["max_seconds"], 3),
+        })
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def drain():
+    """snapshot() and reset() in one step, for handing a worker's metrics to its parent."""
+    with _lock:
+        data = snapshot()
+        _counters.clear()
+        _timers.clear()
+    return data
+
+
+def merge(data):
+    """Add a snapshot()/drain() from another process into this one."""
+    if METRICS_DISABLED:
+        return
+    for c in data["counters"]:
+        inc(c["name"], c["value"], **c["labels"])
+    with _lock:
+        for t in data["timers"]:
+            key = _key(t["stage"], t["labels"])
+            entry = _timers.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += t["count"]
+            entry[1] += t["seconds"]
+            entry[2] = max(entry[2], t["max_seconds"])
+
+
+def collect(fn, *args, **kwargs):
+    """Run fn in a pool worker; returns (result, the metrics it recorded) for merge() in the parent."""
+    result = fn(*args, **kwargs)
+    return result, drain()
+
+
+# === Export ===
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}" if labels else ""
+
+
+def prometheus_text(app):
+    data = snapshot()
+    lines = []
+    for name in sorted({c["name"] for c in data["counters"]}):
+        lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+        for c in data["counters"]:
+            if c["name"] == name:
+                lines.append(f"{PREFIX}_{name}_total{_labels({'app': app, **c['labels']})} {c['value']}")
+    if data["timers"]:
+        lines.append(f"# TYPE {PREFIX}_stage_seconds summary")
+        for t in data["timers"]:
+            labels = _labels({"app": app, "stage": t["stage"], **t["labels"]})
+            lines.append(f"{PREFIX}_stage_seconds_count{labels} {t['count']}")
+            lines.append(f"{PREFIX}_stage_seconds_sum{labels} {t['seconds']:.6f}")
+        lines.append(f"# TYPE {PREFIX}_stage_seconds_max gauge")
+        for t in data["timers"]:
+            labels = _labels({"app": app, "stage": t["stage"], **t["labels"]})
+            lines.append(f"{PREFIX}_stage_seconds_max{labels} {t['max_seconds']:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def flush(app, directory=METRICS_DIR, force=False):
+    """
+    Write <directory>/<app>.prom and append to <directory>/<app>.jsonl.
+
+    Skipped if this app flushed less than METRICS_FLUSH_SECONDS ago, unless force is set.
+    """
+    if METRICS_DISABLED:
+        return
+    now = time.time()
+    with _lock:
+        if not force and now - _last_flush.get(app, 0) < METRICS_FLUSH_SECONDS:
+            return
+        _last_flush[app] = now
+    os.makedirs(directory, exist_ok=True)
+    prom_path = os.path.join(directory, f"{app}.prom")
+    tmp_path = f"{prom_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(app))
+    os.replace(tmp_path, prom_path)  # the textfile collector must never see a half-written file
+    with open(os.path.join(directory, f"{app}.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"time": now, "app": app, "pid": os.getpid(), **snapshot()}) + "\n")
+
+
+def flush_at_exit(app):
+    """Flush once more when a CLI process exits."""
+    atexit.register(flush, app, force=True)
@@ -0,0 +1,371 @@
+"""
+Local stand-in servers for developing against Jira, GitHub and Ollama without touching real instances.
+
+Usage:
+    python mock_servers.py jira --port 8081 [--throttle-every 10]
+    python mock_servers.py github --port 8082
+    python mock_servers.py ollama --port 11434 [--latency 0.5]
+
+Then point JIRA_BASE_URL (or GITHUB_API_URL, OLLAMA_URL) at the printed URL.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# === Jira ===
+class MockJira:
+    """
+    Minimal Jira Cloud REST v3: issue types, single and bulk issue creation, label updates.
+
+    Every throttle_every-th request is answered with 429 and Retry-After: 0 so retry
+    handling can be exercised. Created issues are kept in self.issues.
+    """
+
+    ISSUE_TYPES = ["Epic", "Story", "Task", "Sub-task", "Bug"]
+
+    def __init__(self, host="127.0.0.1", port=0, project_key="DEMO", throttle_every=0):
+        self.project_key = project_key
+        self.throttle_every = throttle_every
+        self.issues = {}
+        self.requests = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _create(self, fields):
+        if not fields.get("summary"):
+            return None, {"summary": "You must specify a summary of the issue."}
+        issue_type = fields.get("issuetype", {}).get("name")
+        if issue_type not in self.ISSUE_TYPES:
+            return None, {"issuetype": f"Issue type '{issue_type}' does not exist."}
+        parent = fields.get("parent", {}).get("key")
+        if parent and parent not in self.issues:
+            return None, {"parent": f"Parent '{parent}' does not exist."}
+        with self._lock:
+            issue_id = next(self._ids)
+        key = f"{self.project_key}-{issue_id}"
+        self.issues[key] = fields
+        return {"id": str(issue_id), "key": key, "self": f"{self.url}/rest/api/3/issue/{issue_id}"}, None
+
+    def _handler(self):
+        jira = self
+
+        class Handler(_JsonHandler):
+            def _throttled(self):
+                with jira._lock:
+                    jira.requests.append((self.command, self.path))
+                    count = len(jira.requests)
+                if jira.throttle_every and count % jira.throttle_every == 0:
+                    self._send(429, {"errorMessages": ["Rate limit exceeded."]}, {"Retry-After": "0"})
+                    return True
+                return False
+
+            def do_GET(self):
+                if self._throttled():
+                    return
+                if self.path.startswith("/rest/api/3/issuetype"):
+                    self._send(200, [{"id": str(i), "name": n} for i, n in enumerate(jira.ISSUE_TYPES, 1)])
+                else:
+                    self._send(404, {"errorMessages": ["Not found."]})
+
+            def do_POST(self):
+                if self._throttled():
+                    return
+                body = self._body()
+                if self.path == "/rest/api/3/issue":
+                    issue, error = jira._create(body.get("fields", {}))
+                    self._send(201 if issue else 400, issue or {"errors": error})
+                elif self.path == "/rest/api/3/issue/bulk":
+                    issues, errors = [], []
+                    for i, update in enumerate(body.get("issueUpdates", [])):
+                        issue, error = jira._create(update.get("fields", {}))
+                        if issue:
+                            issues.append(issue)
+                        else:
+                            errors.append({"failedElementNumber": i, "elementErrors": {"errors": error},
+                                           "status": 400})
+                    self._send(201, {"issues": issues, "errors": errors})
+                else:
+                    self._send(404, {"errorMessages": ["Not found."]})
+
+            def do_PUT(self):
+                if self._throttled():
+                    return
+                body = self._body()
+                key = self.path[len("/rest/api/3/issue/"):] if self.path.startswith("/rest/api/3/issue/") else None
+                if key not in jira.issues:
+                    self._send(404, {"errorMessages": ["Issue does not exist."]})
+                    return
+                labels = jira.issues[key].setdefault("labels", [])
+                for change in body.get("update", {}).get("labels", []):
+                    if "add" in change and change["add"] not in labels:
+                        labels.append(change["add"])
+                    if "remove" in change and change["remove"] in labels:
+                        labels.remove(change["remove"])
+                self._send(204)
+
+        return Handler
+
+
+# === GitHub ===
+class MockGitHub:
+    """
+    Minimal GitHub REST API for one repository: repo lookup, branches and git refs
+    (list, get, create, delete).
+
+    The repository named repo_name starts with a single `main` branch. Rate-limit headers
+    count down from rate_limit on every request. Every throttle_every-th request is
+    answered like GitHub's secondary rate limit (403 with Retry-After: 0). Created
+    branches are kept in self.refs.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, repo_name="demo/project", rate_limit=5000, throttle_every=0):
+        self.repo_name = repo_name
+        self.rate_limit = rate_limit
+        self.remaining = rate_limit
+        self.throttle_every = throttle_every
+        self.refs = {"main": "0" * 40}
+        self.requests = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+
+    url = MockJira.url
+    start = MockJira.start
+    stop = MockJira.stop
+
+    def _handler(self):
+        github = self
+        repo_path = f"/repos/{self.repo_name}"
+
+        class Handler(_JsonHandler):
+            def _reply(self, status, payload, headers=None):
+                with github._lock:
+                    github.requests.append((self.command, self.path))
+                    github.remaining = max(0, github.remaining - 1)
+                    remaining = github.remaining
+                self._send(status, payload, {
+                    "X-RateLimit-Limit": str(github.rate_limit),
+                    "X-RateLimit-Remaining": str(remaining),
+                    "X-RateLimit-Reset": "0",
+                    **(headers or {}),
+                })
+
+            def _throttled(self):
+                with github._lock:
+                    count = len(github.requests) + 1
+                if github.throttle_every and count % github.throttle_every == 0:
+                    self._reply(403, {"message": "You have exceeded a secondary rate limit. Please wait a few "
+                                                 "minutes before you try again."}, {"Retry-After": "0"})
+                    return True
+                return False
+
+            def _ref(self, name):
+                return {
+                    "ref": f"refs/heads/{name}",
+                    "url": f"{github.url}{repo_path}/git/refs/heads/{name}",
+                    "object": {"sha": github.refs[name], "type": "commit"},
+                }
+
+            def do_GET(self):
+                if self._throttled():
+                    return
+                path = unquote(self.path.split("?")[0])
+                if path == repo_path:
+                    self._reply(200, {
+                        "full_name": github.repo_name,
+                        "name": github.repo_name.split("/")[-1],
+                        "url": f"{github.url}{repo_path}",
+                        "default_branch": "main",
+                    })
+                elif path.startswith(f"{repo_path}/branches/"):
+                    name = path[len(f"{repo_path}/branches/"):]
+                    if name in github.refs:
+                        self._reply(200, {"name": name, "commit": {"sha": github.refs[name]}})
+                    else:
+                        self._reply(404, {"message": "Branch not found"})
+                elif path.startswith(f"{repo_path}/git/ref/heads/"):
+                    name = path[len(f"{repo_path}/git/ref/heads/"):]
+                    if name in github.refs:
+                        self._reply(200, self._ref(name))
+                    else:
+                        self._reply(404, {"message": "Not Found"})
+                elif path.startswith(f"{repo_path}/git/matching-refs/heads/"):
+                    prefix = path[len(f"{repo_path}/git/matching-refs/heads/"):]
+                    self._reply(200, [self._ref(n) for n in sorted(github.refs) if n.startswith(prefix)])
+                else:
+                    self._reply(404, {"message": "Not Found"})
+
+            def do_POST(self):
+                body = self._body()
+                if self._throttled():
+                    return
+                if self.path == f"{repo_path}/git/refs":
+                    name = body.get("ref", "")[len("refs/heads/"):]
+                    with github._lock:
+                        exists = name in github.refs
+                        if not exists:
+                            github.refs[name] = body.get("sha")
+                    if exists:
+                        self._reply(422, {"message": "Reference already exists"})
+                    else:
+                        self._reply(201, self._ref(name))
+                else:
+                    self._reply(404, {"message": "Not Found"})
+
+            def do_DELETE(self):
+                if self._throttled():
+                    return
+                path = unquote(self.path.split("?")[0])
+                name = path[len(f"{repo_path}/git/refs/heads/"):]
+                if path.startswith(f"{repo_path}/git/refs/heads/") and name in github.refs:
+                    with github._lock:
+                        del github.refs[name]
+                    self._reply(204, None)
+                else:
+                    self._reply(422, {"message": "Reference does not exist"})
+
+        return Handler
+
+
+# === Ollama ===
+class MockOllama:
+    """
+    Minimal Ollama API: /api/tags, and /api/generate and /api/chat with or without streaming.
+
+    Every prompt gets a deterministic task plan ({main task: [sub-tasks]}) as its JSON reply,
+    after `latency` seconds, with token counts estimated from text length. Every
+    throttle_every-th generation is answered with 503, as Ollama does when its queue is full.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, model="llama3", latency=0.0, tasks_per_reply=3, throttle_every=0):
+        self.model = model
+        self.latency = latency
+        self.tasks_per_reply = tasks_per_reply
+        self.throttle_every = throttle_every
+        self.requests = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+
+    url = MockJira.url
+    start = MockJira.start
+    stop = MockJira.stop
+
+    def reply_for(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:6]
+        return json.dumps({
+            f"Task {digest}-{i}": [f"Design {digest}-{i}", f"Implement {digest}-{i}"]
+            for i in range(1, self.tasks_per_reply + 1)
+        })
+
+    def _handler(self):
+        ollama = self
+
+        class Handler(_JsonHandler):
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send(200, {"models": [{"name": ollama.model}]})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = self._body()
+                with ollama._lock:
+                    ollama.requests.append((self.command, self.path))
+                    count = len(ollama.requests)
+                if ollama.throttle_every and count % ollama.throttle_every == 0:
+                    self._send(503, {"error": "server busy, please try again. maximum pending requests exceeded"})
+                    return
+                if self.path == "/api/generate":
+                    prompt, field = body.get("prompt"), "response"
+                elif self.path == "/api/chat":
+                    prompt, field = (body.get("messages") or [{}])[-1].get("content"), "message"
+                else:
+                    self._send(404, {"error": "not found"})
+                    return
+                if not prompt:  # preload request
+                    self._send(200, {"model": body.get("model"), "done": True})
+                    return
+
+                time.sleep(ollama.latency)
+                reply = ollama.reply_for(prompt)
+                counts = {"prompt_eval_count": len(prompt) // 4 + 1, "eval_count": len(reply) // 4 + 1}
+
+                def piece(text):
+                    return {"message": {"role": "assistant", "content": text}} if field == "message" else {field: text}
+
+                if not body.get("stream", True):
+                    self._send(200, {"model": body.get("model"), **piece(reply), "done": True, **counts})
+                    return
+                lines = [{**piece(reply[i:i + 16]), "done": False} for i in range(0, len(reply), 16)]
+                lines.append({**piece(""), "done": True, **counts})
+                data = b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+SERVERS = {"jira": MockJira, "github": MockGitHub, "ollama": MockOllama}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in server.")
+    parser.add_argument("service", choices=sorted(SERVERS))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request as rate-limited")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per Ollama reply")
+    args = parser.parse_args()
+
+    options = {"latency": args.latency} if args.service == "ollama" else {}
+    server = SERVERS[args.service](args.host, args.port, throttle_every=args.throttle_every, **options)
+    print(f"Mock {args.service} listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
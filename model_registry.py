@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+# === Configuration ===
+MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', '.model_registry')
+MODEL_REGISTRY_MAX_ENTRIES = int(os.getenv('MODEL_REGISTRY_MAX_ENTRIES', '20'))
+MODEL_REGISTRY_MAX_BYTES = int(os.getenv('MODEL_REGISTRY_MAX_BYTES', str(500 * 1024 * 1024)))
+MODEL_REGISTRY_MAX_AGE_DAYS = float(os.getenv('MODEL_REGISTRY_MAX_AGE_DAYS', '30'))
+
+
+def registry_key(symbol, time_step, architecture, scaler_params):
+    """Stable key for a trained model: symbol, window length, architecture and scaler settings."""
+    raw = json.dumps({
+        "symbol": symbol.upper(),
+        "time_step": time_step,
+        "architecture": architecture,
+        "scaler": scaler_params,
+    }, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class ModelRegistry:
+    """
+    On-disk store of trained Keras models and their fitted scalers.
+
+    Each entry lives in <root>/<key>/ with model.keras, scaler.pkl and meta.json.
+    Entries older than max_age_days are invalidated, and once the registry holds more
+    than max_entries entries or max_bytes on disk, the least recently used are evicted.
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR, max_entries=MODEL_REGISTRY_MAX_ENTRIES,
+                 max_bytes=MODEL_REGISTRY_MAX_BYTES, max_age_days=MODEL_REGISTRY_MAX_AGE_DAYS):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _read_meta(self, key):
+        meta_path = os.path.join(self._entry_dir(key), "meta.json")
+        # Another process may be evicting this entry while we read it
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        meta_path = os.path.join(self._entry_dir(key), "meta.json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def entries(self):
+        """Return {key: meta} for every complete entry."""
+        result = {}
+        for key in os.listdir(self.root):
+            if ".tmp" in key:
+                continue
+            meta = self._read_meta(key)
+            if meta is not None:
+                result[key] = meta
+        return result
+
+    def load(self, key):
+        """Return (model, scaler, meta) for key, or None if it is missing or expired."""
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        if time.time() - meta["created"] > self.max_age_days * 86400:
+            self.invalidate(key)
+            return None
+
+        from tensorflow.keras.models import load_model
+
+        entry_dir = self._entry_dir(key)
+        model = load_model(os.path.join(entry_dir, "model.keras"))
+        with open(os.path.join(entry_dir, "scaler.pkl"), "rb") as f:
+            scaler = pickle.load(f)
+
+        meta["last_used"] = time.time()
+        self._write_meta(key, meta)
+        return model, scaler, meta
+
+    def save(self, key, model, scaler, meta):
+        """Store a model and scaler under key, replacing any previous entry, then evict."""
+        tmp_dir = self._entry_dir(key) + f".tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        model.save(os.path.join(tmp_dir, "model.keras"))
+        with open(os.path.join(tmp_dir, "scaler.pkl"), "wb") as f:
+            pickle.dump(scaler, f)
+
+        now = time.time()
+        meta = dict(meta, created=meta.get("created", now), last_used=now)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        os.replace(tmp_dir, self._entry_dir(key))
+        self.evict()
+
+    def invalidate(self, key=None, symbol=None):
+        """Remove one entry by key, every entry for a symbol, or everything if neither is given."""
+        for entry_key, meta in self.entries().items():
+            if key is not None and entry_key != key:
+                continue
+            if symbol is not None and meta.get("symbol", "").upper() != symbol.upper():
+                continue
+            shutil.rmtree(self._entry_dir(entry_key), ignore_errors=True)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until within the size limits."""
+        now = time.time()
+        entries = []
+        for key, meta in self.entries().items():
+            if now - meta["created"] > self.max_age_days * 86400:
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            else:
+                entries.append((meta["last_used"], key, _dir_size(self._entry_dir(key))))
+
+        entries.sort()
+        total_bytes = sum(size for _, _, size in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, key, size = entries.pop(0)
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total_bytes -= size
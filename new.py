@@ -1,12 +1,18 @@
-import docx2txt
+import sys
+from document_extraction import extract_text
 import subprocess
+import requests
+import metrics
+from llm_cache import cached_call
+from ollama_client import MAX_CONCURRENCY, OllamaClient
+from structured_output import TASK_TREE_SCHEMA, TaskStreamParser
 
 DOCX_PATH = "demo.docx"
 OLLAMA_MODEL_NAME = "llama3.1"  # Use your installed model name from `ollama list`
 
 def extract_text_from_docx(docx_path):
     """Extracts text from a .docx file and returns it as a string."""
-    return docx2txt.process(docx_path)
+    return extract_text(docx_path)
 
 def prrse_tasks(text):
     """Parses lines and filters out empty ones."""
@@ -17,9 +23,8 @@ def clean_text(text):
     """Clean text to avoid encoding issues."""
     return text.encode("utf-8", errors="ignore").decode("utf-8", errors="ignore")
 
-def summarize_with_ollama(text, model_name):
-    """Sends text to the LLaMA model via Ollama and returns the summary."""
-    prompt = f"""
+def build_prompt(text):
+    return f"""
 You are a Jira Ticket Creation Expert.  
 Your job is to read and analyze the content of the provided project document and extract the hierarchical structure of tasks involved, suitable for Jira ticketing.
 
@@ -47,36 +52,100 @@ Document:
 \"\"\"
 """
 
-    result = subprocess.run(
-        ["ollama", "run", model_name],
-        input=prompt,
-        capture_output=True,
-        text=True,
-        encoding='utf-8'  # fixes UnicodeDecodeError 
-    )
-    if result.returncode == 0:
-        return result.stdout.strip()
-    else:
-        print("Error from Ollama:", result.stderr)
+def summarize_with_subprocess(prompt, model_name):
+    """Fallback when the Ollama HTTP API is unreachable: one `ollama run` process per call."""
+    @metrics.timer("llm", model=model_name)
+    def call():
+        result = subprocess.run(
+            ["ollama", "run", "--format", "json", model_name],
+            input=prompt,
+            capture_output=True,
+            text=True,
+            encoding='utf-8'  # fixes UnicodeDecodeError 
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+        else:
+            print("Error from Ollama:", result.stderr)
+            return None
+
+    return cached_call(call, "ollama run", model_name, prompt=prompt, format="json")
+
+def summarize_with_ollama(text, model_name, client=None, on_token=None, use_api=True):
+    """Sends text to the resident Ollama model, constrained to the task hierarchy schema, and returns the summary."""
+    client = client or OllamaClient(model=model_name)
+    prompt = build_prompt(text)
+    if not use_api:
+        return summarize_with_subprocess(prompt, model_name)
+    try:
+        if on_token is None:
+            return client.generate(prompt, format=TASK_TREE_SCHEMA).strip()
+        stream = client.generate_stream(prompt, format=TASK_TREE_SCHEMA)
+        for piece in stream:
+            on_token(piece)
+        return stream.text.strip()
+    except requests.ConnectionError:
+        return summarize_with_subprocess(prompt, model_name)
+    except (requests.RequestException, RuntimeError) as e:
+        # e.g. the model is not pulled: `ollama run` would fail the same way
+        print("Error from Ollama:", e)
         return None
 
-def run_pipeline(docx_path, model_name):
-    text = extract_text_from_docx(docx_path)
-    tasks = prrse_tasks(text)
-    
-    print("Tasks extracted from the document:")
-    for task in tasks:
-        print(task)
+def print_main_task(main_task, sub_tasks):
+    print(f"- {main_task}", flush=True)
+    for sub_task, steps in (sub_tasks.items() if isinstance(sub_tasks, dict) else []):
+        print(f"    - {sub_task}" + (f" ({len(steps)} sub-sub-tasks)" if steps else ""), flush=True)
+
+def run_pipeline(docx_paths, model_name, max_concurrency=MAX_CONCURRENCY):
+    """Summarize a list of documents through one resident model; returns {path: summary}."""
+    if isinstance(docx_paths, str):
+        docx_paths = [docx_paths]
+    client = OllamaClient(model=model_name)
+    use_api = client.available()
+    if use_api:
+        client.preload()  # load the model once for the whole batch
+    else:
+        print("Ollama API not reachable, falling back to `ollama run`.")
+
+    texts = {}
+    for docx_path in docx_paths:
+        text = extract_text_from_docx(docx_path)
+        print(f"Tasks extracted from {docx_path}:")
+        for task in prrse_tasks(text):
+            print(task)
+        texts[docx_path] = clean_text(text)
 
     print("\nGenerating summary using LLaMA...")
-    cleaned_text = clean_text(text)
-    summary = summarize_with_ollama(cleaned_text, model_name)
+    if len(texts) == 1:
+        # A single document streams: each main task is printed as soon as its JSON is complete
+        docx_path, text = next(iter(texts.items()))
+        parser = TaskStreamParser()
 
-    if summary:
-        print("\nSummary:")
-        print(summary)
+        def on_token(piece):
+            for main_task, sub_tasks in parser.feed(piece):
+                print_main_task(main_task, sub_tasks)
+
+        summaries = {docx_path: summarize_with_ollama(text, model_name, client, on_token=on_token, use_api=use_api)}
+    elif use_api:
+        # Concurrent requests share the one loaded model
+        prompts = [build_prompt(text) for text in texts.values()]
+        replies, errors = client.generate_many(prompts, max_concurrency, format=TASK_TREE_SCHEMA)
+        summaries = {}
+        for path, reply, error in zip(texts, replies, errors):
+            if error is not None:
+                print(f"Error from Ollama for {path}:", error)
+            summaries[path] = reply.strip() if reply is not None else None
     else:
-        print("Failed to generate summary.")
+        summaries = {path: summarize_with_subprocess(build_prompt(text), model_name) for path, text in texts.items()}
+
+    for docx_path, summary in summaries.items():
+        if summary:
+            print(f"\nSummary of {docx_path}:")
+            print(summary)
+        else:
+            print(f"Failed to generate summary for {docx_path}.")
+    return summaries
 
 if __name__ == "__main__":
-    run_pipeline(DOCX_PATH, OLLAMA_MODEL_NAME)
+    metrics.flush_at_exit("new")
+    run_pipeline(sys.argv[1:] or [DOCX_PATH], OLLAMA_MODEL_NAME)
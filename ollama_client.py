@@ -0,0 +1,224 @@
+"""
+Client for a local Ollama server.
+
+generate_stream() and chat_stream() read Ollama's NDJSON token stream so callers can render
+tokens as they arrive. Each stream records time-to-first-token and tokens/sec, and can be cancelled from
+another thread (or by closing it), which drops the connection and stops generation.
+Completed replies go into the shared LLM cache and repeated prompts are replayed from it.
+Every request asks the server to keep the model loaded for KEEP_ALIVE, so consecutive
+and concurrent calls (generate_many) share one resident model instead of reloading it.
+Every uncached request is timed as the "llm" stage and its token counts go to metrics.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import http_transport
+import metrics
+from llm_cache import cache_key, cached_call, get_cache
+
+# === Configuration ===
+OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3')
+KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+MAX_CONCURRENCY = int(os.getenv('OLLAMA_MAX_CONCURRENCY', '4'))  # match the server's OLLAMA_NUM_PARALLEL
+
+
+class StreamStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self.tokens = 0
+        self.tokens_per_second = None
+        self.cancelled = False
+        self.cached = False
+
+    def summary(self):
+        if self.cached:
+            return "from cache"
+        if self.first_token_seconds is None:
+            return "no tokens received"
+        text = f"first token {self.first_token_seconds:.2f}s · {self.tokens} tokens"
+        if self.tokens_per_second:
+            text += f" · {self.tokens_per_second:.1f} tok/s"
+        return text + (" · cancelled" if self.cancelled else "")
+
+
+class GenerationStream:
+    """Iterable of text pieces from one streamed Ollama request; see .stats and .text afterwards."""
+
+    def __init__(self, url, payload, field, cache_request=None):
+        self.url = url
+        self.payload = payload
+        self.field = field
+        self.cache_request = cache_request if get_cache().enabled else None
+        self.stats = StreamStats()
+        self.text = ""
+        self.final = {}
+        self._cancel = threading.Event()
+        self._response = None
+
+    def cancel(self):
+        self._cancel.set()
+        self.stats.cancelled = True
+        if self._response is not None:
+            self._response.close()
+
+    def __iter__(self):
+        if self.cache_request is not None:
+            cached = get_cache().get(self._cache_key())
+            if cached is not None:
+                self.stats.cached = True
+                self.text = cached
+                yield cached
+                return
+
+        self._response = http_transport.llm_post(self.url, json=self.payload, stream=True)
+        try:
+            self._response.raise_for_status()
+            for line in self._response.iter_lines():
+                if self._cancel.is_set():
+                    break
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                piece = self._piece(chunk)
+                if piece:
+                    if self.stats.first_token_seconds is None:
+                        self.stats.first_token_seconds = time.perf_counter() - self.stats.started
+                    self.stats.tokens += 1
+                    self.text += piece
+                    yield piece
+                if chunk.get("done"):
+                    self.final = chunk
+                    if self.cache_request is not None:
+                        get_cache().put(self._cache_key(), self.text)
+                    break
+        except Exception:
+            if not self._cancel.is_set():
+                raise
+        finally:
+            self._response.close()
+            self._finish()
+
+    def _cache_key(self):
+        return cache_key(self.url, self.payload["model"], **self.cache_request)
+
+    def _piece(self, chunk):
+        if self.field == "message":
+            return chunk.get("message", {}).get("content", "")
+        return chunk.get(self.field, "")
+
+    def _finish(self):
+        stats = self.stats
+        stats.total_seconds = time.perf_counter() - stats.started
+        metrics.observe("llm", stats.total_seconds, model=self.payload["model"])
+        _record_tokens(self.payload["model"], self.final)
+        # Ollama reports exact counts and generation time in the final chunk
+        if self.final.get("eval_count") and self.final.get("eval_duration"):
+            stats.tokens = self.final["eval_count"]
+            stats.tokens_per_second = stats.tokens / (self.final["eval_duration"] / 1e9)
+        elif stats.tokens > 1:
+            # Rate after the first token, so prompt processing time is not counted
+            stats.tokens_per_second = (stats.tokens - 1) / (stats.total_seconds - stats.first_token_seconds)
+
+
+def _record_tokens(model, body):
+    metrics.record_tokens(model, body.get("prompt_eval_count"), body.get("eval_count"))
+
+
+class OllamaClient:
+    def __init__(self, base_url=OLLAMA_URL, model=OLLAMA_MODEL, keep_alive=KEEP_ALIVE):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+
+    def _payload(self, options, **fields):
+        # keep_alive is not part of the cache key: it does not change the reply
+        return {"model": self.model, "keep_alive": self.keep_alive, **fields, **options}
+
+    def available(self):
+        """True if the server answers; uses a short timeout and no retries."""
+        try:
+            return http_transport.get(f"{self.base_url}/api/tags", timeout=(1, 2), retries=0).ok
+        except Exception:
+            return False
+
+    def preload(self):
+        """Load the model into memory (an empty generate request) so the first real call skips it."""
+        response = http_transport.llm_post(f"{self.base_url}/api/generate", json=self._payload({}))
+        response.raise_for_status()
+
+    def generate(self, prompt, **options):
+        """Blocking /api/generate call; returns the reply text (cached like every other LLM call)."""
+        url = f"{self.base_url}/api/generate"
+
+        def call():
+            with metrics.timer("llm", model=self.model):
+                response = http_transport.llm_post(url, json=self._payload(options, prompt=prompt, stream=False))
+            response.raise_for_status()
+            body = response.json()
+            _record_tokens(self.model, body)
+            if "response" not in body:
+                # Raising keeps an error body out of the cache
+                raise RuntimeError(f"Ollama returned no reply: {body.get('error', body)}")
+            return body["response"]
+
+        return cached_call(call, url, self.model, prompt=prompt, **options)
+
+    def generate_many(self, prompts, max_concurrency=MAX_CONCURRENCY, **options):
+        """
+        generate() for several prompts at once; returns (replies, errors) in prompt order.
+
+        A failed prompt gets None in replies and its exception in errors, so one failure
+        does not abort the others.
+        """
+        def one(prompt):
+            try:
+                return self.generate(prompt, **options), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts)))) as pool:
+            results = list(pool.map(one, prompts))
+        return [reply for reply, _ in results], [error for _, error in results]
+
+    def generate_stream(self, prompt, use_cache=True, **options):
+        """Stream a /api/generate completion; iterate the result for text pieces."""
+        payload = self._payload(options, prompt=prompt, stream=True)
+        # Same key as a non-streamed llm_cache.cached_call(url, model, prompt=prompt)
+        cache_request = {"prompt": prompt, **options} if use_cache else None
+        return GenerationStream(f"{self.base_url}/api/generate", payload, "response", cache_request)
+
+    def chat_stream(self, messages, use_cache=True, **options):
+        """Stream a /api/chat reply to a list of {"role", "content"} messages."""
+        payload = self._payload(options, messages=messages, stream=True)
+        cache_request = {"messages": messages, **options} if use_cache else None
+        return GenerationStream(f"{self.base_url}/api/chat", payload, "message", cache_request)
+
+    def chat(self, messages, **options):
+        """Blocking /api/chat call; returns the reply text (cached like every other LLM call)."""
+        url = f"{self.base_url}/api/chat"
+
+        def call():
+            with metrics.timer("llm", model=self.model):
+                response = http_transport.llm_post(url, json=self._payload(options, messages=messages, stream=False))
+            response.raise_for_status()
+            body = response.json()
+            _record_tokens(self.model, body)
+            if "message" not in body:
+                raise RuntimeError(f"Ollama returned no reply: {body.get('error', body)}")
+            return body["message"].get("content", "")
+
+        return cached_call(call, url, self.model, messages=messages, **options)
+
+    def embed(self, texts):
+        """Embedding vectors for a list of texts from /api/embed (model must be an embedding model)."""
+        response = http_transport.llm_post(f"{self.base_url}/api/embed", json={"model": self.model, "input": texts})
+        response.raise_for_status()
+        return response.json()["embeddings"]
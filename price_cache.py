@@ -0,0 +1,169 @@
+import json
+import os
+import re
+
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr,
+                                    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday,
+                                    sunday_to_monday)
+
+# === Configuration ===
+PRICE_CACHE_DIR = os.getenv('PRICE_CACHE_DIR', '.price_cache')
+
+
+# === Paths ===
+def _safe_symbol(symbol):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in symbol.upper())
+
+
+def _data_path(symbol, cache_dir):
+    return os.path.join(cache_dir, f"{_safe_symbol(symbol)}.parquet")
+
+
+def _meta_path(symbol, cache_dir):
+    return os.path.join(cache_dir, f"{_safe_symbol(symbol)}.json")
+
+
+# === Cache Read / Write ===
+def read_cached(symbol, cache_dir=PRICE_CACHE_DIR):
+    """Return (frame, covered_ranges) for a symbol, or (None, []) if nothing is cached."""
+    data_path = _data_path(symbol, cache_dir)
+    meta_path = _meta_path(symbol, cache_dir)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None, []
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    covered = [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in meta.get("covered", [])]
+    return pd.read_parquet(data_path), covered
+
+
+def write_cached(symbol, frame, covered, cache_dir=PRICE_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path = _data_path(symbol, cache_dir)
+    meta_path = _meta_path(symbol, cache_dir)
+
+    # Write to temp files first so an interrupted run never leaves a half-written cache
+    frame.to_parquet(data_path + ".tmp")
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"covered": [[s.isoformat(), e.isoformat()] for s, e in covered]}, f)
+    os.replace(data_path + ".tmp", data_path)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+# === Range Bookkeeping ===
+def _merge_ranges(ranges):
+    """Merge overlapping or touching [start, end) ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(start, end, covered):
+    """Return the parts of [start, end) that are not in the covered ranges."""
+    gaps = []
+    cursor = start
+    for c_start, c_end in _merge_ranges(covered):
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _normalize(frame):
+    # yfinance returns (field, ticker) MultiIndex columns for single tickers; keep only the field
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.copy()
+        frame.columns = frame.columns.get_level_values(0)
+    frame.index = pd.to_datetime(frame.index).tz_localize(None)
+    frame.index.name = "Date"
+    return frame
+
+
+# === Trading Calendar ===
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Regular full-day NYSE holidays (one-off closures are not included)."""
+
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("Independence Day", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas Day", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+def _nyse_listed(symbol):
+    # Plain tickers only: suffixed (VOD.L), crypto/FX (BTC-USD, EURUSD=X) and index (^N225) symbols
+    # trade on other calendars, so for them only weekends are known to have no bars
+    return re.fullmatch(r"[A-Za-z]{1,5}", symbol) is not None
+
+
+def _trading_days_in(symbol, start, end):
+    """True if [start, end) has a day that could have a bar: a weekday that, for US tickers, is no NYSE holiday."""
+    last = end - pd.Timedelta(days=1)
+    holidays = NYSEHolidayCalendar().holidays(start, last) if _nyse_listed(symbol) else []
+    return len(pd.bdate_range(start, last, freq="C", holidays=holidays)) > 0
+
+
+# === Public API ===
+def load_prices(symbol, start, end, cache_dir=PRICE_CACHE_DIR, offline=False):
+    """
+    Return daily prices for symbol in [start, end), reading the on-disk cache first.
+
+    Only the date ranges not already covered by the cache are downloaded and then
+    appended to the symbol's Parquet file. A range is only marked covered if its download
+    returned rows or it has no trading days (weekends, and NYSE holidays for US tickers);
+    yfinance returns an empty frame on failure, so anything else is tried again next time.
+    With offline=True nothing is downloaded.
+    """
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    cached, covered = read_cached(symbol, cache_dir)
+
+    # Never mark today or the future as covered: those bars can still change
+    today = pd.Timestamp.today().normalize()
+    gaps = [(s, min(e, today)) for s, e in missing_ranges(start, end, covered) if s < today]
+    gaps = [(s, e) for s, e in gaps if s < e]
+    fetch_open_end = end > today
+
+    if not offline and (gaps or fetch_open_end):
+        import yfinance as yf
+
+        frames = [] if cached is None else [cached]
+        filled = []
+        if fetch_open_end:
+            gaps.append((max(start, today), end))
+        for gap_start, gap_end in gaps:
+            fetched = yf.download(symbol, start=gap_start, end=gap_end, progress=False)
+            if fetched is not None and not fetched.empty:
+                frames.append(_normalize(fetched))
+                filled.append((gap_start, gap_end))
+            elif not _trading_days_in(symbol, gap_start, gap_end):
+                filled.append((gap_start, gap_end))  # a weekend or holiday has no bars to miss
+
+        if frames:
+            merged = pd.concat(frames)
+            cached = merged[~merged.index.duplicated(keep="last")].sort_index()
+        covered = _merge_ranges(covered + [(s, e) for s, e in filled if e <= today])
+        if cached is not None:
+            write_cached(symbol, cached, covered, cache_dir)
+
+    if cached is None:
+        return pd.DataFrame()
+    return cached.loc[(cached.index >= start) & (cached.index < end)]
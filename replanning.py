@@ -0,0 +1,259 @@
+"""
+Revision-aware planning: re-analyze and re-sync only what changed in a document.
+
+A document is cut into chunks at content-defined boundaries, so an edit only changes
+the chunks around it. Each chunk's task map is stored under the chunk's hash, and a
+revision sends only the chunks with unseen hashes to the LLM. The merged plan is then
+diffed against the plan that was last pushed to Jira and GitHub, so only added,
+changed and removed tasks are synced. State is kept per document name in
+PLAN_STATE_DIR/<slug>.json.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+
+from github_branches import branch_names
+from task_analysis import (CHUNK_TOKENS, MAX_CONCURRENCY, _split_oversized, analyze_chunks, estimate_tokens,
+                           merge_task_maps, normalize_task)
+
+# === Configuration ===
+PLAN_STATE_DIR = os.getenv('PLAN_STATE_DIR', '.plan_state')
+ANCHOR_EVERY = 8  # on average, one paragraph in this many may end a chunk once it is half full
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# === Chunking ===
+def stable_chunks(sections, max_tokens=CHUNK_TOKENS):
+    """
+    Pack document paragraphs into chunks of at most about max_tokens whose boundaries depend
+    on nearby content only.
+
+    Besides the size limit, a chunk that is at least half full also ends after any paragraph
+    whose hash hits 1 in ANCHOR_EVERY. After an edit, chunking falls back into step at the
+    next such anchor, so the rest of the document keeps the same chunks and hashes.
+    """
+    chunk, size = [], 0
+    for section in sections:
+        for paragraph in re.split(r"\n\s*\n", section):
+            if not paragraph.strip():
+                continue
+            tokens = estimate_tokens(paragraph)
+            pieces = _split_oversized(paragraph, max_tokens) if tokens > max_tokens else [paragraph]
+            for piece in pieces:
+                tokens = estimate_tokens(piece)
+                if chunk and size + tokens > max_tokens:
+                    yield "\n\n".join(chunk)
+                    chunk, size = [], 0
+                chunk.append(piece)
+                size += tokens
+                if size >= max_tokens // 2 and int(_hash(piece)[:8], 16) % ANCHOR_EVERY == 0:
+                    yield "\n\n".join(chunk)
+                    chunk, size = [], 0
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+# === Diffing ===
+def diff_task_maps(old, new, allow_removals=True):
+    """
+    Compare two {main task: [sub-tasks]} plans by normalized task name.
+
+    Returns {"added": {main: [subs]}, "removed": {main: [subs]}, "changed": {main:
+    {"added": [subs], "removed": [subs]}}}; "changed" lists main tasks present in both
+    whose sub-tasks differ. Names are taken from old for removals and from new otherwise.
+    """
+    old_mains = {normalize_task(main): main for main in old}
+    new_mains = {normalize_task(main): main for main in new}
+    diff = {"added": {}, "removed": {}, "changed": {}}
+
+    for key, main in new_mains.items():
+        if key not in old_mains:
+            diff["added"][main] = list(new[main])
+            continue
+        old_subs = {normalize_task(sub): sub for sub in old[old_mains[key]]}
+        new_subs = {normalize_task(sub): sub for sub in new[main]}
+        added = [sub for k, sub in new_subs.items() if k not in old_subs]
+        removed = [sub for k, sub in old_subs.items() if k not in new_subs] if allow_removals else []
+        if added or removed:
+            diff["changed"][main] = {"added": added, "removed": removed}
+
+    if allow_removals:
+        for key, main in old_mains.items():
+            if key not in new_mains:
+                diff["removed"][main] = list(old[main])
+    return diff
+
+
+def diff_size(diff):
+    """Number of tasks (main and sub) the diff touches."""
+    return (sum(1 + len(subs) for subs in diff["added"].values())
+            + sum(1 + len(subs) for subs in diff["removed"].values())
+            + sum(len(c["added"]) + len(c["removed"]) for c in diff["changed"].values()))
+
+
+# === State ===
+class PlanState:
+    """
+    What was last analyzed and last synced for one document.
+
+    chunks maps chunk hash -> that chunk's task map. synced holds the pushed task_map,
+    the Jira keys ({main: [key, {sub: key}]}) and the branch of every task ({task: branch}).
+    """
+
+    def __init__(self, document_name, root=PLAN_STATE_DIR):
+        slug = re.sub(r"[^\w.-]+", "_", document_name).strip("_") or "document"
+        self.path = os.path.join(root, slug + ".json")
+        self.document_name = document_name
+        self.chunks = {}
+        self.synced = {"task_map": {}, "jira": {}, "branches": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.chunks = data.get("chunks", {})
+            self.synced.update(data.get("synced", {}))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"document": self.document_name, "updated": time.time(), "chunks": self.chunks,
+                       "synced": self.synced}, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+    def analyze(self, sections, analyze_chunk, max_tokens=CHUNK_TOKENS, max_concurrency=MAX_CONCURRENCY):
+        """
+        Build the task map for a document revision, calling the LLM only for new chunks.
+
+        Returns (task_map, failures, stats): failures as in task_analysis.analyze_chunks
+        (indices into the new chunks only), stats {"chunks", "reused", "analyzed"}.
+        """
+        chunks = list(stable_chunks(sections, max_tokens))
+        hashes = [_hash(chunk) for chunk in chunks]
+        new = [i for i, h in enumerate(hashes) if h not in self.chunks]
+
+        task_maps, failures = analyze_chunks([chunks[i] for i in new], analyze_chunk, max_concurrency)
+        for i, task_map in zip(new, task_maps):
+            if task_map is not None:
+                self.chunks[hashes[i]] = task_map
+        task_map = merge_task_maps(self.chunks[h] for h in hashes if h in self.chunks)
+
+        # Forget chunks that are no longer in the document
+        self.chunks = {h: self.chunks[h] for h in hashes if h in self.chunks}
+        self.save()
+        return task_map, failures, {"chunks": len(chunks), "reused": len(chunks) - len(new), "analyzed": len(new)}
+
+    def diff(self, task_map, allow_removals=True):
+        """Diff task_map against the last synced plan."""
+        return diff_task_maps(self.synced["task_map"], task_map, allow_removals)
+
+    def record_sync(self, task_map, jira=None, branches=None):
+        """Store the plan that is now in Jira/GitHub, with updated issue keys and branch names."""
+        self.synced["task_map"] = task_map
+        if jira is not None:
+            self.synced["jira"] = jira
+        if branches is not None:
+            self.synced["branches"] = branches
+        self.save()
+
+    def record_created(self, created, branch_results):
+        """Record a full create (JiraWriter.create_plan + BranchProvisioner.provision results) as synced."""
+        jira = {main: [key, {sub: sub_key for sub, sub_key in subs.items() if sub_key}]
+                for main, (key, subs) in created.items() if key}
+        branches = {task: branch for task, (branch, status) in branch_results.items()
+                    if status in ("created", "exists")}
+        self.record_sync({main: list(subs) for main, (_, subs) in jira.items()}, jira, branches)
+
+
+# === Syncing ===
+def sync_plan(state, task_map, diff, writer, provisioner, parent_type="Epic", child_type="Task",
+              parent_description="Created from task plan"):
+    """
+    Push a diff to Jira (JiraWriter) and GitHub (BranchProvisioner), then record the result.
+
+    Added tasks get issues and branches. Removed tasks get their issues labelled
+    jira_writer.RETIRED_LABEL and their branches deleted if nobody committed to them.
+    Anything that failed stays out of the recorded state, so the next sync retries it.
+    Returns {"created", "retired", "errors", "branches", "removed_branches"}.
+    """
+    jira = {main: [key, dict(subs)] for main, (key, subs) in state.synced["jira"].items()}
+    stored = {normalize_task(main): main for main in jira}
+    report = {"created": 0, "retired": 0, "errors": [], "branches": {}, "removed_branches": {}}
+
+    # New main tasks with all their sub-tasks
+    created, errors = writer.create_plan(diff["added"], parent_type, child_type, parent_description)
+    for main, (key, subs) in created.items():
+        if key:
+            jira[main] = [key, {sub: sub_key for sub, sub_key in subs.items() if sub_key}]
+            report["created"] += 1 + len(jira[main][1])
+    report["errors"] += errors
+
+    # New sub-tasks under existing main tasks
+    children = []
+    for main, change in diff["changed"].items():
+        entry = jira.get(stored.get(normalize_task(main), main))
+        for sub in change["added"]:
+            if entry and entry[0]:
+                children.append((entry, sub))
+            else:
+                report["errors"].append((sub, f"Parent '{main}' has no Jira issue"))
+    keys, errors = writer.create_children([(entry[0], sub) for entry, sub in children], child_type)
+    for (entry, sub), key, error in zip(children, keys, errors):
+        if key:
+            entry[1][sub] = key
+            report["created"] += 1
+        else:
+            report["errors"].append((sub, error))
+
+    # Removed tasks are labelled, not deleted
+    retire = []
+    for main in diff["removed"]:
+        entry = jira.get(stored.get(normalize_task(main), main))
+        if entry:
+            retire += [(entry, None, entry[0])] if entry[0] else []
+            retire += [(entry, sub, key) for sub, key in entry[1].items()]
+    for main, change in diff["changed"].items():
+        entry = jira.get(stored.get(normalize_task(main), main))
+        gone = {normalize_task(sub) for sub in change["removed"]}
+        if entry:
+            retire += [(entry, sub, key) for sub, key in entry[1].items() if normalize_task(sub) in gone]
+    failed = dict(writer.label_issues([key for _, _, key in retire]))
+    for entry, sub, key in retire:
+        if key in failed:
+            report["errors"].append((key, failed[key]))
+            continue
+        report["retired"] += 1
+        if sub is None:
+            entry[0] = None  # whole main task retired; dropped below
+        else:
+            entry[1].pop(sub, None)
+    jira = {main: entry for main, entry in jira.items() if entry[0] or entry[1]}
+    # Saved before any GitHub call, so a failure there cannot make the next sync create these issues again
+    state.record_sync({main: list(subs) for main, (_, subs) in jira.items()}, jira)
+
+    # Branches: new tasks, plus any earlier task whose branch is still missing
+    branches = dict(state.synced["branches"])
+    tasks = [task for main, subs in task_map.items() for task in [main, *subs]]
+    to_create = [task for task in tasks if task not in branches]
+    if to_create:
+        names = branch_names(to_create, taken={branch: task for task, branch in branches.items()})
+        report["branches"] = provisioner.provision(to_create, names=names)
+        for task, (branch, status) in report["branches"].items():
+            if status in ("created", "exists"):
+                branches[task] = branch
+
+    # Branches of tasks that are neither planned nor still in Jira, including any a failed sync left behind
+    keep = {normalize_task(task) for task in tasks}
+    keep |= {normalize_task(task) for main, (_, subs) in jira.items() for task in [main, *subs]}
+    removed = {task: branch for task, branch in branches.items() if normalize_task(task) not in keep}
+    if removed:
+        report["removed_branches"] = provisioner.remove(sorted(set(removed.values())))
+        for task, branch in removed.items():
+            if not report["removed_branches"][branch].startswith("failed"):
+                del branches[task]
+
+    state.record_sync({main: list(subs) for main, (_, subs) in jira.items()}, jira, branches)
+    return report
@@ -0,0 +1,231 @@
+"""
+Passage retrieval for question answering over large documents.
+
+A document is extracted once (document_extraction.iter_sections), packed into short
+passages and indexed with BM25 as a sparse passage x term matrix. Optional embedding
+vectors from an Ollama embedding model are stored next to it in a memory-mapped array.
+Indexes live in <root>/<sha256 of the file>/, so re-uploading the same file only loads
+it. Passages stay on disk and only the top-k are read back per question.
+"""
+import json
+import os
+import re
+import shutil
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from document_extraction import _read_source, file_hash, iter_sections
+from task_analysis import chunk_sections
+
+# === Configuration ===
+RETRIEVAL_INDEX_DIR = os.getenv('RETRIEVAL_INDEX_DIR', '.retrieval_index')
+PASSAGE_TOKENS = 256
+TOP_K = 5
+BM25_K1 = 1.5
+BM25_B = 0.75
+EMBED_BATCH = 64
+RRF_K = 60  # reciprocal rank fusion constant
+
+_TOKEN_RE = re.compile(r"\w\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+# === Index ===
+class RetrievalIndex:
+    """
+    A built index directory: passages.txt + offsets.npy, bm25.npz, vocab.json, meta.json,
+    and embeddings-<model>.f32 per embedding model added.
+    """
+
+    def __init__(self, path):
+        from scipy import sparse  # deferred: only needed once a document is indexed
+
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.weights = sparse.load_npz(os.path.join(path, "bm25.npz")).tocsc()
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self.meta["passages"]
+
+    def passage(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        with open(os.path.join(self.path, "passages.txt"), "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode("utf-8")
+
+    # === Embeddings ===
+    def _embedding_path(self, model):
+        safe_model = re.sub(r"[^\w.-]", "_", model)
+        return os.path.join(self.path, f"embeddings-{safe_model}.f32")
+
+    def embeddings(self, model):
+        """Memory-mapped (passages, dims) unit vectors for model, or None if not built."""
+        dims = self.meta.get("embeddings", {}).get(model)
+        if dims is None:
+            return None
+        return np.memmap(self._embedding_path(model), dtype=np.float32, mode="r", shape=(len(self), dims))
+
+    def add_embeddings(self, client, progress=None):
+        """Embed every passage with an OllamaClient embedding model (once per model)."""
+        if self.embeddings(client.model) is not None:
+            return
+        path = self._embedding_path(client.model)
+        vectors = None
+        for first in range(0, len(self), EMBED_BATCH):
+            last = min(first + EMBED_BATCH, len(self))
+            batch = np.asarray(client.embed([self.passage(i) for i in range(first, last)]), dtype=np.float32)
+            if vectors is None:
+                vectors = np.memmap(path + ".tmp", dtype=np.float32, mode="w+", shape=(len(self), batch.shape[1]))
+            vectors[first:last] = batch / np.maximum(np.linalg.norm(batch, axis=1, keepdims=True), 1e-12)
+            if progress:
+                progress(last / len(self))
+        if vectors is None:
+            return
+        vectors.flush()
+        dims = vectors.shape[1]
+        del vectors
+        os.replace(path + ".tmp", path)
+        self.meta.setdefault("embeddings", {})[client.model] = dims
+        _write_json(os.path.join(self.path, "meta.json"), self.meta)
+
+    # === Search ===
+    def _bm25_scores(self, query):
+        ids = sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab})
+        if not ids:
+            return None
+        # Only the posting columns of the query terms are touched
+        return np.asarray(self.weights[:, ids].sum(axis=1)).ravel()
+
+    def _embedding_scores(self, query, client, vectors):
+        q = np.asarray(client.embed([query])[0], dtype=np.float32)
+        q /= max(np.linalg.norm(q), 1e-12)
+        scores = np.empty(len(self), dtype=np.float32)
+        block = 65536  # bounded memory for very large indexes
+        for first in range(0, len(self), block):
+            scores[first:first + block] = vectors[first:first + block] @ q
+        return scores
+
+    def search(self, query, k=TOP_K, embed_client=None):
+        """
+        Return [(score, passage_index, text)] for the k best passages.
+
+        With an embed_client whose model has embeddings, BM25 and embedding rankings are
+        merged by reciprocal rank fusion; otherwise BM25 alone is used.
+        """
+        rankings = []
+        bm25 = self._bm25_scores(query)
+        if bm25 is not None:
+            rankings.append(bm25)
+        vectors = self.embeddings(embed_client.model) if embed_client is not None else None
+        if vectors is not None:
+            rankings.append(self._embedding_scores(query, embed_client, vectors))
+
+        if not rankings:
+            return []
+        if bm25 is not None and vectors is None:
+            scores = bm25
+            candidates = _top(scores, k)
+            candidates = candidates[scores[candidates] > 0]  # drop passages sharing no query term
+        elif bm25 is None:
+            scores = rankings[0]
+            candidates = _top(scores, k)
+        else:
+            fused = {}
+            for scores in rankings:
+                for rank, i in enumerate(_top(scores, k * 4)):
+                    fused[i] = fused.get(i, 0.0) + 1.0 / (RRF_K + rank + 1)
+            scores = np.zeros(len(self))
+            scores[list(fused)] = list(fused.values())
+            candidates = _top(scores, k)
+        return [(float(scores[i]), int(i), self.passage(i)) for i in candidates]
+
+
+def _top(scores, k):
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.array([], dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _write_json(path, data):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+# === Building ===
+def build_index(source, path, passage_tokens=PASSAGE_TOKENS):
+    """Extract, chunk and BM25-index source into the directory path (written atomically)."""
+    from scipy import sparse
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    vocab = {}
+    rows, cols, counts = array("i"), array("i"), array("f")
+    lengths, offsets = array("i"), array("q", [0])
+    with open(os.path.join(tmp, "passages.txt"), "wb") as f:
+        for i, passage in enumerate(chunk_sections(iter_sections(source), passage_tokens)):
+            data = passage.encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+            terms = Counter(tokenize(passage))
+            lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                rows.append(i)
+                cols.append(vocab.setdefault(term, len(vocab)))
+                counts.append(count)
+
+    n_passages, n_terms = len(lengths), len(vocab)
+    rows, cols = np.frombuffer(rows, dtype=np.int32), np.frombuffer(cols, dtype=np.int32)
+    tf, dl = np.frombuffer(counts, dtype=np.float32), np.frombuffer(lengths, dtype=np.int32)
+    avgdl = float(dl.mean()) if n_passages else 0.0
+
+    # BM25 term weights are precomputed, so a query is a sum over its terms' columns
+    df = np.bincount(cols, minlength=n_terms)
+    idf = np.log1p((n_passages - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * dl[rows] / max(avgdl, 1.0))
+    weights = idf[cols] * tf * (BM25_K1 + 1) / (tf + norm)
+    matrix = sparse.csc_matrix((weights, (rows, cols)), shape=(n_passages, n_terms), dtype=np.float32)
+
+    sparse.save_npz(os.path.join(tmp, "bm25.npz"), matrix)
+    np.save(os.path.join(tmp, "offsets.npy"), np.frombuffer(offsets, dtype=np.int64))
+    _write_json(os.path.join(tmp, "vocab.json"), vocab)
+    _write_json(os.path.join(tmp, "meta.json"), {
+        "source": getattr(source, "name", os.fspath(source) if isinstance(source, (str, os.PathLike)) else ""),
+        "passages": n_passages,
+        "terms": n_terms,
+        "avgdl": avgdl,
+        "passage_tokens": passage_tokens,
+        "created": time.time(),
+        "embeddings": {},
+    })
+    if os.path.isdir(path):
+        # Built concurrently by someone else; theirs is identical
+        shutil.rmtree(tmp)
+    else:
+        os.replace(tmp, path)
+    return RetrievalIndex(path)
+
+
+def get_index(source, root=RETRIEVAL_INDEX_DIR, passage_tokens=PASSAGE_TOKENS):
+    """Load the index for source's content hash, building it on first use."""
+    _, file_path, data = _read_source(source)
+    path = os.path.join(root, f"{file_hash(file_path, data)}-{passage_tokens}")
+    if os.path.exists(os.path.join(path, "meta.json")):
+        return RetrievalIndex(path)
+    os.makedirs(root, exist_ok=True)
+    return build_index(source, path, passage_tokens)
@@ -0,0 +1,93 @@
+"""
+Import-time report for the Streamlit entry points.
+
+Streamlit re-runs a page script on every interaction, but its top-level imports are paid
+in full on the first page load. This runs each script's top-level imports in a fresh
+interpreter under `python -X importtime` and reports the total and the slowest packages.
+It exits with status 1 when a script goes over the budget, so it can gate changes
+that would slow down time to first paint.
+
+Usage:
+    python startup_report.py
+    python startup_report.py app.py chat.py --budget 2.0 --top 5 --output startup_report.json
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+# === Configuration ===
+ENTRY_POINTS = ("app.py", "automation.py", "automationgroq.py", "chat.py", "documentchat.py")
+BUDGET_SECONDS = 1.5
+TOP_MODULES = 8
+
+_MARKER = "--- startup_report ---"
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\S.*)$")
+
+
+def top_level_imports(script):
+    """Source of the import statements at module level of script (not those inside functions)."""
+    with open(script, "r", encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source, filename=script)
+    return [ast.get_source_segment(source, node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure(script, python=sys.executable):
+    """Import script's top-level imports in a new interpreter; returns the timing report for it."""
+    imports = top_level_imports(script)
+    code = f"import sys; sys.stderr.write({_MARKER!r} + '\\n')\n" + "\n".join(imports)
+    result = subprocess.run([python, "-X", "importtime", "-c", code], cwd=os.path.dirname(os.path.abspath(script)),
+                            capture_output=True, text=True)
+    lines = result.stderr.splitlines()
+    lines = lines[lines.index(_MARKER) + 1:] if _MARKER in lines else lines
+
+    modules = []
+    for line in lines:
+        match = _LINE_RE.match(line)
+        if match and not match.group(3).startswith(" "):  # nested imports are indented
+            modules.append((match.group(3), int(match.group(2)) / 1e6))
+    report = {
+        "script": script,
+        "imports": imports,
+        "seconds": round(sum(seconds for _, seconds in modules), 3),
+        "modules": [{"module": name, "seconds": round(seconds, 3)}
+                    for name, seconds in sorted(modules, key=lambda m: m[1], reverse=True)],
+    }
+    if result.returncode != 0:
+        report["error"] = (result.stderr.strip().splitlines() or ["unknown error"])[-1]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report top-level import time of the Streamlit entry points.")
+    parser.add_argument("scripts", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="Max import seconds per script")
+    parser.add_argument("--top", type=int, default=TOP_MODULES, help="Slowest packages to list per script")
+    parser.add_argument("--output", help="Also write the full report as JSON")
+    args = parser.parse_args()
+
+    reports, over = [], []
+    for script in args.scripts:
+        report = measure(script)
+        reports.append(report)
+        flag = "✅" if report["seconds"] <= args.budget and "error" not in report else "❌"
+        print(f"{flag} {script}: {report['seconds']:.2f}s of imports (budget {args.budget:.2f}s)")
+        if "error" in report:
+            print(f"   import failed: {report['error']}")
+        for module in report["modules"][:args.top]:
+            print(f"   {module['seconds']:7.3f}s  {module['module']}")
+        if flag == "❌":
+            over.append(script)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"budget_seconds": args.budget, "scripts": reports}, f, indent=2)
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
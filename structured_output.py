@@ -0,0 +1,118 @@
+"""
+Schema-constrained task plans and an incremental parser for streamed plans.
+
+TASK_MAP_SCHEMA ({main task: [sub-tasks]}) and TASK_TREE_SCHEMA ({main task: {sub-task:
+[sub-sub-tasks]}}) are passed to Ollama as `format`. Ollama compiles them into a grammar,
+so the model can only emit JSON of that shape. Groq's default models only take the
+schema-less JSON mode (groq_response_format()), so there the schema stays in the prompt.
+
+TaskStreamParser reads a reply as it streams in and hands back each main task as soon as
+its value is closed. A reply cut off by the token limit still yields every main task
+that was finished before the cut.
+"""
+import json
+
+TASK_MAP_SCHEMA = {
+    "type": "object",
+    "additionalProperties": {"type": "array", "items": {"type": "string"}},
+}
+
+TASK_TREE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": {
+        "type": "object",
+        "additionalProperties": {"type": "array", "items": {"type": "string"}},
+    },
+}
+
+
+def groq_response_format():
+    """OpenAI-style response_format for Groq's JSON mode (valid JSON object, schema not enforced)."""
+    return {"type": "json_object"}
+
+
+class TaskStreamParser:
+    """
+    Incremental parser for a streamed top-level JSON object.
+
+    feed() returns the (key, value) members completed by the new text, in order. Text
+    before the opening brace (prose, code fences) and after the closing one is ignored.
+    task_map holds every member so far; complete is set once the object is closed.
+    """
+
+    def __init__(self):
+        self.task_map = {}
+        self.complete = False
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member = None  # buffer index where the current top-level member starts
+        self._member_done = False
+
+    def feed(self, text):
+        members = []
+        for char in text:
+            if self.complete:
+                break
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._start_member()
+                continue
+            self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    # A nested value just closed: its member is complete
+                    members += self._end_member(len(self._buffer))
+                elif self._depth == 0:
+                    members += self._end_member(len(self._buffer) - 1)
+                    self.complete = True
+            elif char == "," and self._depth == 1:
+                members += self._end_member(len(self._buffer) - 1)
+                self._start_member()
+        return members
+
+    def _start_member(self):
+        self._member = len(self._buffer)
+        self._member_done = False
+
+    def _end_member(self, end):
+        if self._member_done:
+            return []
+        self._member_done = True
+        text = "".join(self._buffer[self._member:end]).strip()
+        if not text:
+            return []
+        try:
+            (key, value), = json.loads("{" + text + "}").items()
+        except ValueError:
+            return []  # malformed member: skip it, keep parsing the rest
+        self.task_map[key] = value
+        return [(key, value)]
+
+
+def parse_stream(pieces, on_task=None):
+    """
+    Feed text pieces through a TaskStreamParser, calling on_task(key, value) per completed
+    main task; returns the parser (see .task_map and .complete).
+    """
+    parser = TaskStreamParser()
+    for piece in pieces:
+        for key, value in parser.feed(piece):
+            if on_task is not None:
+                on_task(key, value)
+    return parser
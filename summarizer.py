@@ -0,0 +1,254 @@
+"""
+Hierarchical document summarization on a local llama.cpp model.
+
+Chunks are sized with the model's own tokenizer to fill the context window minus the
+output budget. Extraction runs in a background thread and feeds a bounded queue while
+the model summarizes earlier chunks. Chunk summaries are then merged in token-budgeted
+groups, level by level, until one summary is left. Each chunk summary is checkpointed
+to disk as it is produced, so an interrupted run resumes where it stopped.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+import metrics
+from document_extraction import _read_source, file_hash, iter_sections
+from llm_cache import cached_call
+
+# === Configuration ===
+MODEL_PATH = os.getenv('LLAMA_MODEL_PATH', './llama-3.1.gguf')
+N_CTX = 4096
+MAX_TOKENS = 512  # output budget per call
+TEMPERATURE = 0.7
+SAFETY_TOKENS = 32  # headroom for BOS/chat tokens and tokenizer boundary effects
+QUEUE_SECTIONS = 16
+SUMMARY_CHECKPOINT_DIR = os.getenv('SUMMARY_CHECKPOINT_DIR', '.summary_checkpoints')
+
+CHUNK_PROMPT = "Summarize the following content:\n\n{content}\n\nSummary:"
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one document. Combine them into a single "
+    "coherent summary, keeping the key facts, figures and conclusions:\n\n{content}\n\nSummary:"
+)
+
+_DONE = object()
+
+
+class Summarizer:
+    def __init__(self, model_path=MODEL_PATH, n_ctx=N_CTX, max_tokens=MAX_TOKENS, n_threads=None,
+                 checkpoint_dir=SUMMARY_CHECKPOINT_DIR, extract_workers=None):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.n_threads = n_threads
+        self.checkpoint_dir = checkpoint_dir
+        self.extract_workers = extract_workers  # processes for large PDFs (None: one per core, 1: none)
+        self._llm = None
+        self.tokens_out = 0  # tokens generated by the current summarize() call
+
+    @property
+    def llm(self):
+        """The llama_cpp.Llama instance, loaded on first use."""
+        if self._llm is None:
+            from llama_cpp import Llama
+
+            self._llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads, verbose=False)
+        return self._llm
+
+    # === Tokens ===
+    def tokenize(self, text):
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=False)
+
+    def count_tokens(self, text):
+        return len(self.tokenize(text))
+
+    def _budget(self, template):
+        """Tokens left for {content} in template once the output budget is reserved."""
+        return self.n_ctx - self.max_tokens - self.count_tokens(template.format(content="")) - SAFETY_TOKENS
+
+    def iter_chunks(self, sections):
+        """Pack sections into (text, tokens) chunks that fill the chunk prompt's budget."""
+        budget = self._budget(CHUNK_PROMPT)
+        chunk, size = [], 0
+        for section in sections:
+            tokens = self.tokenize(section)
+            if len(tokens) > budget:
+                # Cut oversized sections on token boundaries
+                pieces = [self.llm.detokenize(tokens[i:i + budget]).decode("utf-8", errors="ignore")
+                          for i in range(0, len(tokens), budget)]
+                pieces = [(piece, self.count_tokens(piece)) for piece in pieces]
+            else:
+                pieces = [(section, len(tokens))]
+            for piece, n in pieces:
+                if chunk and size + n + 1 > budget:
+                    yield "\n".join(chunk), size
+                    chunk, size = [], 0
+                chunk.append(piece)
+                size += n + 1  # +1 for the joining newline
+        if chunk:
+            yield "\n".join(chunk), size
+
+    # === Generation ===
+    def _complete(self, prompt):
+        model = os.path.basename(self.model_path)
+        with metrics.timer("llm", model=model):
+            result = self.llm(prompt=prompt, max_tokens=self.max_tokens, temperature=TEMPERATURE)
+        usage = result.get("usage", {})
+        metrics.record_tokens(model, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return result["choices"][0]["text"]
+
+    def _generate(self, template, content):
+        prompt = template.format(content=content)
+        text = cached_call(
+            lambda: self._complete(prompt), "llama_cpp", os.path.basename(self.model_path), prompt=prompt,
+            temperature=TEMPERATURE, max_tokens=self.max_tokens,
+        ).strip()
+        self.tokens_out += self.count_tokens(text)
+        return text
+
+    def _truncate(self, text, limit):
+        """text cut to at most limit tokens, and its token count."""
+        tokens = self.tokenize(text)
+        if len(tokens) <= limit:
+            return text, len(tokens)
+        text = self.llm.detokenize(tokens[:limit]).decode("utf-8", errors="ignore")
+        return text, self.count_tokens(text)
+
+    def reduce(self, summaries):
+        """
+        Merge summaries in groups that fit the context, level by level, into one.
+
+        Each summary is cut to half the budget, so any two always fit together and
+        every level shrinks the list, even when the output budget is large.
+        """
+        budget = self._budget(REDUCE_PROMPT)
+        limit = budget // 2 - 2  # 2 tokens for the joining blank line
+        if limit < 1:
+            raise ValueError(f"n_ctx={self.n_ctx} leaves no room to merge summaries with max_tokens={self.max_tokens}")
+        while len(summaries) > 1:
+            groups, group, size = [], [], 0
+            for summary in summaries:
+                summary, n = self._truncate(summary, limit)
+                n += 2
+                if group and size + n > budget:
+                    groups.append(group)
+                    group, size = [], 0
+                group.append(summary)
+                size += n
+            groups.append(group)
+            summaries = [self._generate(REDUCE_PROMPT, "\n\n".join(g)) if len(g) > 1 else g[0] for g in groups]
+        return summaries[0] if summaries else ""
+
+    # === Pipeline ===
+    @staticmethod
+    def _produce(source, sections, stop, extract_workers=None):
+        """Extraction thread: push sections into the queue until done, failed or stopped."""
+        try:
+            for section in iter_sections(source, max_workers=extract_workers):
+                while not stop.is_set():
+                    try:
+                        sections.put(section, timeout=0.5)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+            sections.put(_DONE)
+        except BaseException as e:
+            sections.put(e)
+
+    @staticmethod
+    def _consume(sections):
+        while True:
+            item = sections.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def _checkpoint_path(self, digest):
+        settings = f"{os.path.basename(self.model_path)}:{self.n_ctx}:{self.max_tokens}"
+        tag = hashlib.sha256(settings.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.checkpoint_dir, f"{digest}-{tag}.jsonl")
+
+    @staticmethod
+    def _read_checkpoint(path):
+        done = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        done.append(json.loads(line))
+                    except ValueError:
+                        break  # torn last line from an interrupted write
+        return done
+
+    @staticmethod
+    def _write_checkpoint(path, entries):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(path + ".tmp", path)
+
+    def summarize(self, source, on_chunk=None):
+        """
+        Summarize a document path or upload.
+
+        Returns a dict with the final summary, the per-chunk summaries, token counts and timing.
+        on_chunk(index, summary, resumed) is called as each chunk summary becomes available.
+        """
+        started = time.perf_counter()
+        _, path, data = _read_source(source)
+        digest = file_hash(path, data)
+        checkpoint = self._checkpoint_path(digest)
+        done = self._read_checkpoint(checkpoint)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        sections = queue.Queue(maxsize=QUEUE_SECTIONS)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(source, sections, stop, self.extract_workers),
+                                    daemon=True)
+        producer.start()
+
+        summaries, tokens_in = [], 0
+        self.tokens_out = 0
+        log = None
+        try:
+            for i, (chunk, n) in enumerate(self.iter_chunks(self._consume(sections))):
+                chunk_hash = hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+                tokens_in += n
+                resumed = i < len(done) and done[i]["hash"] == chunk_hash
+                if resumed:
+                    summary = done[i]["summary"]
+                else:
+                    if log is None:
+                        # Keep only the entries that still match (drops a torn line or stale chunks)
+                        self._write_checkpoint(checkpoint, done[:i])
+                        done = done[:i]
+                        log = open(checkpoint, "a", encoding="utf-8")
+                    summary = self._generate(CHUNK_PROMPT, chunk)
+                    log.write(json.dumps({"index": i, "hash": chunk_hash, "summary": summary}) + "\n")
+                    log.flush()
+                summaries.append(summary)
+                if on_chunk:
+                    on_chunk(i, summary, resumed)
+        finally:
+            stop.set()
+            if log is not None:
+                log.close()
+
+        final = self.reduce(summaries)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return {
+            "sha256": digest,
+            "summary": final,
+            "chunk_summaries": summaries,
+            "chunks": len(summaries),
+            "tokens_in": tokens_in,
+            "tokens_out": self.tokens_out,
+            "seconds": time.perf_counter() - started,
+        }
@@ -0,0 +1,125 @@
+"""
+Map-reduce extraction of a {main task: [sub-tasks]} plan from large documents.
+
+The document is packed into token-budgeted chunks, each chunk is analyzed by the LLM
+concurrently (map), and the per-chunk task maps are merged into one deduplicated
+hierarchy (reduce).
+"""
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# === Configuration ===
+CHUNK_TOKENS = 3000
+MAX_CONCURRENCY = 4
+CHARS_PER_TOKEN = 4  # rough average for English text with BPE tokenizers
+
+
+# === Chunking ===
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(text, max_tokens):
+    """Split one section that is over budget at paragraph, then line, then character boundaries."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    for separator in ("\n\n", "\n"):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            for part in parts:
+                if estimate_tokens(part) > max_tokens:
+                    yield from _split_oversized(part, max_tokens)
+                else:
+                    yield part
+            return
+    for i in range(0, len(text), max_chars):
+        yield text[i:i + max_chars]
+
+
+def chunk_sections(sections, max_tokens=CHUNK_TOKENS):
+    """Pack document sections (e.g. from document_extraction.iter_sections) into chunks of about max_tokens."""
+    chunk, size = [], 0
+    for section in sections:
+        pieces = _split_oversized(section, max_tokens) if estimate_tokens(section) > max_tokens else [section]
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if chunk and size + tokens > max_tokens:
+                yield "\n".join(chunk)
+                chunk, size = [], 0
+            chunk.append(piece)
+            size += tokens
+    if chunk:
+        yield "\n".join(chunk)
+
+
+# === Parsing ===
+def parse_task_map(text):
+    """Pull the first {...} JSON object out of an LLM reply; raises ValueError if there is none."""
+    match = re.search(r"\{[\s\S]*\}", text or "")
+    if not match:
+        raise ValueError("No JSON found in response.")
+    task_map = json.loads(match.group())
+    if not isinstance(task_map, dict):
+        raise ValueError("Response JSON is not an object.")
+    return task_map
+
+
+# === Merging ===
+def normalize_task(name):
+    return re.sub(r"[^\w]+", " ", str(name).casefold()).strip()
+
+
+def merge_task_maps(task_maps):
+    """Merge task maps, collapsing main tasks and sub-tasks that differ only in case/punctuation."""
+    merged = {}
+    names = {}
+    for task_map in task_maps:
+        for main_task, sub_tasks in task_map.items():
+            key = normalize_task(main_task)
+            if key not in names:
+                names[key] = main_task
+                merged[main_task] = []
+            subs = merged[names[key]]
+            seen = {normalize_task(s) for s in subs}
+            for sub in sub_tasks or []:
+                if normalize_task(sub) not in seen:
+                    seen.add(normalize_task(sub))
+                    subs.append(sub)
+    return merged
+
+
+# === Map-Reduce ===
+def analyze_chunks(chunks, analyze_chunk, max_concurrency=MAX_CONCURRENCY):
+    """
+    Run analyze_chunk(chunk) -> raw LLM text on every chunk with at most max_concurrency
+    requests in flight.
+
+    Returns (task_maps, failures): task_maps[i] is chunk i's parsed task map, or None if
+    it failed, and failures is a list of (chunk_index, error message).
+    """
+    chunks = list(chunks)
+
+    def analyze(chunk):
+        return parse_task_map(analyze_chunk(chunk))
+
+    task_maps, failures = [], []
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = [pool.submit(analyze, chunk) for chunk in chunks]
+        for i, future in enumerate(futures):
+            try:
+                task_maps.append(future.result())
+            except Exception as e:
+                task_maps.append(None)
+                failures.append((i, str(e)))
+    return task_maps, failures
+
+
+def map_reduce_tasks(chunks, analyze_chunk, max_concurrency=MAX_CONCURRENCY):
+    """
+    Analyze every chunk concurrently (see analyze_chunks) and merge the parsed results.
+
+    Returns (task_map, failures) where failures is a list of (chunk_index, error message).
+    """
+    task_maps, failures = analyze_chunks(chunks, analyze_chunk, max_concurrency)
+    # Merged in document order so the plan keeps the document's task order
+    return merge_task_maps(t for t in task_maps if t is not None), failures
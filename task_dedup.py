@@ -0,0 +1,183 @@
+"""
+Near-duplicate task collapsing for {main task: [sub-tasks]} plans.
+
+LLM plans, and plans merged from several chunks or runs, often repeat a task with
+slightly different wording. Each copy would cost a Jira issue and a GitHub branch.
+Every task name is normalized into a set of word shingles (words and adjacent word
+pairs, so word order counts). Identical sets are grouped directly. MinHash signatures
+and LSH banding, tuned to the threshold, then find candidate pairs without comparing
+every pair, so thousands of tasks take near-linear time, even when many of them come
+from one template. Candidates are confirmed by their exact shingle Jaccard similarity,
+so only pairs at or above the threshold are merged.
+"""
+import hashlib
+import os
+
+from task_analysis import normalize_task
+
+# === Configuration ===
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.8'))  # Jaccard similarity of shingle sets
+NUM_PERM = 128
+LSH_MARGIN = 0.1  # banding threshold this far below DEDUP_THRESHOLD, so true pairs rarely miss a bucket
+SMALL_BUCKET = 8  # LSH buckets up to this size are verified pair by pair
+SIGNATURE_BLOCK = 1024  # tasks hashed per vectorized step
+STOPWORDS = frozenset("a an and the of for to in on with by from into at as or be is are all any its".split())
+_PRIME = (1 << 31) - 1  # a, b, x < 2**31, so a * x + b fits in uint64 and the hash is exact mod p
+
+
+def _fold_plural(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def shingles(text):
+    """
+    Word shingles of a task name: its words and adjacent word pairs, after normalizing,
+    dropping stopwords and stripping a plural "s". "Set up the CI pipelines" and "Set up
+    CI pipeline" match exactly; "Migrate MySQL to Postgres" and "Migrate Postgres to
+    MySQL" share their words but not their pairs.
+    """
+    words = normalize_task(text).split()
+    words = [_fold_plural(w) for w in words if w not in STOPWORDS] or words
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])} or {""}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def minhash_signatures(shingle_sets, num_perm=NUM_PERM, seed=1):
+    """(len(shingle_sets), num_perm) array of MinHash signatures."""
+    import numpy as np  # deferred: only needed once there is a plan to deduplicate
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+    hashes = {}
+
+    def shingle_hash(s):
+        if s not in hashes:
+            hashes[s] = int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") % _PRIME
+        return hashes[s]
+
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    for first in range(0, len(shingle_sets), SIGNATURE_BLOCK):
+        block = shingle_sets[first:first + SIGNATURE_BLOCK]
+        x = np.array([shingle_hash(s) for items in block for s in items], dtype=np.uint64)
+        starts = np.cumsum([0] + [len(items) for items in block[:-1]])
+        # Minimum of every task's rows at once; each set has at least one shingle
+        signatures[first:first + len(block)] = np.minimum.reduceat((x[:, None] * a + b) % _PRIME, starts, axis=0)
+    return signatures
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM):
+    """
+    (bands, rows) for LSH banding: the most rows per band whose banding threshold,
+    about (1 / bands) ** (1 / rows), is still LSH_MARGIN below threshold. More rows keep
+    merely related tasks (e.g. templated ones) out of each other's buckets.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - LSH_MARGIN:
+            best = (bands, rows)
+    return best
+
+
+def similar_clusters(texts, threshold=DEDUP_THRESHOLD, num_perm=NUM_PERM):
+    """
+    Group texts whose shingle Jaccard similarity is at least threshold (transitively).
+
+    Returns {index: root} with the lowest index of each group as its root. Identical
+    shingle sets are grouped before hashing. Buckets of up to SMALL_BUCKET texts are
+    verified pair by pair; larger ones only against their first member, so a crowd of
+    look-alike tasks costs linear rather than quadratic time.
+    """
+    sets = [frozenset(shingles(text)) for text in texts]
+    parent = list(range(len(sets)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    first = {}
+    for i, shingle_set in enumerate(sets):
+        union(first.setdefault(shingle_set, i), i)
+    unique = sorted(first.values())
+
+    if len(unique) > 1:
+        signatures = minhash_signatures([sets[i] for i in unique], num_perm)
+        bands, rows = lsh_bands(threshold, num_perm)
+        checked = set()
+
+        def verify(i, j):
+            if find(i) != find(j) and (i, j) not in checked:
+                checked.add((i, j))
+                if jaccard(sets[i], sets[j]) >= threshold:
+                    union(i, j)
+
+        for band in range(bands):
+            buckets = {}
+            for n, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+                buckets.setdefault(key, []).append(unique[n])
+            for members in buckets.values():
+                if len(members) <= SMALL_BUCKET:
+                    for n, i in enumerate(members):
+                        for j in members[n + 1:]:
+                            verify(i, j)
+                else:
+                    for j in members[1:]:
+                        verify(members[0], j)
+    return {i: find(i) for i in range(len(sets))}
+
+
+# === Plans ===
+def dedupe_task_map(task_map, threshold=DEDUP_THRESHOLD):
+    """
+    Collapse near-duplicate tasks across a whole plan.
+
+    Main tasks and sub-tasks are compared together. In each group of similar tasks the
+    first main task (in plan order) is kept, or the first sub-task if the group has no
+    main task. Merged main tasks hand their sub-tasks to the kept one, and other
+    sub-tasks in the group are dropped. Returns (task_map, collapsed), where collapsed
+    lists (kept task, [dropped tasks]) per group.
+    """
+    entries = []  # (name, main task it belongs to, is_main)
+    for main, subs in task_map.items():
+        entries.append((main, main, True))
+        entries += [(sub, main, False) for sub in subs or []]
+
+    roots = similar_clusters([name for name, _, _ in entries], threshold)
+    groups = {}
+    for i, root in roots.items():
+        groups.setdefault(root, []).append(i)
+
+    keep = {}  # entry index -> index of the entry that replaces it
+    for members in groups.values():
+        kept = next((i for i in members if entries[i][2]), members[0])
+        for i in members:
+            keep[i] = kept
+
+    main_index = {main: i for i, (name, main, is_main) in enumerate(entries) if is_main}
+    deduped, collapsed = {}, {}
+    for i, (name, main, is_main) in enumerate(entries):
+        if keep[i] != i:
+            collapsed.setdefault(entries[keep[i]][0], []).append(name)
+            continue
+        if is_main:
+            deduped.setdefault(name, [])
+        else:
+            # A sub-task follows its main task to wherever that was merged
+            target = entries[keep[main_index[main]]][0]
+            deduped.setdefault(target, []).append(name)
+    return deduped, list(collapsed.items())
+
+
+def collapsed_count(collapsed):
+    return sum(len(dropped) for _, dropped in collapsed)
@@ -1,4 +1,4 @@
-import docx2txt
+from document_extraction import extract_text
 import os
 
 
@@ -8,8 +8,7 @@ def extract_text_from_docx(docx_path):
     """
     Extracts text from a .docx file and returns it as a string.
     """
-    text = docx2txt.process(docx_path)
-    return text
+    return extract_text(docx_path)
 
 def prrse_tasks(text):
     lines = text.split('\n')
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+# Modules read their cache and state locations at import time: keep test runs out of the working tree
+_scratch = tempfile.mkdtemp(prefix="planner-tests-")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_scratch, "llm_cache.sqlite3"))
+os.environ.setdefault("EXTRACT_CACHE_DIR", os.path.join(_scratch, "extract_cache"))
+os.environ.setdefault("PLAN_STATE_DIR", os.path.join(_scratch, "plan_state"))
+os.environ.setdefault("METRICS_DIR", os.path.join(_scratch, "metrics"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from mock_servers import MockGitHub, MockJira, MockOllama  # noqa: E402
+
+
+@pytest.fixture
+def jira_server():
+    server = MockJira().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def github_server():
+    server = MockGitHub().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def ollama_server():
+    server = MockOllama().start()
+    yield server
+    server.stop()
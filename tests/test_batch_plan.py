@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from batch_plan import DONE, JIRA_STARTED, BatchPlanner, PlanQueue
+from github_branches import BranchProvisioner
+from jira_writer import JiraWriter
+from ollama_client import OllamaClient
+
+
+class FailingProvisioner:
+    def provision(self, tasks, names=None):
+        raise RuntimeError("GitHub is down")
+
+    def remove(self, branches):
+        raise RuntimeError("GitHub is down")
+
+
+@pytest.fixture
+def clients(jira_server, github_server, ollama_server):
+    llm = OllamaClient(ollama_server.url, ollama_server.model)
+    jira = JiraWriter(jira_server.url, "me@example.com", "token", jira_server.project_key, max_concurrency=1)
+    github = BranchProvisioner("token", github_server.repo_name, max_concurrency=1, base_url=github_server.url,
+                               seconds_between_requests=0, seconds_between_writes=0)
+    return llm, jira, github
+
+
+def write_specs(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"spec-{i}.txt"
+        path.write_text(f"Project {i}\n\nBuild the reporting service number {i} and its dashboards.\n")
+        paths.append(str(path))
+    return paths
+
+
+def run(queue, llm, jira, github, tmp_path):
+    # State is named by the path below root: the test's own directory keeps it apart from other tests
+    planner = BatchPlanner(queue, llm, jira, github, root=str(tmp_path.parent))
+    return asyncio.run(planner.run())
+
+
+def test_run_plans_every_document(tmp_path, clients, jira_server, github_server):
+    llm, jira, github = clients
+    queue = PlanQueue(str(tmp_path / "queue.sqlite"))
+    assert queue.add(write_specs(tmp_path, 3)) == 3
+
+    assert run(queue, llm, jira, github, tmp_path) == 3
+
+    assert queue.counts() == {DONE: 3}
+    # Each spec is one chunk: three main tasks with two sub-tasks each
+    assert len(jira_server.issues) == 3 * 9
+    assert len(github_server.refs) == 1 + 3 * 9
+    assert queue.pending() == []
+    assert queue.add(write_specs(tmp_path, 3)) == 0
+
+
+def test_resume_after_jira_started_does_not_duplicate_issues(tmp_path, clients, jira_server, github_server):
+    llm, jira, github = clients
+    queue = PlanQueue(str(tmp_path / "queue.sqlite"))
+    path, = write_specs(tmp_path, 1)
+    queue.add([path])
+    run(queue, llm, jira, github, tmp_path)
+
+    # A revision whose sync breaks after its issues were created leaves the row failed in JIRA_STARTED
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\nAlso migrate the billing database.\n")
+    assert queue.add([path]) == 1
+    assert run(queue, llm, jira, github=FailingProvisioner(), tmp_path=tmp_path) == 0
+    (status, error), = queue._conn.execute("SELECT status, error FROM documents")
+    assert status == JIRA_STARTED and "GitHub is down" in error
+    issues = len(jira_server.issues)
+    assert issues == 9 + 9
+
+    queue.retry_failed()
+    assert run(queue, llm, jira, github, tmp_path) == 1
+
+    assert queue.counts() == {DONE: 1}
+    assert len(jira_server.issues) == issues
+    assert len(github_server.refs) == 1 + 9
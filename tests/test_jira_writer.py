@@ -0,0 +1,55 @@
+from jira_writer import RETIRED_LABEL, JiraWriter
+from mock_servers import MockJira
+
+
+def writer_for(server):
+    return JiraWriter(server.url, "me@example.com", "token", server.project_key)
+
+
+def test_create_plan_puts_sub_tasks_under_their_main_task(jira_server):
+    task_map = {"Build login page": ["Design form", "Add validation"], "Set up CI": ["Add lint step"]}
+    created, errors = writer_for(jira_server).create_plan(task_map)
+
+    assert errors == []
+    assert set(created) == set(task_map)
+    for main, (key, subs) in created.items():
+        assert jira_server.issues[key]["issuetype"] == {"name": "Epic"}
+        assert set(subs) == set(task_map[main])
+        for sub, sub_key in subs.items():
+            assert jira_server.issues[sub_key]["summary"] == sub
+            assert jira_server.issues[sub_key]["parent"] == {"key": key}
+    assert len(jira_server.issues) == 5
+
+
+def test_create_plan_reports_a_rejected_main_task_and_its_sub_tasks(jira_server):
+    created, errors = writer_for(jira_server).create_plan({"": ["Orphan"], "Set up CI": ["Add lint step"]})
+
+    assert created[""] == (None, {})
+    assert created["Set up CI"][0] in jira_server.issues
+    assert [summary for summary, _ in errors] == ["", "Orphan"]
+    assert errors[1][1] == "Parent '' was not created"
+    assert len(jira_server.issues) == 2
+
+
+def test_create_plan_retries_throttled_bulk_requests_without_duplicates():
+    server = MockJira(throttle_every=2).start()
+    try:
+        task_map = {f"Main {i}": [f"Sub {i}.{j}" for j in range(3)] for i in range(4)}
+        created, errors = writer_for(server).create_plan(task_map)
+    finally:
+        server.stop()
+
+    assert errors == []
+    assert sorted(fields["summary"] for fields in server.issues.values()) == sorted(
+        [*task_map, *(sub for subs in task_map.values() for sub in subs)])
+
+
+def test_label_issues_reports_missing_issues(jira_server):
+    writer = writer_for(jira_server)
+    created, _ = writer.create_plan({"Set up CI": []})
+    key = created["Set up CI"][0]
+
+    failed = writer.label_issues([key, "DEMO-999"])
+
+    assert jira_server.issues[key]["labels"] == [RETIRED_LABEL]
+    assert [missing for missing, _ in failed] == ["DEMO-999"]
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from price_cache import _trading_days_in, missing_ranges
+
+T = pd.Timestamp
+
+
+def test_missing_ranges_skip_covered_parts():
+    covered = [(T("2024-01-01"), T("2024-02-01")), (T("2024-03-01"), T("2024-04-01"))]
+    assert missing_ranges(T("2024-01-15"), T("2024-05-01"), covered) == [
+        (T("2024-02-01"), T("2024-03-01")), (T("2024-04-01"), T("2024-05-01"))]
+
+
+def test_weekends_and_nyse_holidays_have_no_trading_days():
+    assert not _trading_days_in("AAPL", T("2024-12-28"), T("2024-12-30"))
+    assert not _trading_days_in("AAPL", T("2024-12-25"), T("2024-12-26"))
+    assert not _trading_days_in("AAPL", T("2024-03-29"), T("2024-03-30"))  # Good Friday
+    assert _trading_days_in("AAPL", T("2024-12-24"), T("2024-12-26"))
+    assert _trading_days_in("AAPL", T("2021-12-31"), T("2022-01-01"))  # New Year on a Saturday is not observed
+
+
+def test_other_listings_only_skip_weekends():
+    assert _trading_days_in("VOD.L", T("2024-11-28"), T("2024-11-29"))
+    assert _trading_days_in("BTC-USD", T("2024-12-25"), T("2024-12-26"))
@@ -0,0 +1,94 @@
+import pytest
+
+from github_branches import BranchProvisioner
+from jira_writer import RETIRED_LABEL, JiraWriter
+from replanning import PlanState, sync_plan
+
+
+class FailingProvisioner:
+    def provision(self, tasks, names=None):
+        raise RuntimeError("GitHub is down")
+
+    def remove(self, branches):
+        raise RuntimeError("GitHub is down")
+
+
+@pytest.fixture
+def writer(jira_server):
+    return JiraWriter(jira_server.url, "me@example.com", "token", jira_server.project_key)
+
+
+@pytest.fixture
+def provisioner(github_server):
+    return BranchProvisioner("token", github_server.repo_name, base_url=github_server.url,
+                             seconds_between_requests=0, seconds_between_writes=0)
+
+
+def sync(state, task_map, writer, provisioner):
+    return sync_plan(state, task_map, state.diff(task_map), writer, provisioner)
+
+
+def test_sync_plan_pushes_only_what_changed(tmp_path, jira_server, github_server, writer, provisioner):
+    state = PlanState("spec.txt", root=tmp_path)
+    report = sync(state, {"Build login page": ["Design form"], "Set up CI": ["Add lint step"]}, writer, provisioner)
+    assert report["created"] == 4 and report["errors"] == []
+    assert len(jira_server.issues) == 4
+    assert len(github_server.refs) == 5
+
+    report = sync(state, {"Build login page": ["Design form", "Add validation"]}, writer, provisioner)
+
+    assert report["created"] == 1
+    assert report["retired"] == 2
+    assert sorted(fields["summary"] for fields in jira_server.issues.values()
+                  if RETIRED_LABEL in fields.get("labels", [])) == ["Add lint step", "Set up CI"]
+    assert set(state.synced["task_map"]) == {"Build login page"}
+    assert set(state.synced["branches"]) == {"Build login page", "Design form", "Add validation"}
+    assert len(github_server.refs) == 4
+
+    # Reloaded from disk, the state diffs as fully synced
+    reloaded = PlanState("spec.txt", root=tmp_path)
+    assert reloaded.diff({"Build login page": ["Design form", "Add validation"]}) == {
+        "added": {}, "removed": {}, "changed": {}}
+
+
+def test_failed_github_call_does_not_duplicate_issues(tmp_path, jira_server, writer):
+    state = PlanState("spec.txt", root=tmp_path)
+    task_map = {"Build login page": ["Design form", "Add validation"]}
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            sync(state, task_map, writer, FailingProvisioner())
+
+    assert len(jira_server.issues) == 3
+    assert state.synced["task_map"] == task_map
+    assert state.synced["branches"] == {}
+
+
+def test_branches_missing_after_a_failure_are_created_by_the_next_sync(tmp_path, jira_server, github_server,
+                                                                       writer, provisioner):
+    state = PlanState("spec.txt", root=tmp_path)
+    task_map = {"Build login page": ["Design form"]}
+    with pytest.raises(RuntimeError):
+        sync(state, task_map, writer, FailingProvisioner())
+
+    report = sync(state, task_map, writer, provisioner)
+
+    assert report["created"] == 0
+    assert {status for _, status in report["branches"].values()} == {"created"}
+    assert len(jira_server.issues) == 2
+    assert set(state.synced["branches"]) == {"Build login page", "Design form"}
+
+
+def test_branches_of_tasks_removed_during_a_failed_sync_are_deleted_later(tmp_path, jira_server, github_server,
+                                                                         writer, provisioner):
+    state = PlanState("spec.txt", root=tmp_path)
+    sync(state, {"Build login page": ["Design form"], "Set up CI": []}, writer, provisioner)
+    task_map = {"Build login page": ["Design form"]}
+    with pytest.raises(RuntimeError):
+        sync(state, task_map, writer, FailingProvisioner())
+    assert "set-up-ci" in github_server.refs
+
+    report = sync(state, task_map, writer, provisioner)
+
+    assert report["removed_branches"] == {"set-up-ci": "deleted"}
+    assert "set-up-ci" not in github_server.refs
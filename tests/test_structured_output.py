@@ -0,0 +1,48 @@
+import json
+
+from structured_output import TaskStreamParser, parse_stream
+
+REPLY = json.dumps({
+    "Build \"login\" page": ["Design {form}", "Escape \\ and \" in [labels]"],
+    "Set up CI, then CD": ["Add lint step", "Deploy on tag, not branch"],
+    "Write docs": [],
+})
+
+
+def test_members_are_returned_as_soon_as_they_close():
+    parser = TaskStreamParser()
+    close = REPLY.index("], ")
+
+    assert parser.feed(REPLY[:close]) == []
+    assert parser.feed(REPLY[close]) == [("Build \"login\" page", json.loads(REPLY)["Build \"login\" page"])]
+    assert not parser.complete
+
+
+def test_any_split_gives_the_whole_object():
+    for size in (1, 2, 3, 7, 16, len(REPLY)):
+        seen = []
+        parser = parse_stream((REPLY[i:i + size] for i in range(0, len(REPLY), size)),
+                              on_task=lambda key, value: seen.append(key))
+        assert parser.complete
+        assert parser.task_map == json.loads(REPLY)
+        assert seen == list(json.loads(REPLY))
+
+
+def test_prose_and_code_fences_around_the_object_are_ignored():
+    parser = parse_stream(["Here is the plan:\n```json\n", REPLY, "\n```\nLet me know {if} you need more."])
+    assert parser.complete
+    assert parser.task_map == json.loads(REPLY)
+
+
+def test_truncated_reply_keeps_finished_members():
+    cut = REPLY.index("Deploy")
+    parser = parse_stream([REPLY[:cut]])
+
+    assert not parser.complete
+    assert list(parser.task_map) == ["Build \"login\" page"]
+
+
+def test_malformed_member_is_skipped():
+    parser = parse_stream(['{"Broken": [unquoted], "Write docs": ["Outline"]}'])
+    assert parser.complete
+    assert parser.task_map == {"Write docs": ["Outline"]}
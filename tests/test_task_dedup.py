@@ -0,0 +1,44 @@
+import time
+
+from task_dedup import collapsed_count, dedupe_task_map, jaccard, shingles, similar_clusters
+
+
+def test_rewordings_collapse_and_keep_first_main_task():
+    task_map = {
+        "Set up CI pipeline": ["Add lint step"],
+        "Build login page": [],
+        "Set up the CI pipelines": ["Add lint steps", "Add tests"],
+    }
+    deduped, collapsed = dedupe_task_map(task_map)
+    assert deduped == {"Set up CI pipeline": ["Add lint step", "Add tests"], "Build login page": []}
+    assert collapsed == [("Set up CI pipeline", ["Set up the CI pipelines"]), ("Add lint step", ["Add lint steps"])]
+    assert collapsed_count(collapsed) == 2
+
+
+def test_word_order_matters():
+    a, b = "Migrate data from MySQL to Postgres", "Migrate data from Postgres to MySQL"
+    assert jaccard(shingles(a), shingles(b)) < 0.8
+    deduped, collapsed = dedupe_task_map({a: [], b: []})
+    assert list(deduped) == [a, b] and collapsed == []
+
+
+def test_near_duplicates_inside_templated_tasks_are_found():
+    template = [f"Analyze and outline the technical requirements for feature {i}" for i in range(2000)]
+    edited = [f"Analyze and outline the technical requirements for feature {i} now" for i in range(0, 2000, 50)]
+    roots = similar_clusters(template + edited)
+    assert len(set(roots.values())) == len(template)
+    assert all(roots[i] == roots[len(template) + k] for k, i in enumerate(range(0, 2000, 50)))
+
+
+def _seconds(tasks):
+    started = time.perf_counter()
+    similar_clusters(tasks)
+    return time.perf_counter() - started
+
+
+def test_templated_and_identical_tasks_scale_near_linearly():
+    for make in (lambda n: [f"Analyze and outline the technical requirements for feature {i}" for i in range(n)],
+                 lambda n: ["Set up the CI pipeline"] * n):
+        small, large = _seconds(make(2000)), _seconds(make(8000))
+        # 4x the tasks: quadratic would be ~16x; allow generous noise around linear
+        assert large < max(8 * small, 0.5), (small, large)
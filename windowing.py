@@ -0,0 +1,38 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_float32(data):
+    """Return data as a 2-D float32 array of shape (rows, features), copying only if needed."""
+    data = np.asarray(data, dtype=np.float32)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    return data
+
+
+def make_windows(data, time_step, target_column=0):
+    """
+    Build LSTM input windows from a (rows, features) series without copying.
+
+    Returns (X, y) where X[i] = data[i:i + time_step] with shape (n, time_step, features)
+    and y[i] = data[i + time_step, target_column], n = rows - time_step. Both are
+    read-only float32 views into data.
+    """
+    data = as_float32(data)
+    if len(data) <= time_step:
+        raise ValueError(f"Need more than {time_step} rows to build windows, got {len(data)}.")
+
+    # sliding_window_view puts the window axis last: (rows - time_step + 1, features, time_step)
+    windows = sliding_window_view(data, time_step, axis=0).transpose(0, 2, 1)
+    X = windows[:-1]
+    y = data[time_step:, target_column]
+    X.flags.writeable = False
+    y = y.view()
+    y.flags.writeable = False
+    return X, y
+
+
+def make_forecast_windows(data, time_step, days):
+    """Return the windows predicting the last `days` rows of data (same code path as training)."""
+    X, _ = make_windows(as_float32(data)[-(time_step + days):], time_step)
+    return X